@@ -0,0 +1 @@
+"""Camada de dados do Sistema de Loja (sem dependência de interface gráfica)"""
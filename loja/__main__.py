@@ -0,0 +1,5 @@
+import sys
+
+from loja.cli import main
+
+sys.exit(main())
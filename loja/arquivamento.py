@@ -0,0 +1,519 @@
+"""Arquivamento de pedidos antigos em um banco separado
+
+Pedidos entregues ou cancelados há mais de ``dias`` saem de ``pedidos``
+e ``itens_pedido`` e vão, em lotes, para ``<banco>_arquivo.db``. Listas,
+busca e resumos continuam só no conjunto quente; o histórico
+(``PaginadorPedidos(com_arquivo=True)``) e as estatísticas anexam o
+arquivo à conexão (``ATTACH``) só quando ele existe e a consulta
+precisa dele.
+
+O arquivo tem o próprio ``busca_pedidos`` (mesmo tokenizador e documento
+do principal), para o histórico buscar os arquivados sem acento e por
+prefixo como os demais; renomear um cliente reescreve o nome e os
+documentos dos pedidos arquivados dele após o commit.
+
+Cada lote usa uma transação em cada banco, com a trava de escrita do
+principal mantida do começo ao fim:
+
+1. ``BEGIN IMMEDIATE`` no principal e leitura do lote;
+2. cópia para o arquivo (pedidos, itens e agregados) e commit;
+3. remoção no principal e commit.
+
+Se o processo cair entre 2 e 3, os pedidos ficam nos dois bancos: o
+histórico ignora a cópia arquivada, as estatísticas os contam duas
+vezes e o próximo arquivamento só os remove do principal, sem somar os
+agregados de novo.
+
+Os agregados do arquivo têm o formato das tabelas ``estatisticas_*``:
+o gatilho de remoção subtrai do principal o que o lote soma no arquivo
+e as estatísticas somam os dois.
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import islice
+
+from loja.busca import montar_consulta_fts
+from loja.eventos import RECARREGAR
+from loja.migracoes import TOKENIZADOR, fts5_disponivel
+from loja.repositorio import LOTE, ItemPedido, Pedido, PedidoRepo, fabrica
+
+# Nome do banco anexado nas consultas
+ESQUEMA = 'arquivo'
+
+# Só pedidos encerrados são arquivados
+STATUS_ARQUIVAVEIS = ('entregue', 'cancelado')
+
+# Idade padrão (pela data do pedido) para arquivar
+DIAS_PADRAO = 365
+
+_MARCADORES = ', '.join('?' * LOTE)
+
+# Esquema do arquivo (``PRAGMA user_version`` = 1)
+ESQUEMA_ARQUIVO = [
+    '''
+    CREATE TABLE IF NOT EXISTS pedidos (
+        id INTEGER PRIMARY KEY,
+        cliente_id INTEGER NOT NULL,
+        cliente_nome TEXT NOT NULL,
+        data TEXT NOT NULL,
+        data_entrega TEXT,
+        status TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        arquivado_em TEXT NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos(data)',
+    'CREATE INDEX IF NOT EXISTS idx_pedidos_cliente ON pedidos(cliente_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS itens_pedido (
+        id INTEGER PRIMARY KEY,
+        pedido_id INTEGER NOT NULL REFERENCES pedidos(id) ON DELETE CASCADE,
+        produto_id INTEGER,
+        produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_unitario INTEGER NOT NULL,
+        total INTEGER NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido ON itens_pedido(pedido_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_diarias (
+        dia TEXT PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_status (
+        status TEXT PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_clientes (
+        cliente_id INTEGER PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_produtos (
+        produto_id INTEGER PRIMARY KEY,
+        quantidade INTEGER NOT NULL DEFAULT 0,
+        receita INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    'PRAGMA user_version = 1',
+]
+
+# Documento de busca do pedido arquivado, como ``DOCUMENTO_PEDIDO`` do principal
+DOCUMENTO_ARQUIVADO = '''
+    INSERT INTO busca_pedidos(rowid, numero, cliente, produtos)
+    SELECT p.id, p.id, p.cliente_nome,
+           (SELECT group_concat(i.produto, ' ') FROM itens_pedido i WHERE i.pedido_id = p.id)
+    FROM pedidos p
+'''
+
+# Versão 2: busca dos arquivados (só com FTS5; sem ele o arquivo fica na 1)
+ESQUEMA_BUSCA_ARQUIVO = [
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS busca_pedidos USING fts5(numero, cliente, produtos, {TOKENIZADOR})',
+    'DELETE FROM busca_pedidos',
+    DOCUMENTO_ARQUIVADO,
+    'PRAGMA user_version = 2',
+]
+
+# Banco principal: próximo lote, em ordem de data e id
+SQL_CANDIDATOS = f'''
+    SELECT p.id, p.cliente_id, c.nome, p.data, p.data_entrega, p.status, p.total
+    FROM pedidos p
+    JOIN clientes c ON c.id = p.cliente_id
+    WHERE p.data < ?1 AND (p.data, p.id) > (?2, ?3)
+      AND p.status IN ({', '.join(f"'{status}'" for status in STATUS_ARQUIVAVEIS)})
+    ORDER BY p.data, p.id
+    LIMIT ?4
+'''
+SQL_ITENS_CANDIDATOS = f'''
+    SELECT id, pedido_id, produto_id, produto, quantidade, preco_unitario, total
+    FROM itens_pedido
+    WHERE pedido_id IN ({_MARCADORES})
+'''
+# Itens saem junto pelo ON DELETE CASCADE (foreign_keys=ON no pool)
+SQL_REMOVER = 'DELETE FROM pedidos WHERE id = ?'
+
+# Arquivo: cópia do lote e agregados só dos pedidos novos
+SQL_JA_ARQUIVADOS = f'SELECT id FROM pedidos WHERE id IN ({_MARCADORES})'
+SQL_INSERIR_PEDIDO = '''
+    INSERT INTO pedidos (id, cliente_id, cliente_nome, data, data_entrega, status, total, arquivado_em)
+    VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
+'''
+SQL_INSERIR_ITEM = '''
+    INSERT INTO itens_pedido (id, pedido_id, produto_id, produto, quantidade, preco_unitario, total)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+_NOVOS = 'SELECT id FROM temp.novos'
+SQL_SOMAR_AGREGADOS = [
+    f'''
+    INSERT INTO estatisticas_diarias (dia, pedidos, receita)
+    SELECT COALESCE(date(data), data, ''), COUNT(*), SUM(total)
+    FROM pedidos WHERE id IN ({_NOVOS}) GROUP BY 1
+    ON CONFLICT(dia) DO UPDATE SET
+        pedidos = pedidos + excluded.pedidos, receita = receita + excluded.receita
+    ''',
+    f'''
+    INSERT INTO estatisticas_status (status, pedidos, receita)
+    SELECT status, COUNT(*), SUM(total)
+    FROM pedidos WHERE id IN ({_NOVOS}) GROUP BY status
+    ON CONFLICT(status) DO UPDATE SET
+        pedidos = pedidos + excluded.pedidos, receita = receita + excluded.receita
+    ''',
+    f'''
+    INSERT INTO estatisticas_clientes (cliente_id, pedidos, receita)
+    SELECT cliente_id, COUNT(*), SUM(total)
+    FROM pedidos WHERE id IN ({_NOVOS}) GROUP BY cliente_id
+    ON CONFLICT(cliente_id) DO UPDATE SET
+        pedidos = pedidos + excluded.pedidos, receita = receita + excluded.receita
+    ''',
+    f'''
+    INSERT INTO estatisticas_produtos (produto_id, quantidade, receita)
+    SELECT produto_id, SUM(quantidade), SUM(total)
+    FROM itens_pedido WHERE pedido_id IN ({_NOVOS}) AND produto_id IS NOT NULL GROUP BY produto_id
+    ON CONFLICT(produto_id) DO UPDATE SET
+        quantidade = quantidade + excluded.quantidade, receita = receita + excluded.receita
+    ''',
+]
+TABELAS_ARQUIVO = (
+    'itens_pedido', 'pedidos', 'estatisticas_diarias', 'estatisticas_status',
+    'estatisticas_clientes', 'estatisticas_produtos'
+)
+SQL_TEM_BUSCA = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busca_pedidos'"
+SQL_RENOMEAR_CLIENTE = 'UPDATE pedidos SET cliente_nome = ?1 WHERE cliente_id = ?2 AND cliente_nome <> ?1'
+SQL_REMOVER_DOCUMENTOS_CLIENTE = '''
+    DELETE FROM busca_pedidos WHERE rowid IN (SELECT id FROM pedidos WHERE cliente_id = ?)
+'''
+
+# Consultas com o arquivo anexado; o nome atual do cliente tem preferência
+SELECT_ARQUIVADO = f'''
+    SELECT a.id, a.data, COALESCE(c.nome, a.cliente_nome) AS cliente_nome,
+           a.data_entrega, a.status, a.total
+    FROM {ESQUEMA}.pedidos a
+    LEFT JOIN main.clientes c ON c.id = a.cliente_id
+'''
+SQL_PEDIDO_ARQUIVADO = SELECT_ARQUIVADO + 'WHERE a.id = ?'
+SQL_ITENS_ARQUIVADOS = f'''
+    SELECT pedido_id, produto_id, produto, quantidade, preco_unitario, total
+    FROM {ESQUEMA}.itens_pedido
+    WHERE pedido_id = ?
+    ORDER BY id
+'''
+SQL_DATA_MAXIMA = 'SELECT MAX(data) FROM pedidos'
+
+# Texto da consulta de página do arquivo por combinação de filtros
+_PAGINAS = {}
+
+
+def caminho_arquivo(db_path):
+    """Arquivo de pedidos ao lado do banco: ``sistema_loja_arquivo.db``"""
+    base, extensao = os.path.splitext(db_path)
+    return f'{base}_arquivo{extensao or ".db"}'
+
+
+def unir(tabela, colunas):
+    """Subconsulta com as linhas de ``tabela`` no principal e no arquivo"""
+    return (
+        f'(SELECT {colunas} FROM main.{tabela} '
+        f'UNION ALL SELECT {colunas} FROM {ESQUEMA}.{tabela})'
+    )
+
+
+class ArquivoPedidos:
+    """Banco de pedidos arquivados de um ``DatabaseManager``"""
+
+    def __init__(self, db, caminho=None):
+        self.db = db
+        self.caminho = caminho or caminho_arquivo(db.db_path)
+        self.pedidos = PedidoRepo(db)
+        self._fabrica = fabrica(Pedido)
+        self._fabrica_item = fabrica(ItemPedido)
+        self._lock = threading.Lock()
+        self._data_maxima = (None, None)
+
+    def ativo(self):
+        """Indica se já há pedidos arquivados (o arquivo só é criado no primeiro lote)"""
+        return os.path.exists(self.caminho)
+
+    def anexar(self, conn):
+        """Anexa o arquivo à conexão do pool, se ainda não anexado
+
+        Precisa ser chamado fora de transação; a conexão continua com o
+        arquivo anexado enquanto estiver aberta.
+        """
+        if any(linha[1] == ESQUEMA for linha in conn.execute('PRAGMA database_list')):
+            return
+        conn.execute(f'ATTACH DATABASE ? AS {ESQUEMA}', (self.caminho,))
+
+    @contextmanager
+    def conexao(self):
+        """Conexão do pool com o arquivo anexado como ``arquivo``"""
+        with self.db.get_connection() as conn:
+            self.anexar(conn)
+            yield conn
+
+    def _abrir(self):
+        """Conexão própria com o arquivo, criando ou atualizando o esquema se preciso"""
+        conn = sqlite3.connect(self.caminho, timeout=self.db.pool.timeout)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # O commit do arquivo precisa ser durável antes da remoção no principal
+        conn.execute('PRAGMA synchronous=FULL')
+        versao = conn.execute('PRAGMA user_version').fetchone()[0]
+        if versao < 1:
+            conn.execute('BEGIN IMMEDIATE')
+            for comando in ESQUEMA_ARQUIVO:
+                conn.execute(comando)
+            conn.commit()
+        if versao < 2 and fts5_disponivel(conn):
+            conn.execute('BEGIN IMMEDIATE')
+            for comando in ESQUEMA_BUSCA_ARQUIVO:
+                conn.execute(comando)
+            conn.commit()
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS novos (id INTEGER PRIMARY KEY)')
+        return conn
+
+    def atualizar_esquema(self):
+        """Leva um arquivo já existente à versão atual (chamado ao abrir o banco)"""
+        if self.ativo():
+            self._abrir().close()
+
+    def _assinatura(self):
+        """Muda a cada commit no arquivo (tamanho e data do banco e do -wal)"""
+        estados = []
+        for caminho in (self.caminho, self.caminho + '-wal'):
+            try:
+                estado = os.stat(caminho)
+            except FileNotFoundError:
+                estados.append(None)
+            else:
+                estados.append((estado.st_mtime_ns, estado.st_size))
+        return tuple(estados)
+
+    def data_maxima(self):
+        """Data do pedido arquivado mais recente, ou None se não há arquivo"""
+        if not self.ativo():
+            return None
+        assinatura = self._assinatura()
+        with self._lock:
+            origem, data = self._data_maxima
+            if origem == assinatura:
+                return data
+        conn = sqlite3.connect(self.caminho, timeout=self.db.pool.timeout)
+        try:
+            data = conn.execute(SQL_DATA_MAXIMA).fetchone()[0]
+        finally:
+            conn.close()
+        with self._lock:
+            self._data_maxima = (assinatura, data)
+        return data
+
+    def verificar(self):
+        """``integrity_check`` e ``foreign_key_check`` do arquivo, ou None se não existe"""
+        if not self.ativo():
+            return None
+        conn = sqlite3.connect(self.caminho, timeout=self.db.pool.timeout)
+        try:
+            return {
+                "integrity_check": [linha[0] for linha in conn.execute('PRAGMA integrity_check')],
+                "foreign_key_check": conn.execute('PRAGMA foreign_key_check').fetchall(),
+            }
+        finally:
+            conn.close()
+
+    def arquivar(self, dias=DIAS_PADRAO, lote=200, hoje=None, progresso=None):
+        """Move para o arquivo os pedidos encerrados com mais de ``dias``
+
+        Um lote de até ``lote`` pedidos por vez (ver o começo do módulo);
+        ``progresso(arquivados)`` é chamado após cada lote. Retorna
+        quantos pedidos saíram do banco principal.
+        """
+        corte = ((hoje or date.today()) - timedelta(days=dias)).isoformat()
+        depois_de = ('', 0)
+        arquivados = 0
+        arquivo = None
+        try:
+            while True:
+                with self.db.transacao() as conn:
+                    pedidos = conn.execute(SQL_CANDIDATOS, (corte, *depois_de, lote)).fetchall()
+                    if not pedidos:
+                        break
+                    ids = [pedido[0] for pedido in pedidos]
+                    itens = []
+                    for inicio in range(0, len(ids), LOTE):
+                        parte = ids[inicio:inicio + LOTE]
+                        parte += [None] * (LOTE - len(parte))
+                        itens.extend(conn.execute(SQL_ITENS_CANDIDATOS, parte).fetchall())
+
+                    if arquivo is None:
+                        arquivo = self._abrir()
+                    self._copiar(arquivo, pedidos, itens)
+
+                    conn.executemany(SQL_REMOVER, [(pedido_id,) for pedido_id in ids])
+                    depois_de = (pedidos[-1][3], pedidos[-1][0])
+                    arquivados += len(pedidos)
+
+                if progresso:
+                    progresso(arquivados)
+                if len(pedidos) < lote:
+                    break
+        finally:
+            if arquivo is not None:
+                arquivo.close()
+
+        if arquivados:
+            self.db.publicar('pedidos', RECARREGAR, None)
+        return arquivados
+
+    def _copiar(self, arquivo, pedidos, itens):
+        """Grava o lote no arquivo; pedidos já arquivados não são somados de novo"""
+        ids = [pedido[0] for pedido in pedidos]
+        arquivo.execute('BEGIN IMMEDIATE')
+        try:
+            existentes = set()
+            for inicio in range(0, len(ids), LOTE):
+                parte = ids[inicio:inicio + LOTE]
+                parte += [None] * (LOTE - len(parte))
+                existentes.update(linha[0] for linha in arquivo.execute(SQL_JA_ARQUIVADOS, parte))
+
+            novos = [pedido for pedido in pedidos if pedido[0] not in existentes]
+            arquivo.executemany(SQL_INSERIR_PEDIDO, novos)
+            arquivo.executemany(SQL_INSERIR_ITEM, [item for item in itens if item[1] not in existentes])
+            arquivo.execute('DELETE FROM temp.novos')
+            arquivo.executemany('INSERT INTO temp.novos (id) VALUES (?)', [(pedido[0],) for pedido in novos])
+            for comando in SQL_SOMAR_AGREGADOS:
+                arquivo.execute(comando)
+            if arquivo.execute(SQL_TEM_BUSCA).fetchone():
+                arquivo.execute(DOCUMENTO_ARQUIVADO + f'WHERE p.id IN ({_NOVOS})')
+            arquivo.commit()
+        except BaseException:
+            arquivo.rollback()
+            raise
+
+    def limpar(self):
+        """Apaga todos os pedidos e agregados arquivados"""
+        if not self.ativo():
+            return
+        arquivo = self._abrir()
+        try:
+            arquivo.execute('BEGIN IMMEDIATE')
+            for tabela in TABELAS_ARQUIVO:
+                arquivo.execute(f'DELETE FROM {tabela}')
+            if arquivo.execute(SQL_TEM_BUSCA).fetchone():
+                arquivo.execute('DELETE FROM busca_pedidos')
+            arquivo.commit()
+        finally:
+            arquivo.close()
+
+    def renomear_cliente(self, cliente_id, nome):
+        """Grava o novo nome do cliente nos pedidos arquivados e na busca deles
+
+        Chamado após o commit da renomeação no principal. Se o processo
+        cair antes, os arquivados continuam exibindo o nome atual (vem do
+        principal), mas a busca só os encontra pelo nome antigo.
+        """
+        if not self.ativo():
+            return
+        arquivo = self._abrir()
+        try:
+            arquivo.execute('BEGIN IMMEDIATE')
+            alterados = arquivo.execute(SQL_RENOMEAR_CLIENTE, (nome, cliente_id)).rowcount
+            if alterados and arquivo.execute(SQL_TEM_BUSCA).fetchone():
+                arquivo.execute(SQL_REMOVER_DOCUMENTOS_CLIENTE, (cliente_id,))
+                arquivo.execute(DOCUMENTO_ARQUIVADO + 'WHERE p.cliente_id = ?', (cliente_id,))
+            arquivo.commit()
+        finally:
+            arquivo.close()
+
+    @staticmethod
+    def _sql_pagina(com_termo, fts, status, continuar):
+        """Texto da consulta de página do arquivo; uma variante por filtros
+
+        O termo segue ``BuscaTextual.filtro_pedidos``: ``MATCH`` por
+        prefixo no ``busca_pedidos`` do arquivo ou, sem FTS5, ``LIKE``
+        no cliente e no número.
+        """
+        chave = (com_termo, fts, status, continuar)
+        sql = _PAGINAS.get(chave)
+        if sql is None:
+            # Pedido ainda no principal (arquivamento interrompido) aparece só de lá
+            sql = SELECT_ARQUIVADO + 'WHERE NOT EXISTS (SELECT 1 FROM main.pedidos m WHERE m.id = a.id)'
+            if com_termo and fts:
+                sql += f' AND a.id IN (SELECT rowid FROM {ESQUEMA}.busca_pedidos WHERE busca_pedidos MATCH ?1)'
+            elif com_termo:
+                sql += ' AND (COALESCE(c.nome, a.cliente_nome) LIKE ?1 OR a.id LIKE ?1)'
+            if status:
+                sql += ' AND a.status = ?2'
+            if continuar:
+                sql += ' AND (a.data, a.id) < (?3, ?4)'
+            sql += ' ORDER BY a.data DESC, a.id DESC LIMIT ?5'
+            _PAGINAS[chave] = sql
+        return sql
+
+    def _precisa(self, quentes, status, limite):
+        """Indica se a página pode ter pedidos arquivados"""
+        if status and status not in STATUS_ARQUIVAVEIS:
+            return False
+        data_maxima = self.data_maxima()
+        if data_maxima is None:
+            return False
+        # Página cheia e toda mais nova que o arquivo: nada a anexar
+        return len(quentes) < limite or quentes[-1].data <= data_maxima
+
+    def pagina(self, termo='', status=None, depois_de=None, limite=100):
+        """Como ``PedidoRepo.pagina``, incluindo os pedidos arquivados
+
+        A página vem do banco principal; o arquivo só é consultado se
+        puder ter pedidos dentro dela, e as duas listas são intercaladas
+        por data e id decrescentes.
+        """
+        quentes = self.pedidos.pagina(termo, status, depois_de, limite)
+        if not self._precisa(quentes, status, limite):
+            return quentes
+
+        consulta = montar_consulta_fts(termo)
+        fts = self.pedidos.busca.disponivel
+        if consulta and not fts:
+            consulta = f'%{termo.strip()}%'
+        sql = self._sql_pagina(consulta is not None, fts, bool(status), depois_de is not None)
+        data, pedido_id = depois_de or (None, None)
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica
+            arquivados = cursor.execute(
+                sql, (consulta, status, data, pedido_id, limite)
+            ).fetchall()
+
+        intercalados = heapq.merge(
+            quentes, arquivados, key=lambda pedido: (pedido.data, pedido.id), reverse=True
+        )
+        return list(islice(intercalados, limite))
+
+    def pedido(self, pedido_id):
+        """Pedido arquivado no formato das listas, ou None"""
+        if not self.ativo():
+            return None
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica
+            return cursor.execute(SQL_PEDIDO_ARQUIVADO, (pedido_id,)).fetchone()
+
+    def itens(self, pedido_id):
+        """Itens de um pedido arquivado na ordem em que foram lançados"""
+        if not self.ativo():
+            return []
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica_item
+            return cursor.execute(SQL_ITENS_ARQUIVADOS, (pedido_id,)).fetchall()
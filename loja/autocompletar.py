@@ -0,0 +1,196 @@
+"""Sugestões por prefixo para os campos de cliente e produto
+
+O índice é um vetor ordenado de chaves em minúsculas e sem acentos, uma
+por palavra de cada nome ("Ana Conceição" gera "ana conceicao" e
+"conceicao"), então ``bisect`` acha em O(log n) os nomes que têm alguma
+palavra começando pelo texto digitado. Entre os candidatos ficam os de
+maior peso de uso (pedidos recentes e frequentes, ver
+``PedidoRepo.uso_clientes``); empates em ordem alfabética.
+
+O índice é refeito quando o catálogo muda (``loja.catalogo``); a
+classificação por peso, quando os pesos mudam. As respostas de cada
+texto ficam memorizadas e ``aquecer()`` calcula de antemão as de uma e
+duas letras, as únicas com faixas grandes.
+"""
+
+import heapq
+import unicodedata
+from bisect import bisect_left
+
+# Maior que qualquer caractere: ``prefixo + _FIM`` limita a faixa do prefixo
+_FIM = '\U0010ffff'
+
+# Respostas memorizadas por campo antes de esvaziar a memória
+_MEMORIA_MAXIMA = 2000
+
+
+def dobrar(texto):
+    """Minúsculas e sem acentos: ``"Conceição"`` → ``"conceicao"``"""
+    decomposto = unicodedata.normalize('NFKD', texto.casefold())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+class Classificacao:
+    """Ordem dos registros de um índice por peso de uso
+
+    ``ordem``: posições da mais usada para a menos usada;
+    ``lugares[posicao]``: lugar da posição nessa ordem (menor é melhor).
+    """
+
+    def __init__(self, registros, pesos):
+        self.ordem = sorted(
+            range(len(registros)),
+            key=lambda posicao: (-pesos.get(registros[posicao].id, 0.0), posicao)
+        )
+        self.lugares = [0] * len(registros)
+        for lugar, posicao in enumerate(self.ordem):
+            self.lugares[posicao] = lugar
+
+
+class IndicePrefixos:
+    """Índice imutável de registros (com ``id`` e ``nome``) por prefixo de palavra
+
+    Os registros devem vir em ordem de nome (como no catálogo).
+    """
+
+    def __init__(self, registros):
+        self.registros = registros
+        self._por_dobrado = {}
+        entradas = []
+        for posicao, registro in enumerate(registros):
+            palavras = dobrar(registro.nome).split()
+            self._por_dobrado.setdefault(' '.join(palavras), posicao)
+            for inicio in range(len(palavras)):
+                entradas.append((' '.join(palavras[inicio:]), posicao))
+        entradas.sort()
+        self._chaves = [chave for chave, _ in entradas]
+        self._posicoes = [posicao for _, posicao in entradas]
+
+    def __len__(self):
+        return len(self.registros)
+
+    def _faixa(self, prefixo):
+        """Posições (com repetição) dos registros com palavra começando por ``prefixo``"""
+        inicio = bisect_left(self._chaves, prefixo)
+        fim = bisect_left(self._chaves, prefixo + _FIM, inicio)
+        return self._posicoes[inicio:fim]
+
+    def _candidatos(self, palavras):
+        """Posições dos registros em que toda palavra digitada prefixa alguma palavra"""
+        # Começa pela palavra mais longa, que costuma dar a faixa mais estreita
+        palavras = sorted(set(palavras), key=len, reverse=True)
+        candidatos = set(self._faixa(palavras[0]))
+        for palavra in palavras[1:]:
+            if not candidatos:
+                break
+            candidatos = candidatos.intersection(self._faixa(palavra))
+        return candidatos
+
+    def prefixos_curtos(self):
+        """Prefixos de uma e duas letras presentes no índice"""
+        return sorted({chave[:tamanho] for chave in self._chaves for tamanho in (1, 2)})
+
+    def buscar(self, texto, limite=8, classificacao=None):
+        """Até ``limite`` registros para o texto, dos mais usados para os menos
+
+        Sem ``classificacao`` a ordem é alfabética.
+        """
+        palavras = dobrar(texto).split()
+        if not palavras:
+            ordem = classificacao.ordem if classificacao else range(len(self.registros))
+            melhores = ordem[:limite]
+        elif classificacao is None:
+            melhores = heapq.nsmallest(limite, self._candidatos(palavras))
+        else:
+            melhores = heapq.nsmallest(
+                limite, self._candidatos(palavras), key=classificacao.lugares.__getitem__
+            )
+        return [self.registros[posicao] for posicao in melhores]
+
+    def exato(self, texto):
+        """Registro cujo nome, sem acentos e maiúsculas, é igual ao texto"""
+        posicao = self._por_dobrado.get(' '.join(dobrar(texto).split()))
+        return None if posicao is None else self.registros[posicao]
+
+
+class Autocompletar:
+    """Sugestões de um catálogo (``CatalogoTabela``) ordenadas por uso"""
+
+    def __init__(self, catalogo, limite=8):
+        self.catalogo = catalogo
+        self.limite = limite
+        self.pesos = {}
+        self._indice = (None, None)
+        self._classificacao = (None, None, None)
+        self._memoria = {}
+
+    def indice(self):
+        """Índice do catálogo atual, refeito se o catálogo mudou"""
+        dados = self.catalogo.dados()
+        origem, indice = self._indice
+        if origem is not dados:
+            indice = IndicePrefixos(dados.registros)
+            self._indice = (dados, indice)
+            self._memoria = {}
+        return indice
+
+    def classificacao(self):
+        """Classificação do índice atual pelos pesos atuais"""
+        indice = self.indice()
+        pesos = self.pesos
+        origem, origem_pesos, classificacao = self._classificacao
+        if origem is not indice or origem_pesos is not pesos:
+            classificacao = Classificacao(indice.registros, pesos)
+            self._classificacao = (indice, pesos, classificacao)
+        return classificacao
+
+    def definir_pesos(self, pesos):
+        """Troca os pesos de uso ({id: peso})"""
+        self.pesos = pesos
+        self._memoria = {}
+
+    def registrar_uso(self, nome, peso=1.0):
+        """Soma ``peso`` ao registro escolhido agora (sobe nas próximas sugestões)"""
+        registro = self.catalogo.por_nome(nome)
+        if registro is not None:
+            pesos = dict(self.pesos)
+            pesos[registro.id] = pesos.get(registro.id, 0.0) + peso
+            self.definir_pesos(pesos)
+
+    def sugerir(self, texto, limite=None):
+        """Nomes sugeridos para o texto digitado (vazio: os mais usados)"""
+        classificacao = self.classificacao()
+        limite = limite or self.limite
+        chave = (' '.join(dobrar(texto).split()), limite)
+        memoria = self._memoria
+        nomes = memoria.get(chave)
+        if nomes is None:
+            if len(memoria) >= _MEMORIA_MAXIMA:
+                memoria.clear()
+            nomes = memoria[chave] = [
+                registro.nome for registro in self.indice().buscar(chave[0], limite, classificacao)
+            ]
+        return nomes
+
+    def aquecer(self):
+        """Calcula índice, classificação e as respostas de uma e duas letras"""
+        for prefixo in self.indice().prefixos_curtos():
+            self.sugerir(prefixo)
+        return len(self._memoria)
+
+    def resolver(self, texto):
+        """Nome cadastrado que o texto indica, ou None
+
+        Aceita o nome exato, o nome sem acentos/maiúsculas ou um texto
+        que tenha uma única sugestão.
+        """
+        texto = (texto or '').strip()
+        if not texto:
+            return None
+        if self.catalogo.por_nome(texto) is not None:
+            return texto
+        registro = self.indice().exato(texto)
+        if registro is not None:
+            return registro.nome
+        sugestoes = self.sugerir(texto, 2)
+        return sugestoes[0] if len(sugestoes) == 1 else None
@@ -0,0 +1,242 @@
+"""Backup online do banco com a API de backup do SQLite
+
+A cópia é feita em passos de ``paginas_por_passo`` páginas, então
+escritas concorrentes não produzem um arquivo corrompido e a interface
+não trava. O resultado é verificado com ``PRAGMA integrity_check``,
+pode ser comprimido com gzip e os backups antigos são apagados conforme
+a política de retenção (N diários e M semanais). O arquivo de pedidos
+antigos (``loja.arquivamento``) é copiado, verificado, mantido e
+restaurado junto com o banco.
+"""
+
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from loja.arquivamento import caminho_arquivo
+from loja.eventos import RECARREGAR, Alteracao
+
+
+def padrao_arquivo(prefixo):
+    """Nomes dos backups de um banco: ``<prefixo>_aaaammdd_hhmmss.db[.gz]``"""
+    return re.compile(rf'^{re.escape(prefixo)}_(\d{{8}}_\d{{6}})\.db(\.gz)?$')
+
+
+def arquivo_do_backup(caminho):
+    """Cópia do arquivo de pedidos feita junto com o backup ``caminho``"""
+    if caminho.endswith('.gz'):
+        return caminho_arquivo(caminho[:-3]) + '.gz'
+    return caminho_arquivo(caminho)
+
+
+def arquivos_do_backup(caminho):
+    """O backup e, se houver, a cópia do arquivo de pedidos"""
+    copia = arquivo_do_backup(caminho)
+    return [caminho, copia] if os.path.exists(copia) else [caminho]
+
+
+@contextmanager
+def descomprimido(caminho):
+    """Caminho do banco de um backup, descomprimido em arquivo temporário se ``.gz``"""
+    if not caminho.endswith('.gz'):
+        yield caminho
+        return
+    descritor, temporario = tempfile.mkstemp(suffix='.db')
+    try:
+        with os.fdopen(descritor, 'wb') as saida, gzip.open(caminho, 'rb') as entrada:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+        yield temporario
+    finally:
+        os.remove(temporario)
+
+
+class ErroBackup(Exception):
+    """Falha ao gerar ou verificar um backup"""
+
+
+class ServicoBackup:
+    """Gera, verifica e faz a retenção dos backups
+
+    Os arquivos levam o nome do banco (``loja.db`` → ``loja_<data>.db``):
+    a retenção só considera os backups deste banco.
+    """
+
+    def __init__(self, db, pasta=None, paginas_por_passo=256, comprimir=False,
+                 manter_diarios=7, manter_semanais=4):
+        self.db = db
+        if pasta is None:
+            pasta = os.path.join(os.path.dirname(os.path.abspath(db.db_path)), 'backup')
+        self.pasta = pasta
+        self.prefixo = os.path.splitext(os.path.basename(db.db_path))[0]
+        self._padrao = padrao_arquivo(self.prefixo)
+        self.paginas_por_passo = paginas_por_passo
+        self.comprimir = comprimir
+        self.manter_diarios = manter_diarios
+        self.manter_semanais = manter_semanais
+
+        self._lock = threading.Lock()
+
+    def executar(self, progresso=None):
+        """Faz o backup agora e retorna o caminho do arquivo gerado
+
+        ``progresso(copiadas, total)`` é chamado a cada passo, na thread
+        que executa o backup. Com pedidos arquivados, o arquivo de pedidos
+        é copiado logo depois para ``<backup>_arquivo.db`` (ver
+        ``arquivo_do_backup``).
+        """
+        with self._lock:
+            os.makedirs(self.pasta, exist_ok=True)
+            data_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
+            destino = os.path.join(self.pasta, f"{self.prefixo}_{data_hora}.db")
+
+            # Principal primeiro: um lote arquivado no meio do backup fica
+            # nas duas cópias (o histórico ignora a duplicata), nunca em nenhuma
+            copiado = self._copiar(self.db.db_path, destino, progresso)
+            arquivo = self.db.arquivo
+            if arquivo.ativo():
+                try:
+                    self._copiar(arquivo.caminho, caminho_arquivo(destino))
+                except Exception:
+                    os.remove(copiado)
+                    raise
+
+        self.aplicar_retencao()
+        return copiado
+
+    def _copiar(self, origem, destino, progresso=None):
+        """Copia um banco com a API de backup, confere e comprime; retorna o caminho final"""
+        parcial = destino + ".parcial"
+        fonte = sqlite3.connect(origem)
+        copia = sqlite3.connect(parcial)
+        try:
+            def ao_copiar(status, restantes, total):
+                if progresso:
+                    progresso(total - restantes, total)
+
+            fonte.backup(
+                copia,
+                pages=self.paginas_por_passo,
+                progress=ao_copiar,
+                sleep=0.01
+            )
+            # Backup autocontido, sem depender de arquivos -wal
+            copia.execute('PRAGMA journal_mode=DELETE')
+            resultado = copia.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            copia.close()
+            fonte.close()
+
+        if resultado != 'ok':
+            os.remove(parcial)
+            raise ErroBackup(f"Backup corrompido ({os.path.basename(origem)}): {resultado}")
+
+        if self.comprimir:
+            destino += ".gz"
+            with open(parcial, 'rb') as entrada, gzip.open(destino + ".parcial", 'wb') as saida:
+                shutil.copyfileobj(entrada, saida, 1024 * 1024)
+            os.remove(parcial)
+            parcial = destino + ".parcial"
+
+        os.replace(parcial, destino)
+        return destino
+
+    def verificar(self, caminho):
+        """Roda ``PRAGMA integrity_check`` em um backup e no arquivo de pedidos que o acompanha"""
+        return all(self._integro(copia) for copia in arquivos_do_backup(caminho))
+
+    def _integro(self, caminho):
+        with descomprimido(caminho) as banco:
+            conn = sqlite3.connect(f"file:{banco}?mode=ro", uri=True)
+            try:
+                return conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+            finally:
+                conn.close()
+
+    def restaurar(self, caminho):
+        """Substitui o conteúdo do banco e do arquivo de pedidos pelo de um backup
+
+        Os dois voltam juntos: se o backup não tem arquivo de pedidos, o
+        arquivo atual é esvaziado (seus pedidos são de outro momento). O
+        esquema restaurado é migrado e as telas são avisadas para recarregar.
+        """
+        if not self.verificar(caminho):
+            raise ErroBackup(f"Backup corrompido: {caminho}")
+        arquivo = self.db.arquivo
+        copia_arquivo = arquivo_do_backup(caminho)
+
+        with self._lock:
+            with descomprimido(caminho) as banco, self.db.get_connection() as conn:
+                fonte = sqlite3.connect(f"file:{banco}?mode=ro", uri=True)
+                try:
+                    fonte.backup(conn, pages=self.paginas_por_passo)
+                finally:
+                    fonte.close()
+
+            if os.path.exists(copia_arquivo):
+                with descomprimido(copia_arquivo) as banco:
+                    fonte = sqlite3.connect(f"file:{banco}?mode=ro", uri=True)
+                    destino = sqlite3.connect(arquivo.caminho, timeout=self.db.pool.timeout)
+                    try:
+                        fonte.backup(destino, pages=self.paginas_por_passo)
+                    finally:
+                        destino.close()
+                        fonte.close()
+            elif arquivo.ativo():
+                arquivo.limpar()
+
+        self.db.criar_banco_dados()
+        self.db.catalogo.invalidar()
+        for entidade in ('clientes', 'produtos', 'pedidos'):
+            self.db.eventos.publicar(Alteracao(entidade, RECARREGAR, None))
+
+    def listar(self):
+        """[(data_hora, caminho)] dos backups existentes, do mais novo ao mais antigo"""
+        if not os.path.isdir(self.pasta):
+            return []
+
+        backups = []
+        for nome in os.listdir(self.pasta):
+            encontrado = self._padrao.match(nome)
+            if encontrado:
+                data_hora = datetime.strptime(encontrado.group(1), "%Y%m%d_%H%M%S")
+                backups.append((data_hora, os.path.join(self.pasta, nome)))
+        backups.sort(reverse=True)
+        return backups
+
+    def aplicar_retencao(self):
+        """Mantém o mais novo de cada um dos últimos N dias e M semanas"""
+        backups = self.listar()
+        manter = set()
+        dias = set()
+        semanas = set()
+
+        for data_hora, caminho in backups:
+            dia = data_hora.date()
+            semana = dia.isocalendar()[:2]
+            if dia not in dias and len(dias) < self.manter_diarios:
+                dias.add(dia)
+                manter.add(caminho)
+            if semana not in semanas and len(semanas) < self.manter_semanais:
+                semanas.add(semana)
+                manter.add(caminho)
+
+        removidos = []
+        for _, caminho in backups:
+            if caminho not in manter:
+                for copia in arquivos_do_backup(caminho):
+                    os.remove(copia)
+                removidos.append(caminho)
+        return removidos
+
+    def executar_se_vencido(self, intervalo_horas=24):
+        """Faz o backup se o último tiver mais que o intervalo; retorna o caminho ou None"""
+        backups = self.listar()
+        if backups and (datetime.now() - backups[0][0]).total_seconds() < intervalo_horas * 3600:
+            return None
+        return self.executar()
@@ -0,0 +1,229 @@
+"""Medição dos caminhos mais usados, sem interface gráfica
+
+Uso: ``python -m loja.benchmark [--escala 1k|100k|1m] [--saida arquivo.json]``
+
+Gera um banco sintético determinístico (``loja.sinteticos``) em uma
+pasta temporária e mede listagem paginada, busca, resumo de entregas do
+tooltip, estatísticas, criação de pedidos, comandas e backup. O
+resultado é um JSON com mínimo, mediana e p95 de cada medição, para
+comparar versões na mesma máquina.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from loja import sinteticos
+from loja.autocompletar import Autocompletar, IndicePrefixos
+from loja.backup import ServicoBackup
+from loja.busca import BuscaTextual
+from loja.comandas import ServicoComandas
+from loja.database import DatabaseManager
+from loja.entregas import ResumoEntregas
+from loja.estatisticas import MotorEstatisticas
+from loja.medicao import medir
+from loja.paginacao import PaginadorPedidos
+from loja.repositorio import ClienteRepo, PedidoRepo, ProdutoRepo
+
+
+def cenarios(db, pasta, hoje):
+    """[(nome, função, repetições)] medidos sobre a cópia do banco gerado"""
+    busca = BuscaTextual(db)
+    resumo = ResumoEntregas(db, hoje=lambda: hoje)
+    motor = MotorEstatisticas(db)
+    comandas = ServicoComandas(db)
+    backup = ServicoBackup(db, pasta=os.path.join(pasta, 'backup'), manter_diarios=1, manter_semanais=0)
+    repo_clientes = ClienteRepo(db)
+    repo_produtos = ProdutoRepo(db)
+    repo_pedidos = PedidoRepo(db)
+
+    with db.get_connection() as conn:
+        cliente = conn.execute('SELECT nome FROM clientes ORDER BY id LIMIT 1').fetchone()[0]
+        produtos = [linha[0] for linha in conn.execute('SELECT nome FROM produtos ORDER BY id LIMIT 3')]
+        ids_pedidos = [linha[0] for linha in conn.execute('SELECT id FROM pedidos ORDER BY id DESC LIMIT 250')]
+
+    # Sugestões como no formulário de pedido, com os pesos de uso reais
+    sugestoes = Autocompletar(db.catalogo.clientes)
+    sugestoes.definir_pesos(repo_pedidos.uso_clientes(hoje.isoformat()))
+
+    def digitar_cliente():
+        indice, classificacao = sugestoes.indice(), sugestoes.classificacao()
+        for tamanho in range(1, len(cliente) + 1):
+            indice.buscar(cliente[:tamanho], sugestoes.limite, classificacao)
+
+    def listar_paginas(termo='', status=None, paginas=1):
+        def executar():
+            paginador = PaginadorPedidos(db)
+            paginador.reiniciar(termo, status)
+            for _ in range(paginas):
+                paginador.proxima_pagina()
+        return executar
+
+    def criar_pedidos(quantidade):
+        def executar():
+            db.criar_pedidos([
+                (cliente, hoje.isoformat(), [(produto, 2) for produto in produtos])
+                for _ in range(quantidade)
+            ])
+        return executar
+
+    return [
+        ("listagem_primeira_pagina", listar_paginas(), 50),
+        ("listagem_10_paginas", listar_paginas(paginas=10), 10),
+        ("listagem_status_pendente", listar_paginas(status='pendente'), 50),
+        ("listagem_busca_cliente", listar_paginas(termo=cliente.split()[0]), 20),
+        ("busca_clientes_prefixo", lambda: busca.clientes(cliente[:3]), 50),
+        ("busca_clientes_sem_acento", lambda: busca.clientes('joao'), 50),
+        ("busca_produtos", lambda: busca.produtos(produtos[0].split()[0]), 50),
+        ("busca_pedidos", lambda: busca.pedidos(produtos[0].split()[-1]), 20),
+        ("tooltip_carregar_resumo", resumo.carregar, 20),
+        ("tooltip_contagens", resumo.contagens, 200),
+        ("estatisticas_resumo", motor.carregar, 50),
+        ("estatisticas_receita_mensal", lambda: motor.receita_por_periodo('mes', 12), 50),
+        ("estatisticas_top_clientes", lambda: motor.top_clientes(10), 50),
+        ("repo_clientes_listar", repo_clientes.listar, 20),
+        ("repo_produtos_nomes", repo_produtos.nomes, 50),
+        ("catalogo_formulario_pedido", lambda: (
+            db.catalogo.clientes.nomes(), db.catalogo.produtos.nomes(), db.catalogo.precos()
+        ), 200),
+        ("catalogo_verificar", db.catalogo.verificar, 200),
+        ("autocompletar_indice_clientes", lambda: IndicePrefixos(db.catalogo.clientes.registros()), 10),
+        ("autocompletar_uso_clientes", lambda: repo_pedidos.uso_clientes(hoje.isoformat()), 10),
+        ("autocompletar_digitar_cliente", digitar_cliente, 50),
+        ("repo_pedido_com_itens", lambda: (
+            repo_pedidos.por_id(ids_pedidos[0]), repo_pedidos.itens(ids_pedidos[0])
+        ), 200),
+        ("repo_250_pedidos_com_itens", lambda: (
+            repo_pedidos.por_ids(ids_pedidos), repo_pedidos.itens_de(ids_pedidos)
+        ), 20),
+        ("comandas_entregas_do_dia", lambda: [
+            comandas.renderizar(pedido, itens)
+            for pedido, itens in comandas.pedidos(data_entrega=hoje.isoformat(), status='pendente')
+        ], 10),
+        # Escritas por último, para as leituras medirem o banco gerado
+        ("criar_pedido", criar_pedidos(1), 50),
+        ("criar_100_pedidos", criar_pedidos(100), 5),
+        ("backup", backup.executar, 3),
+    ]
+
+
+def gerar_original(caminho, tamanhos, semente, progresso=None):
+    """Gera o banco intocado dos cenários em ``caminho``, se ainda não existir
+
+    O banco é montado com outro nome e renomeado no fim, então uma geração
+    interrompida não é reaproveitada. Um banco existente com outras
+    quantidades (de outra versão, ou alterado) é recusado. Retorna os
+    segundos gastos gerando (0 se reaproveitado).
+    """
+    if os.path.exists(caminho):
+        conn = sqlite3.connect(caminho)
+        try:
+            existentes = {
+                tabela: conn.execute(f'SELECT COUNT(*) FROM {tabela}').fetchone()[0]
+                for tabela in ('clientes', 'produtos', 'pedidos')
+            }
+        finally:
+            conn.close()
+        esperados = {tabela: tamanhos[tabela] for tabela in existentes}
+        if existentes != esperados:
+            raise RuntimeError(f"{caminho} tem {existentes}, esperado {esperados}; use outra pasta")
+        return 0.0
+
+    inicio = time.perf_counter()
+    parcial = caminho + '.gerando'
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(parcial + sufixo):
+            os.remove(parcial + sufixo)
+    db = DatabaseManager(parcial)
+    try:
+        sinteticos.gerar(db, semente=semente, progresso=progresso, **tamanhos)
+        with db.get_connection() as conn:
+            conn.execute('ANALYZE')
+    finally:
+        # Fechar a última conexão passa o WAL para o arquivo principal
+        db.fechar()
+    os.replace(parcial, caminho)
+    return time.perf_counter() - inicio
+
+
+def executar(escala='1k', semente=42, pasta=None, manter=False, filtro=None, progresso=None):
+    """Gera o banco, roda os cenários e retorna o resultado como dicionário
+
+    Os cenários rodam sobre uma cópia descartável do banco gerado, que
+    nunca é alterado: com ``pasta`` ele é reaproveitado entre execuções
+    e toda execução parte dos mesmos dados.
+    """
+    tamanhos = sinteticos.ESCALAS[escala]
+    temporaria = pasta is None
+    pasta = pasta or tempfile.mkdtemp(prefix='loja_benchmark_')
+    os.makedirs(pasta, exist_ok=True)
+    original = os.path.join(pasta, f'benchmark_{escala}_{semente}.db')
+    execucao = tempfile.mkdtemp(prefix='execucao_', dir=pasta)
+
+    try:
+        geracao = gerar_original(original, tamanhos, semente, progresso)
+        copia = os.path.join(execucao, os.path.basename(original))
+        shutil.copyfile(original, copia)
+
+        db = DatabaseManager(copia)
+        try:
+            resultados = {}
+            for nome, funcao, repeticoes in cenarios(db, execucao, sinteticos.DATA_REFERENCIA):
+                if filtro and filtro not in nome:
+                    continue
+                resultados[nome] = medir(funcao, repeticoes)
+                if progresso:
+                    progresso(nome)
+        finally:
+            db.fechar()
+    finally:
+        shutil.rmtree(execucao, ignore_errors=True)
+        if temporaria and not manter:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    return {
+        "escala": escala,
+        "semente": semente,
+        "tamanhos": tamanhos,
+        "geracao_segundos": round(geracao, 2),
+        "ambiente": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "sistema": platform.platform(),
+        },
+        "data": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "resultados": resultados,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loja.benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("--escala", choices=sorted(sinteticos.ESCALAS), default="1k")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--pasta", help="pasta do banco gerado (reaproveitado entre execuções; criada se não existir)")
+    parser.add_argument("--manter", action="store_true", help="não apagar a pasta temporária")
+    parser.add_argument("--filtro", help="só cenários cujo nome contém o texto")
+    parser.add_argument("--saida", help="arquivo JSON (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+
+    def progresso(etapa):
+        print(f"... {etapa}", file=sys.stderr, flush=True)
+
+    resultado = executar(args.escala, args.semente, args.pasta, args.manter, args.filtro, progresso)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Busca textual de clientes, produtos e pedidos
+
+Usa os índices FTS5 criados na migração 3 (sem acentos e por prefixo).
+Se o SQLite não tiver FTS5 a busca volta para ``LIKE``, mais lenta.
+"""
+
+import re
+
+_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+
+def montar_consulta_fts(termo):
+    """Converte o texto digitado em uma consulta FTS5 por prefixo
+
+    ``"jo sil"`` vira ``"jo"* "sil"*``: todas as palavras precisam casar
+    com o início de alguma palavra do documento. Retorna ``None`` se não
+    sobrar nenhuma palavra.
+    """
+    palavras = _PALAVRA.findall(termo or '')
+    if not palavras:
+        return None
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+class BuscaTextual:
+    """Consultas ranqueadas e limitadas sobre os índices de busca"""
+
+    def __init__(self, db):
+        self.db = db
+        self._disponivel = None
+
+    @property
+    def disponivel(self):
+        """Indica se os índices FTS5 existem neste banco"""
+        if self._disponivel is None:
+            with self.db.get_connection() as conn:
+                self._disponivel = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'busca_pedidos'"
+                ).fetchone() is not None
+        return self._disponivel
+
+    def clientes(self, termo, limite=50):
+        """Clientes por nome, telefone ou endereço: (id, nome, telefone, endereco)"""
+        consulta = montar_consulta_fts(termo)
+        if not consulta:
+            return []
+
+        with self.db.get_connection() as conn:
+            if self.disponivel:
+                return conn.execute('''
+                    SELECT c.id, c.nome, c.telefone, c.endereco
+                    FROM busca_clientes
+                    JOIN clientes c ON c.id = busca_clientes.rowid
+                    WHERE busca_clientes MATCH ?
+                    ORDER BY bm25(busca_clientes, 10.0, 2.0, 1.0)
+                    LIMIT ?
+                ''', (consulta, limite)).fetchall()
+
+            padrao = f'%{termo.strip()}%'
+            return conn.execute('''
+                SELECT id, nome, telefone, endereco
+                FROM clientes
+                WHERE nome LIKE ? OR telefone LIKE ? OR endereco LIKE ?
+                ORDER BY nome
+                LIMIT ?
+            ''', (padrao, padrao, padrao, limite)).fetchall()
+
+    def produtos(self, termo, limite=50):
+        """Produtos por nome: (id, nome, preco)"""
+        consulta = montar_consulta_fts(termo)
+        if not consulta:
+            return []
+
+        with self.db.get_connection() as conn:
+            if self.disponivel:
+                return conn.execute('''
+                    SELECT p.id, p.nome, p.preco
+                    FROM busca_produtos
+                    JOIN produtos p ON p.id = busca_produtos.rowid
+                    WHERE busca_produtos MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ''', (consulta, limite)).fetchall()
+
+            return conn.execute('''
+                SELECT id, nome, preco FROM produtos
+                WHERE nome LIKE ?
+                ORDER BY nome
+                LIMIT ?
+            ''', (f'%{termo.strip()}%', limite)).fetchall()
+
+    def pedidos(self, termo, limite=50):
+        """Pedidos por número, cliente ou produto: (id, data, cliente_nome, data_entrega, status, total)"""
+        consulta = montar_consulta_fts(termo)
+        if not consulta:
+            return []
+
+        with self.db.get_connection() as conn:
+            if self.disponivel:
+                return conn.execute('''
+                    SELECT p.id, p.data, c.nome, p.data_entrega, p.status, p.total
+                    FROM busca_pedidos
+                    JOIN pedidos p ON p.id = busca_pedidos.rowid
+                    JOIN clientes c ON c.id = p.cliente_id
+                    WHERE busca_pedidos MATCH ?
+                    ORDER BY bm25(busca_pedidos, 5.0, 3.0, 1.0)
+                    LIMIT ?
+                ''', (consulta, limite)).fetchall()
+
+            padrao = f'%{termo.strip()}%'
+            return conn.execute('''
+                SELECT p.id, p.data, c.nome, p.data_entrega, p.status, p.total
+                FROM pedidos p
+                JOIN clientes c ON c.id = p.cliente_id
+                WHERE c.nome LIKE ? OR p.id LIKE ?
+                ORDER BY p.data DESC, p.id DESC
+                LIMIT ?
+            ''', (padrao, padrao, limite)).fetchall()
+
+    def filtro_pedidos(self, termo):
+        """Trecho SQL e parâmetros para restringir ``pedidos`` ao termo buscado
+
+        Usado pela paginação, que mantém a própria ordenação por data;
+        espera ``pedidos p JOIN clientes c``.
+        """
+        consulta = montar_consulta_fts(termo)
+        if not consulta:
+            return '', []
+        if self.disponivel:
+            return ' AND p.id IN (SELECT rowid FROM busca_pedidos WHERE busca_pedidos MATCH ?)', [consulta]
+        padrao = f'%{termo.strip()}%'
+        return ' AND (c.nome LIKE ? OR p.id LIKE ?)', [padrao, padrao]
@@ -0,0 +1,153 @@
+"""Pesquisa enquanto digita: debounce, thread de trabalho e cancelamento
+
+Cada tecla chama ``submeter(termo)``. Uma única thread espera a digitação
+parar por ``atraso`` segundos, executa a consulta e entrega o resultado à
+interface por ``entregar`` (``Clock.schedule_once`` no Kivy, ``after`` no
+Tk). Uma tecla nova interrompe a consulta em andamento
+(``Connection.interrupt``) e resultados antigos nunca são aplicados.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from loja.medicao import percentil
+
+
+class BuscaAssincrona:
+    """Executa ``consultar(termo)`` fora da thread da interface"""
+
+    def __init__(self, db, consultar, aplicar, entregar, atraso=0.1, amostras=200):
+        self.db = db
+        self.consultar = consultar
+        self.aplicar = aplicar
+        self.entregar = entregar
+        self.atraso = atraso
+
+        self._cond = threading.Condition()
+        self._geracao = 0
+        self._pendente = None
+        self._ultimo_toque = 0.0
+        self._conn_em_consulta = None
+        self._parar = False
+        self._thread = None
+
+        # Métricas (em segundos)
+        self._latencias = deque(maxlen=amostras)
+        self._processamento = deque(maxlen=amostras)
+        self.descartadas = 0
+        self.canceladas = 0
+        self.erros = 0
+
+    def submeter(self, termo):
+        """Registra uma tecla; só o termo mais recente será aplicado"""
+        agora = time.perf_counter()
+        with self._cond:
+            self._geracao += 1
+            self._pendente = (self._geracao, termo, agora)
+            self._ultimo_toque = agora
+
+            # Consulta antiga em andamento não serve mais
+            if self._conn_em_consulta is not None:
+                self._conn_em_consulta.interrupt()
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._trabalhar,
+                    name="busca-assincrona",
+                    daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def parar(self):
+        """Encerra a thread de trabalho"""
+        with self._cond:
+            self._parar = True
+            if self._conn_em_consulta is not None:
+                self._conn_em_consulta.interrupt()
+            self._cond.notify()
+
+    def _proximo_pedido(self):
+        """Espera uma tecla e o fim do intervalo de debounce"""
+        with self._cond:
+            while self._pendente is None and not self._parar:
+                self._cond.wait()
+
+            while not self._parar:
+                restante = self._ultimo_toque + self.atraso - time.perf_counter()
+                if restante <= 0:
+                    break
+                self._cond.wait(restante)
+
+            if self._parar:
+                return None
+            pedido, self._pendente = self._pendente, None
+            return pedido
+
+    def _trabalhar(self):
+        while True:
+            pedido = self._proximo_pedido()
+            if pedido is None:
+                return
+            geracao, termo, inicio = pedido
+
+            inicio_consulta = time.perf_counter()
+            try:
+                with self.db.get_connection() as conn:
+                    with self._cond:
+                        if geracao != self._geracao:
+                            self.descartadas += 1
+                            continue
+                        self._conn_em_consulta = conn
+                    try:
+                        resultado = self.consultar(termo)
+                    finally:
+                        with self._cond:
+                            self._conn_em_consulta = None
+            except sqlite3.OperationalError as e:
+                if "interrupt" in str(e):
+                    self.canceladas += 1
+                else:
+                    self.erros += 1
+                continue
+            except Exception:
+                self.erros += 1
+                continue
+
+            if geracao != self._geracao:
+                self.descartadas += 1
+                continue
+
+            self.entregar(
+                lambda g=geracao, r=resultado, i=inicio, c=inicio_consulta:
+                    self._aplicar(g, r, i, c)
+            )
+
+    def _aplicar(self, geracao, resultado, inicio, inicio_consulta):
+        """Roda na thread da interface; ignora resultados ultrapassados"""
+        if geracao != self._geracao:
+            self.descartadas += 1
+            return
+
+        self.aplicar(resultado)
+        fim = time.perf_counter()
+        self._latencias.append(fim - inicio)
+        self._processamento.append(fim - inicio_consulta)
+
+    def metricas(self):
+        """Latência tecla→tela e consulta→tela (p50/p95, em ms) e contadores"""
+        latencias = list(self._latencias)
+        processamento = list(self._processamento)
+        return {
+            "amostras": len(latencias),
+            "tecla_ate_tela_p50_ms": percentil(latencias, 50) * 1000,
+            "tecla_ate_tela_p95_ms": percentil(latencias, 95) * 1000,
+            "consulta_ate_tela_p50_ms": percentil(processamento, 50) * 1000,
+            "consulta_ate_tela_p95_ms": percentil(processamento, 95) * 1000,
+            "debounce_ms": self.atraso * 1000,
+            "descartadas": self.descartadas,
+            "canceladas": self.canceladas,
+            "erros": self.erros,
+        }
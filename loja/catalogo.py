@@ -0,0 +1,137 @@
+"""Cópia em memória dos cadastros de clientes e produtos
+
+Formulários e validação de pedidos leem nomes, registros e preços daqui
+sem consultar o banco. Cada tabela é recarregada por inteiro na primeira
+leitura depois de uma invalidação:
+
+- escritas deste processo invalidam pelo barramento de alterações;
+- escritas de outros processos são detectadas por ``verificar()``: o
+  ``PRAGMA data_version`` da conexão sentinela do pool muda a cada
+  commit alheio e, só então, a versão de cada tabela (mantida por
+  gatilhos em ``versoes_tabelas``) diz qual cadastro mudou.
+"""
+
+import threading
+from collections import namedtuple
+
+from loja.repositorio import ClienteRepo, ProdutoRepo
+
+# ``registros`` e ``nomes`` em ordem de nome (mesma ordem do ``ORDER BY nome``)
+Dados = namedtuple('Dados', 'registros nomes por_id por_nome versao')
+
+SQL_VERSAO = 'SELECT versao FROM versoes_tabelas WHERE tabela = ?'
+SQL_VERSOES = 'SELECT tabela, versao FROM versoes_tabelas'
+
+
+class CatalogoTabela:
+    """Cache de leitura de uma tabela de cadastro"""
+
+    def __init__(self, db, repo, tabela):
+        self.db = db
+        self.repo = repo
+        self.tabela = tabela
+        self._lock = threading.Lock()
+        self._dados = None
+        self._geracao = 0
+        self.recargas = 0
+        db.eventos.assinar(tabela, lambda alteracao: self.invalidar())
+
+    def invalidar(self):
+        """Descarta a cópia; a próxima leitura recarrega"""
+        with self._lock:
+            self._dados = None
+            self._geracao += 1
+
+    def dados(self):
+        """Registros, nomes e mapas atuais (``Dados``), carregando se preciso"""
+        dados = self._dados
+        if dados is not None:
+            return dados
+
+        with self._lock:
+            geracao = self._geracao
+        # Versão lida antes das linhas: uma escrita no meio só causa uma
+        # recarga a mais na próxima verificação, nunca uma cópia velha
+        with self.db.get_connection() as conn:
+            linha = conn.execute(SQL_VERSAO, (self.tabela,)).fetchone()
+            registros = tuple(self.repo.listar())
+        dados = Dados(
+            registros,
+            tuple(registro.nome for registro in registros),
+            {registro.id: registro for registro in registros},
+            {registro.nome: registro for registro in registros},
+            linha[0] if linha else None
+        )
+        with self._lock:
+            self.recargas += 1
+            # Invalidada durante a leitura: entrega, mas não guarda
+            if self._geracao == geracao:
+                self._dados = dados
+        return dados
+
+    def registros(self):
+        """Registros em ordem de nome"""
+        return self.dados().registros
+
+    def nomes(self):
+        """Nomes em ordem"""
+        return self.dados().nomes
+
+    def por_id(self, registro_id):
+        """Registro com o id ou None"""
+        return self.dados().por_id.get(registro_id)
+
+    def por_nome(self, nome):
+        """Registro com o nome exato ou None"""
+        return self.dados().por_nome.get(nome)
+
+
+class Catalogo:
+    """Catálogos de clientes e produtos de um ``DatabaseManager``"""
+
+    def __init__(self, db):
+        self.db = db
+        self.clientes = CatalogoTabela(db, ClienteRepo(db), 'clientes')
+        self.produtos = CatalogoTabela(db, ProdutoRepo(db), 'produtos')
+        self._precos = (None, {})
+        self._versao_dados = None
+
+    def tabelas(self):
+        """Catálogos mantidos, na ordem de verificação"""
+        return (self.clientes, self.produtos)
+
+    def precos(self):
+        """Mapa nome do produto → preço em centavos"""
+        dados = self.produtos.dados()
+        origem, precos = self._precos
+        if origem is not dados:
+            precos = {nome: produto.preco for nome, produto in dados.por_nome.items()}
+            self._precos = (dados, precos)
+        return precos
+
+    def invalidar(self):
+        """Descarta todas as cópias (ex.: arquivo do banco substituído)"""
+        self._versao_dados = None
+        for tabela in self.tabelas():
+            tabela.invalidar()
+
+    def verificar(self):
+        """Invalida as tabelas alteradas por outro processo; retorna quantas
+
+        Sem commits alheios desde a última chamada custa só o
+        ``PRAGMA data_version`` da conexão sentinela.
+        """
+        versao_dados = self.db.pool.versao_dados()
+        if versao_dados == self._versao_dados:
+            return 0
+        self._versao_dados = versao_dados
+
+        with self.db.get_connection() as conn:
+            versoes = dict(conn.execute(SQL_VERSOES).fetchall())
+        invalidadas = 0
+        for tabela in self.tabelas():
+            dados = tabela._dados
+            if dados is not None and dados.versao != versoes.get(tabela.tabela):
+                tabela.invalidar()
+                invalidadas += 1
+        return invalidadas
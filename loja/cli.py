@@ -0,0 +1,260 @@
+"""Linha de comando para manutenção sem interface gráfica
+
+Uso: ``python -m loja [--banco ARQUIVO] COMANDO [opções]``
+
+Cada comando imprime uma linha JSON com ``comando``, ``ok``,
+``segundos`` e ``resultado`` (ou ``erro``) e termina com código 0 em
+caso de sucesso, próprio para rodar pelo cron. Nenhum toolkit gráfico é
+importado.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date
+
+from loja import importacao, migracoes
+from loja.arquivamento import DIAS_PADRAO
+from loja.backup import ServicoBackup, arquivos_do_backup
+from loja.comandas import FALHOU, ServicoComandas
+from loja.database import DatabaseManager
+from loja.datas import atualizar_formato_datas, normalizar_datas
+from loja.estatisticas import MotorEstatisticas
+from loja.protocolo import HOST_PADRAO, PORTA_PADRAO
+from loja.servidor import LOTE_ESCRITA, servir
+
+
+def cmd_backup(db, args):
+    servico = ServicoBackup(
+        db,
+        pasta=args.pasta,
+        comprimir=args.comprimir,
+        manter_diarios=args.manter_diarios,
+        manter_semanais=args.manter_semanais
+    )
+    caminho = servico.executar()
+    return {
+        "arquivo": caminho,
+        "copias": arquivos_do_backup(caminho),
+        "verificado": servico.verificar(caminho),
+    }
+
+
+def cmd_restaurar(db, args):
+    if not args.confirmar:
+        raise ValueError("Use --confirmar para substituir o banco pelo backup")
+    servico = ServicoBackup(db)
+    servico.restaurar(args.backup)
+    return {"restaurado": arquivos_do_backup(args.backup)}
+
+
+def cmd_estatisticas(db, args):
+    motor = MotorEstatisticas(db)
+    return {
+        "resumo": motor.resumo(),
+        "receita": motor.receita_por_periodo(args.periodo, args.limite),
+        "status": motor.pedidos_por_status(),
+        "top_clientes": motor.top_clientes(args.top),
+        "top_produtos": motor.top_produtos(args.top),
+    }
+
+
+def cmd_atualizar_datas(db, args):
+    if args.continuar:
+        return {"alteradas": normalizar_datas(db, lote=args.lote)}
+    return {"alteradas": atualizar_formato_datas(db, lote=args.lote)}
+
+
+def cmd_verificar(db, args):
+    with db.get_connection() as conn:
+        integridade = [linha[0] for linha in conn.execute('PRAGMA integrity_check')]
+        chaves = conn.execute('PRAGMA foreign_key_check').fetchall()
+        versao = migracoes.versao_atual(conn)
+
+        indices_busca = []
+        for tabela in ('busca_clientes', 'busca_produtos', 'busca_pedidos'):
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (tabela,)).fetchone():
+                conn.execute(f"INSERT INTO {tabela}({tabela}) VALUES ('integrity-check')")
+                indices_busca.append(tabela)
+
+    # Arquivo de pedidos antigos, se existir
+    arquivo = db.arquivo.verificar()
+    arquivo_ok = arquivo is None or (
+        arquivo["integrity_check"] == ['ok'] and not arquivo["foreign_key_check"]
+    )
+    ok = integridade == ['ok'] and not chaves and arquivo_ok
+    return {
+        "ok": ok,
+        "integrity_check": integridade,
+        "foreign_key_check": chaves,
+        "arquivo": arquivo,
+        "indices_busca_verificados": indices_busca,
+        "versao_esquema": versao,
+        "versao_esperada": migracoes.versao_mais_recente(),
+    }
+
+
+def cmd_migrar(db, args):
+    # O DatabaseManager já aplica as migrações ao abrir o banco
+    with db.get_connection() as conn:
+        return {"versao_esquema": migracoes.versao_atual(conn)}
+
+
+def cmd_importar(db, args):
+    relatorio = importacao.importar_arquivo(
+        db, args.entidade, args.arquivo,
+        formato=args.formato, lote=args.lote, simular=args.simular
+    )
+    return relatorio.como_dict()
+
+
+def cmd_exportar(db, args):
+    return importacao.exportar(db, args.entidade, args.arquivo, formato=args.formato).como_dict()
+
+
+def cmd_comandas(db, args):
+    servico = ServicoComandas(db, escpos=args.escpos, impressora=args.impressora)
+    filtros = {
+        "ids": args.pedido or None,
+        "data_entrega": None if args.pedido else (args.data or date.today().isoformat()),
+        "status": None if args.pedido else args.status,
+    }
+
+    if args.saida:
+        pedidos = servico.pedidos(**filtros)
+        with open(args.saida, 'wb') as arquivo:
+            for pedido, itens in pedidos:
+                arquivo.write(servico.documento(pedido, itens))
+                if not args.escpos:
+                    arquivo.write(b"\n")
+        return {"comandas": len(pedidos), "arquivo": args.saida}
+
+    trabalhos = servico.imprimir(**filtros)
+    servico.fila.aguardar()
+    falhas = [t.como_dict() for t in trabalhos if t.status == FALHOU]
+    return {"ok": not falhas, "comandas": len(trabalhos), "falhas": falhas}
+
+
+def cmd_limpar_pedidos(db, args):
+    if not args.confirmar:
+        raise ValueError("Use --confirmar para remover todos os pedidos")
+    db.remover_todos_pedidos()
+    return {"removidos": True}
+
+
+def cmd_arquivar(db, args):
+    arquivados = db.arquivo.arquivar(dias=args.dias, lote=args.lote)
+    return {"arquivados": arquivados, "arquivo": db.arquivo.caminho}
+
+
+def cmd_servidor(db, args):
+    return servir(db, host=args.host, porta=args.porta, lote_escrita=args.lote)
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m loja",
+        description="Manutenção do banco do Sistema de Loja"
+    )
+    parser.add_argument("--banco", help="arquivo do banco (padrão: sistema_loja.db)")
+    parser.add_argument("--perfil", metavar="ARQUIVO", help="grava em JSON o perfil das consultas do comando")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("backup", help="backup online verificado")
+    p.add_argument("--pasta", help="pasta de destino (padrão: backup/ ao lado do banco)")
+    p.add_argument("--comprimir", action="store_true", help="gravar .db.gz")
+    p.add_argument("--manter-diarios", type=int, default=7)
+    p.add_argument("--manter-semanais", type=int, default=4)
+    p.set_defaults(funcao=cmd_backup)
+
+    p = sub.add_parser("restaurar", help="volta o banco e o arquivo de pedidos a um backup")
+    p.add_argument("backup", help="arquivo .db ou .db.gz gerado pelo comando backup")
+    p.add_argument("--confirmar", action="store_true")
+    p.set_defaults(funcao=cmd_restaurar)
+
+    p = sub.add_parser("estatisticas", help="totais, séries e rankings")
+    p.add_argument("--periodo", choices=("dia", "semana", "mes"), default="mes")
+    p.add_argument("--limite", type=int, default=12, help="quantidade de períodos")
+    p.add_argument("--top", type=int, default=10)
+    p.set_defaults(funcao=cmd_estatisticas)
+
+    p = sub.add_parser("atualizar-datas", help="normaliza as datas dos pedidos")
+    p.add_argument("--lote", type=int, default=2000)
+    p.add_argument("--continuar", action="store_true", help="retoma a conversão interrompida")
+    p.set_defaults(funcao=cmd_atualizar_datas)
+
+    p = sub.add_parser("verificar", help="verificação de integridade")
+    p.set_defaults(funcao=cmd_verificar)
+
+    p = sub.add_parser("migrar", help="aplica migrações pendentes do esquema")
+    p.set_defaults(funcao=cmd_migrar)
+
+    for nome, funcao, ajuda in (
+        ("importar", cmd_importar, "importa CSV ou JSON Lines"),
+        ("exportar", cmd_exportar, "exporta CSV ou JSON Lines"),
+    ):
+        p = sub.add_parser(nome, help=ajuda)
+        p.add_argument("entidade", choices=importacao.ENTIDADES)
+        p.add_argument("arquivo")
+        p.add_argument("--formato", choices=("csv", "jsonl"))
+        if nome == "importar":
+            p.add_argument("--lote", type=int, default=1000)
+            p.add_argument("--simular", action="store_true", help="valida sem gravar")
+        p.set_defaults(funcao=funcao)
+
+    p = sub.add_parser("comandas", help="imprime as comandas das entregas do dia")
+    p.add_argument("--data", help="data de entrega aaaa-mm-dd (padrão: hoje)")
+    p.add_argument("--status", default="pendente")
+    p.add_argument("--pedido", type=int, action="append", help="id do pedido (pode repetir)")
+    p.add_argument("--escpos", action="store_true", help="bytes ESC/POS para impressora térmica")
+    p.add_argument("--impressora", help="nome da impressora para o lpr")
+    p.add_argument("--saida", help="grava as comandas no arquivo em vez de imprimir")
+    p.set_defaults(funcao=cmd_comandas)
+
+    p = sub.add_parser("arquivar", help="move pedidos encerrados antigos para o arquivo")
+    p.add_argument("--dias", type=int, default=DIAS_PADRAO, help="idade mínima do pedido")
+    p.add_argument("--lote", type=int, default=200, help="pedidos por transação")
+    p.set_defaults(funcao=cmd_arquivar)
+
+    p = sub.add_parser("servidor", help="atende os terminais com LOJA_SERVIDOR=host:porta")
+    p.add_argument("--host", default=HOST_PADRAO, help="0.0.0.0 aceita outros computadores da rede")
+    p.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    p.add_argument("--lote", type=int, default=LOTE_ESCRITA, help="escritas gravadas por commit")
+    p.set_defaults(funcao=cmd_servidor)
+
+    p = sub.add_parser("limpar-pedidos", help="remove todos os pedidos")
+    p.add_argument("--confirmar", action="store_true")
+    p.set_defaults(funcao=cmd_limpar_pedidos)
+
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    inicio = time.perf_counter()
+    saida = {"comando": args.comando}
+
+    try:
+        db = DatabaseManager(args.banco)
+        if args.perfil:
+            db.perfil.ativar()
+        try:
+            resultado = args.funcao(db, args)
+        finally:
+            if args.perfil:
+                db.perfil.salvar_json(args.perfil)
+            db.fechar()
+        saida["ok"] = not (isinstance(resultado, dict) and resultado.get("ok") is False)
+        saida["resultado"] = resultado
+    except Exception as e:
+        saida["ok"] = False
+        saida["erro"] = f"{type(e).__name__}: {e}"
+
+    saida["segundos"] = round(time.perf_counter() - inicio, 3)
+    print(json.dumps(saida, ensure_ascii=False, default=str))
+    return 0 if saida["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
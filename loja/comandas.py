@@ -0,0 +1,351 @@
+"""Comandas de pedido: modelo compilado, impressão em lote e fila
+
+Os modelos são textos com campos ``{nome}`` analisados uma única vez e
+guardados em cache. Vários pedidos são carregados com uma só consulta
+(pedidos + itens) e cada comanda vira um trabalho da ``FilaImpressao``,
+que envia para a impressora em segundo plano, com novas tentativas e
+status por trabalho. A saída pode ser texto puro ou bytes ESC/POS para
+impressoras térmicas.
+"""
+
+import itertools
+import os
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from functools import lru_cache, partial
+from queue import Queue
+
+from loja.datas import data_br
+from loja.dinheiro import formatar
+
+LARGURA = 40
+
+MODELO_PADRAO = """\
+{linha_dupla}
+{titulo}
+{linha_dupla}
+
+Pedido #: {id}
+Cliente: {cliente}
+Data: {data}
+Entrega: {entrega}
+Status: {status}
+{linha}
+
+ITENS DO PEDIDO:
+{linha}
+{itens}
+{linha}
+Total: {total}
+{linha_dupla}
+"""
+
+MODELO_ITEM = "{produto}\n  {quantidade} x {preco_unitario} = {total}"
+
+CAMPOS_PEDIDO = frozenset((
+    'linha', 'linha_dupla', 'titulo', 'id', 'cliente', 'data', 'entrega',
+    'status', 'itens', 'total'
+))
+CAMPOS_ITEM = frozenset(('produto', 'quantidade', 'preco_unitario', 'total'))
+
+# Comandos ESC/POS
+ESC_INICIAR = b'\x1b@'
+ESC_PAGINA_PC860 = b'\x1bt\x03'
+ESC_CENTRO = b'\x1ba\x01'
+ESC_ESQUERDA = b'\x1ba\x00'
+ESC_NEGRITO = b'\x1bE\x01'
+ESC_SEM_NEGRITO = b'\x1bE\x00'
+ESC_AVANCAR = b'\x1bd\x04'
+GS_CORTAR = b'\x1dVB\x00'
+
+# Pedidos por consulta (abaixo do limite de parâmetros do SQLite)
+PEDIDOS_POR_CONSULTA = 500
+
+AGUARDANDO = 'aguardando'
+IMPRIMINDO = 'imprimindo'
+IMPRESSO = 'impresso'
+FALHOU = 'falhou'
+
+
+@lru_cache(maxsize=32)
+def compilar(modelo, campos=CAMPOS_PEDIDO):
+    """Analisa o modelo uma vez: ((literal, campo, formato), ...)
+
+    Campos desconhecidos geram ``ValueError`` aqui, e não na impressão.
+    """
+    partes = []
+    for literal, campo, formato, conversao in string.Formatter().parse(modelo):
+        if campo is not None and campo not in campos:
+            raise ValueError(f"Campo desconhecido no modelo: {{{campo}}}")
+        partes.append((literal, campo, formato or ''))
+    return tuple(partes)
+
+
+def preencher(partes, valores):
+    """Monta o texto de um modelo compilado"""
+    return ''.join(
+        literal + (format(valores[campo], formato) if campo is not None else '')
+        for literal, campo, formato in partes
+    )
+
+
+def documento_escpos(texto, titulo=None):
+    """Converte a comanda em bytes ESC/POS (página de código PC860, com corte)"""
+    saida = [ESC_INICIAR, ESC_PAGINA_PC860]
+    for linha in texto.splitlines():
+        if titulo and linha.strip() == titulo:
+            saida += [ESC_CENTRO, ESC_NEGRITO, titulo.encode('cp860', errors='replace'),
+                      b'\n', ESC_SEM_NEGRITO, ESC_ESQUERDA]
+        else:
+            saida.append(linha.encode('cp860', errors='replace') + b'\n')
+    saida += [ESC_AVANCAR, GS_CORTAR]
+    return b''.join(saida)
+
+
+def enviar_para_impressora(dados, impressora=None, bruto=False):
+    """Envia bytes para a impressora padrão (ou ``impressora``)
+
+    Fora do Windows os dados vão pela entrada do ``lpr``, sem arquivo
+    temporário. No Windows o arquivo é apagado depois que o spooler o leu.
+    """
+    if sys.platform == 'win32':
+        descritor, caminho = tempfile.mkstemp(suffix='.prn' if bruto else '.txt')
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(dados)
+        try:
+            os.startfile(caminho, 'print')
+        except Exception:
+            os.remove(caminho)
+            raise
+        # startfile não espera a impressão terminar
+        threading.Timer(60, os.remove, (caminho,)).start()
+        return
+
+    comando = ['lpr']
+    if impressora:
+        comando += ['-P', impressora]
+    if bruto:
+        comando += ['-o', 'raw']
+    resultado = subprocess.run(comando, input=dados, capture_output=True, timeout=30)
+    if resultado.returncode != 0:
+        erro = resultado.stderr.decode(errors='replace').strip()
+        raise OSError(f"lpr terminou com código {resultado.returncode}: {erro}")
+
+
+class TrabalhoImpressao:
+    """Um documento na fila de impressão"""
+
+    def __init__(self, numero, descricao, dados):
+        self.numero = numero
+        self.descricao = descricao
+        self.dados = dados
+        self.status = AGUARDANDO
+        self.tentativas = 0
+        self.erro = None
+
+    def como_dict(self):
+        return {
+            "numero": self.numero,
+            "descricao": self.descricao,
+            "status": self.status,
+            "tentativas": self.tentativas,
+            "erro": self.erro,
+        }
+
+
+class FilaImpressao:
+    """Envia os trabalhos em ordem, numa thread própria, com novas tentativas
+
+    ``ao_mudar(trabalho)`` é chamado na thread da fila a cada mudança de
+    status.
+    """
+
+    def __init__(self, enviar=enviar_para_impressora, tentativas=3, espera=2.0,
+                 ao_mudar=None, historico=100):
+        self.enviar = enviar
+        self.tentativas = tentativas
+        self.espera = espera
+        self.ao_mudar = ao_mudar
+
+        self._fila = Queue()
+        self._trabalhos = deque(maxlen=historico)
+        self._numeros = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def adicionar(self, descricao, dados):
+        """Coloca um documento na fila e retorna o trabalho"""
+        trabalho = TrabalhoImpressao(next(self._numeros), descricao, dados)
+        with self._lock:
+            self._trabalhos.append(trabalho)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._trabalhar, name="impressao", daemon=True)
+                self._thread.start()
+        self._fila.put(trabalho)
+        return trabalho
+
+    def _mudar(self, trabalho, status, erro=None):
+        trabalho.status = status
+        trabalho.erro = erro
+        if self.ao_mudar:
+            try:
+                self.ao_mudar(trabalho)
+            except Exception:
+                pass
+
+    def _trabalhar(self):
+        while True:
+            trabalho = self._fila.get()
+            if trabalho is None:
+                self._fila.task_done()
+                return
+
+            self._enviar(trabalho)
+            self._fila.task_done()
+
+    def _enviar(self, trabalho):
+        """Tenta imprimir até ``tentativas`` vezes, esperando mais a cada falha"""
+        while True:
+            trabalho.tentativas += 1
+            self._mudar(trabalho, IMPRIMINDO)
+            try:
+                self.enviar(trabalho.dados)
+            except Exception as e:
+                if trabalho.tentativas >= self.tentativas:
+                    self._mudar(trabalho, FALHOU, str(e))
+                    break
+                trabalho.erro = str(e)
+                time.sleep(self.espera * trabalho.tentativas)
+            else:
+                self._mudar(trabalho, IMPRESSO)
+                break
+
+    def trabalhos(self):
+        """Trabalhos recentes, do mais antigo ao mais novo"""
+        with self._lock:
+            return list(self._trabalhos)
+
+    def pendentes(self):
+        return sum(1 for t in self.trabalhos() if t.status in (AGUARDANDO, IMPRIMINDO))
+
+    def aguardar(self):
+        """Bloqueia até a fila esvaziar (útil fora da interface)"""
+        self._fila.join()
+
+    def parar(self):
+        """Encerra a thread depois dos trabalhos já enfileirados"""
+        with self._lock:
+            if self._thread is not None:
+                self._fila.put(None)
+                self._thread = None
+
+
+class ServicoComandas:
+    """Carrega, renderiza e envia comandas para a fila de impressão"""
+
+    TITULO = "COMANDA DE PEDIDO"
+
+    def __init__(self, db, fila=None, modelo=MODELO_PADRAO, modelo_item=MODELO_ITEM,
+                 largura=LARGURA, escpos=False, impressora=None):
+        self.db = db
+        self.escpos = escpos
+        if fila is None:
+            fila = FilaImpressao(enviar=partial(enviar_para_impressora, impressora=impressora, bruto=escpos))
+        self.fila = fila
+        self.largura = largura
+        self._modelo = compilar(modelo)
+        self._modelo_item = compilar(modelo_item, CAMPOS_ITEM)
+        self._fixos = {
+            "linha": "-" * largura,
+            "linha_dupla": "=" * largura,
+            "titulo": self.TITULO.center(largura),
+        }
+
+    def pedidos(self, ids=None, data_entrega=None, status=None):
+        """Pedidos com itens, em uma consulta por até 500 pedidos
+
+        Retorna [(pedido, itens)], com ``pedido`` =
+        (id, cliente_nome, data, data_entrega, status, total) e cada item =
+        (produto, quantidade, preco_unitario, total).
+        """
+        consulta = '''
+            SELECT p.id, c.nome, p.data, p.data_entrega, p.status, p.total,
+                   i.produto, i.quantidade, i.preco_unitario, i.total
+            FROM pedidos p
+            JOIN clientes c ON c.id = p.cliente_id
+            LEFT JOIN itens_pedido i ON i.pedido_id = p.id
+            WHERE {filtro}
+            ORDER BY p.id, i.id
+        '''
+        filtros = []
+        params = []
+        if data_entrega is not None:
+            filtros.append('p.data_entrega = ?')
+            params.append(data_entrega)
+        if status is not None:
+            filtros.append('p.status = ?')
+            params.append(status)
+
+        if ids is None:
+            lotes = [()]
+        else:
+            ids = list(ids)
+            lotes = [ids[i:i + PEDIDOS_POR_CONSULTA] for i in range(0, len(ids), PEDIDOS_POR_CONSULTA)]
+
+        resultado = []
+        with self.db.get_connection() as conn:
+            for lote in lotes:
+                filtro = list(filtros)
+                if ids is not None:
+                    filtro.append(f"p.id IN ({','.join('?' * len(lote))})")
+                linhas = conn.execute(
+                    consulta.format(filtro=' AND '.join(filtro) or '1'),
+                    params + list(lote)
+                )
+                for _, grupo in itertools.groupby(linhas, key=lambda linha: linha[0]):
+                    grupo = list(grupo)
+                    itens = [linha[6:] for linha in grupo if linha[6] is not None]
+                    resultado.append((grupo[0][:6], itens))
+        return resultado
+
+    def renderizar(self, pedido, itens):
+        """Texto da comanda de um pedido"""
+        itens_texto = '\n'.join(
+            preencher(self._modelo_item, {
+                "produto": produto,
+                "quantidade": quantidade,
+                "preco_unitario": formatar(preco),
+                "total": formatar(total),
+            })
+            for produto, quantidade, preco, total in itens
+        )
+        valores = dict(self._fixos)
+        valores.update(
+            id=pedido[0],
+            cliente=pedido[1],
+            data=data_br(pedido[2]),
+            entrega=data_br(pedido[3]),
+            status=pedido[4],
+            itens=itens_texto,
+            total=formatar(pedido[5]),
+        )
+        return preencher(self._modelo, valores)
+
+    def documento(self, pedido, itens):
+        """Bytes prontos para a impressora (texto UTF-8 ou ESC/POS)"""
+        texto = self.renderizar(pedido, itens)
+        if self.escpos:
+            return documento_escpos(texto, self.TITULO)
+        return texto.encode('utf-8')
+
+    def imprimir(self, ids=None, data_entrega=None, status=None):
+        """Enfileira uma comanda por pedido e retorna os trabalhos"""
+        return [
+            self.fila.adicionar(f"Pedido #{pedido[0]}", self.documento(pedido, itens))
+            for pedido, itens in self.pedidos(ids, data_entrega, status)
+        ]
@@ -0,0 +1,552 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from loja import migracoes
+from loja.perfil import ConexaoPerfilada, PerfilConsultas
+from loja.eventos import (
+    ATUALIZAR, INSERIR, LIMPAR, RECARREGAR, Alteracao, BarramentoAlteracoes
+)
+
+
+class ErroPedido(ValueError):
+    """Pedido inválido (cliente, produto ou quantidade)"""
+
+def no_android():
+    """Mesmo critério do ``kivy.utils.platform``, sem importar o Kivy"""
+    return 'ANDROID_ARGUMENT' in os.environ
+
+
+# Pragmas aplicados a toda conexão nova do pool
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Reaplicados a cada reuso da conexão: quem a usou antes pode tê-los
+# mudado, e desligados deixariam as escritas seguintes sem chaves
+# estrangeiras ou sem durabilidade (os demais só afetam desempenho)
+PRAGMAS_REUSO = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Comandos preparados mantidos por conexão (padrão do sqlite3: 128); as
+# consultas nomeadas de ``loja.repositorio`` cabem todas com folga
+COMANDOS_EM_CACHE = 256
+
+
+class ConnectionPool:
+    """Pool pequeno de conexões SQLite compartilhado entre threads"""
+
+    def __init__(self, db_path, tamanho=4, timeout=5.0, perfil=None):
+        self.db_path = db_path
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self.perfil = perfil
+        self._livres = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._todas = []
+        self._por_thread = {}
+        self._sentinela = None
+
+        # Contadores
+        self.criadas = 0
+        self.reutilizadas = 0
+        self.aguardando = 0
+
+    def _perfilando(self):
+        return self.perfil is not None and self.perfil.ativo
+
+    def _abrir(self):
+        """Abre uma conexão nova com os pragmas ajustados
+
+        Só com o perfil ligado a conexão é ``ConexaoPerfilada``; desligado,
+        é uma ``sqlite3.Connection`` comum.
+        """
+        perfilando = self._perfilando()
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=ConexaoPerfilada if perfilando else sqlite3.Connection,
+            cached_statements=COMANDOS_EM_CACHE
+        )
+        if perfilando:
+            conn.perfil = self.perfil
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def adquirir(self):
+        """Retira uma conexão do pool, abrindo uma nova se houver espaço"""
+        try:
+            conn = self._livres.get_nowait()
+            with self._lock:
+                self.reutilizadas += 1
+            return self._conforme(conn)
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._todas) < self.tamanho:
+                conn = self._abrir()
+                self._todas.append(conn)
+                self.criadas += 1
+                return conn
+            self.aguardando += 1
+
+        # Pool cheio: esperar alguma conexão ser devolvida
+        try:
+            conn = self._livres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Tempo esgotado aguardando conexão do pool")
+        finally:
+            with self._lock:
+                self.aguardando -= 1
+        with self._lock:
+            self.reutilizadas += 1
+        return self._conforme(conn)
+
+    def _conforme(self, conn):
+        """Prepara para uso uma conexão retirada de ``_livres``
+
+        Uma conexão fechada por ``fechar()`` enquanto esperava, ou aberta
+        antes de o perfil ser ligado ou desligado, é trocada por uma nova;
+        as demais voltam aos ``PRAGMAS_REUSO``.
+        """
+        with self._lock:
+            no_pool = conn in self._todas
+        if no_pool and isinstance(conn, ConexaoPerfilada) == self._perfilando():
+            for pragma in PRAGMAS_REUSO:
+                conn.execute(pragma)
+            return conn
+        novo = self._abrir()
+        with self._lock:
+            if conn in self._todas:
+                self._todas[self._todas.index(conn)] = novo
+            else:
+                self._todas.append(novo)
+            self.criadas += 1
+        conn.close()
+        return novo
+
+    def devolver(self, conn):
+        """Devolve a conexão ao pool"""
+        with self._lock:
+            if conn not in self._todas:
+                conn.close()
+                return
+        self._livres.put(conn)
+
+    @contextmanager
+    def conexao(self):
+        """Conexão da thread atual; commit ao sair, rollback em caso de erro
+
+        Chamadas aninhadas na mesma thread reaproveitam a mesma conexão e
+        só a mais externa faz commit e devolve a conexão ao pool.
+        """
+        atual = getattr(self._local, "conn", None)
+        if atual is not None:
+            self._local.profundidade += 1
+            try:
+                yield atual
+            finally:
+                self._local.profundidade -= 1
+            return
+
+        conn = self.adquirir()
+        thread = threading.get_ident()
+        self._local.conn = conn
+        self._local.profundidade = 1
+        self._local.apos_commit = []
+        with self._lock:
+            self._por_thread[thread] = conn
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            pendentes = self._local.apos_commit
+            self._local.apos_commit = []
+            self._local.conn = None
+            with self._lock:
+                self._por_thread.pop(thread, None)
+            self.devolver(conn)
+            conn = None
+            for funcao in pendentes:
+                funcao()
+        finally:
+            self._local.conn = None
+            self._local.profundidade = 0
+            self._local.apos_commit = []
+            if conn is not None:
+                with self._lock:
+                    self._por_thread.pop(thread, None)
+                self.devolver(conn)
+
+    def apos_commit(self, funcao):
+        """Executa ``funcao`` depois do commit do bloco atual desta thread
+
+        Fora de um bloco ``conexao()`` a função roda imediatamente; se o
+        bloco terminar em rollback ela é descartada.
+        """
+        if getattr(self._local, "conn", None) is None:
+            funcao()
+        else:
+            self._local.apos_commit.append(funcao)
+
+    @contextmanager
+    def ponto_salvamento(self, nome='operacao'):
+        """SAVEPOINT dentro do bloco ``conexao()`` desta thread
+
+        Um erro desfaz só o que foi feito no bloco, inclusive os avisos de
+        ``apos_commit`` registrados nele, e a transação externa continua.
+        """
+        conn = self._local.conn
+        pendentes = len(self._local.apos_commit)
+        conn.execute(f'SAVEPOINT {nome}')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f'ROLLBACK TO {nome}')
+            conn.execute(f'RELEASE {nome}')
+            del self._local.apos_commit[pendentes:]
+            raise
+        conn.execute(f'RELEASE {nome}')
+
+    def interromper(self, thread):
+        """Interrompe o comando em andamento na conexão em uso pela ``thread`` (ident)
+
+        Retorna False se a thread não está com uma conexão do pool.
+        """
+        with self._lock:
+            conn = self._por_thread.get(thread)
+        if conn is None:
+            return False
+        conn.interrupt()
+        return True
+
+    def versao_dados(self):
+        """``PRAGMA data_version`` da conexão sentinela
+
+        A sentinela nunca escreve, então o valor muda a cada commit feito
+        por qualquer outra conexão, deste ou de outro processo.
+        """
+        with self._lock:
+            if self._sentinela is None:
+                self._sentinela = self._abrir()
+            return self._sentinela.execute('PRAGMA data_version').fetchone()[0]
+
+    def fechar(self):
+        """Fecha todas as conexões livres e esvazia o pool"""
+        with self._lock:
+            conexoes = self._todas
+            self._todas = []
+            if self._sentinela is not None:
+                conexoes.append(self._sentinela)
+                self._sentinela = None
+        while True:
+            try:
+                self._livres.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conexoes:
+            conn.close()
+
+    def estatisticas(self):
+        """Retorna os contadores do pool"""
+        with self._lock:
+            return {
+                "abertas": len(self._todas),
+                "criadas": self.criadas,
+                "em_uso": len(self._todas) - self._livres.qsize(),
+                "livres": self._livres.qsize(),
+                "reutilizadas": self.reutilizadas,
+                "aguardando": self.aguardando,
+            }
+
+
+# Colunas das listas de pedidos, na ordem usada pelas telas
+COLUNAS_PEDIDO = ('id', 'data', 'cliente_nome', 'data_entrega', 'status', 'total')
+
+# Mesmas colunas a partir de ``pedidos p JOIN clientes c``
+SELECT_PEDIDO = '''
+    SELECT p.id, p.data, c.nome AS cliente_nome, p.data_entrega, p.status, p.total
+    FROM pedidos p
+    JOIN clientes c ON c.id = p.cliente_id
+'''
+
+
+def caminho_banco_padrao():
+    """Caminho do banco quando nenhum é informado"""
+    if no_android():
+        from android.storage import app_storage_path
+        return os.path.join(app_storage_path(), 'sistema_loja.db')
+    return 'sistema_loja.db'
+
+
+class DatabaseManager:
+    def __init__(self, db_path=None, tamanho_pool=4):
+        self.db_path = db_path or caminho_banco_padrao()
+
+        # Desligado por padrão; LOJA_PERFIL_SQL=1 ou menu de debug
+        self.perfil = PerfilConsultas()
+        self.pool = ConnectionPool(self.db_path, tamanho=tamanho_pool, perfil=self.perfil)
+        self.eventos = BarramentoAlteracoes()
+
+        # Importados aqui: catálogo e arquivo usam loja.repositorio, que depende deste módulo
+        from loja.arquivamento import ArquivoPedidos
+        from loja.catalogo import Catalogo
+        self.catalogo = Catalogo(self)
+        self.arquivo = ArquivoPedidos(self)
+        self.criar_banco_dados()
+
+    def get_connection(self):
+        """Conexão do pool para uso em bloco ``with``"""
+        return self.pool.conexao()
+
+    @contextmanager
+    def transacao(self):
+        """Conexão com ``BEGIN IMMEDIATE``: trava de escrita desde o início"""
+        with self.get_connection() as conn:
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            yield conn
+
+    def criar_banco_dados(self):
+        """Cria as tabelas ou atualiza o esquema (e o do arquivo) para a versão mais recente"""
+        with self.get_connection() as conn:
+            versao = migracoes.migrar(conn)
+        self.arquivo.atualizar_esquema()
+        return versao
+
+    def publicar(self, entidade, operacao, chave, dados=None, anterior=None):
+        """Publica uma alteração no barramento após o commit da transação atual"""
+        alteracao = Alteracao(entidade, operacao, chave, dados, anterior)
+        self.pool.apos_commit(lambda: self.eventos.publicar(alteracao))
+
+    def inserir_cliente(self, nome, telefone, endereco):
+        """Cadastra um cliente e retorna o id (IntegrityError se o nome já existe)"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO clientes (nome, telefone, endereco, data_cadastro)
+                VALUES (?, ?, ?, datetime('now', 'localtime'))
+            ''', (nome, telefone, endereco))
+            cliente_id = cursor.lastrowid
+            self.publicar('clientes', INSERIR, cliente_id, {
+                "id": cliente_id, "nome": nome, "telefone": telefone, "endereco": endereco
+            })
+            return cliente_id
+
+    def inserir_clientes(self, clientes):
+        """Cadastra ``(nome, telefone, endereco)`` em uma transação; retorna os ids
+
+        Um nome repetido desfaz o lote inteiro (IntegrityError).
+        """
+        with self.transacao():
+            return [self.inserir_cliente(nome, telefone, endereco) for nome, telefone, endereco in clientes]
+
+    def atualizar_cliente(self, nome_atual, novo_nome, telefone, endereco):
+        """Altera os dados do cliente identificado pelo nome atual
+
+        Pedidos referenciam o cliente pelo id, então renomear altera uma
+        única linha; as listas de pedidos são avisadas para recarregar.
+        """
+        with self.get_connection() as conn:
+            anterior = conn.execute(
+                'SELECT id, nome, telefone, endereco FROM clientes WHERE nome = ?',
+                (nome_atual,)
+            ).fetchone()
+            if not anterior:
+                return False
+
+            conn.execute('''
+                UPDATE clientes
+                SET nome = ?, telefone = ?, endereco = ?
+                WHERE id = ?
+            ''', (novo_nome, telefone, endereco, anterior[0]))
+            self.publicar(
+                'clientes', ATUALIZAR, anterior[0],
+                {"id": anterior[0], "nome": novo_nome, "telefone": telefone, "endereco": endereco},
+                dict(zip(("id", "nome", "telefone", "endereco"), anterior))
+            )
+            if novo_nome != anterior[1]:
+                self.publicar('pedidos', RECARREGAR, None)
+                self.pool.apos_commit(lambda: self.arquivo.renomear_cliente(anterior[0], novo_nome))
+            return True
+
+    def atualizar_clientes(self, alteracoes):
+        """Aplica ``(nome_atual, novo_nome, telefone, endereco)`` em uma transação
+
+        Retorna quantos clientes foram encontrados e alterados.
+        """
+        with self.transacao():
+            return sum(self.atualizar_cliente(*alteracao) for alteracao in alteracoes)
+
+    def inserir_produtos(self, produtos):
+        """Cadastra ``(nome, preco)`` (centavos) em uma transação; retorna os ids"""
+        ids = []
+        with self.transacao() as conn:
+            for nome, preco in produtos:
+                produto_id = conn.execute(
+                    'INSERT INTO produtos (nome, preco) VALUES (?, ?)', (nome, preco)
+                ).lastrowid
+                self.publicar('produtos', INSERIR, produto_id, {
+                    "id": produto_id, "nome": nome, "preco": preco
+                })
+                ids.append(produto_id)
+        return ids
+
+    def atualizar_pedido(self, pedido_id, data_entrega, status):
+        """Altera data de entrega e status de um pedido"""
+        with self.get_connection() as conn:
+            anterior = self._linha_pedido(conn, pedido_id)
+            if not anterior:
+                return False
+
+            conn.execute('''
+                UPDATE pedidos
+                SET data_entrega = ?, status = ?
+                WHERE id = ?
+            ''', (data_entrega, status, pedido_id))
+            self.publicar(
+                'pedidos', ATUALIZAR, pedido_id,
+                dict(anterior, data_entrega=data_entrega, status=status),
+                anterior
+            )
+            return True
+
+    def atualizar_pedidos(self, alteracoes):
+        """Aplica ``(pedido_id, data_entrega, status)`` em uma transação
+
+        Retorna quantos pedidos foram encontrados e alterados.
+        """
+        with self.transacao():
+            return sum(
+                self.atualizar_pedido(pedido_id, data_entrega, status)
+                for pedido_id, data_entrega, status in alteracoes
+            )
+
+    def precos_produtos(self):
+        """Mapa nome do produto → preço em centavos, do catálogo em memória"""
+        return self.catalogo.precos()
+
+    def _validar_itens(self, itens, produtos):
+        """Confere produtos e quantidades; retorna [(produto_id, produto, quantidade, preco)]"""
+        validados = []
+        for produto, quantidade in itens:
+            registro = produtos.get(produto)
+            if registro is None:
+                raise ErroPedido(f"Produto não cadastrado: {produto}")
+            if int(quantidade) != quantidade or quantidade <= 0:
+                raise ErroPedido(f"Quantidade inválida para {produto}: {quantidade}")
+            validados.append((registro.id, produto, int(quantidade), registro.preco))
+        if not validados:
+            raise ErroPedido("O pedido não tem itens")
+        return validados
+
+    def _ids_clientes(self, conn, nomes):
+        """{nome: id} dos clientes cadastrados; ErroPedido se faltar algum"""
+        nomes = list(dict.fromkeys(nomes))
+        ids = {}
+        for inicio in range(0, len(nomes), 500):
+            parte = nomes[inicio:inicio + 500]
+            ids.update(conn.execute(
+                f"SELECT nome, id FROM clientes WHERE nome IN ({', '.join('?' * len(parte))})",
+                parte
+            ))
+        for nome in nomes:
+            if nome not in ids:
+                raise ErroPedido(f"Cliente não cadastrado: {nome}")
+        return ids
+
+    def criar_pedido(self, cliente, data_entrega, itens, status='pendente'):
+        """Grava um pedido e seus itens em uma única transação e retorna o id
+
+        ``itens`` é uma sequência de ``(produto, quantidade)``; o preço vem
+        do cadastro de produtos e o total é calculado no próprio SQL.
+        """
+        return self.criar_pedidos([(cliente, data_entrega, itens, status)])[0]
+
+    def criar_pedidos(self, pedidos):
+        """Grava vários pedidos ``(cliente, data_entrega, itens[, status])`` de uma vez
+
+        Tudo é validado antes de abrir a transação; se algum pedido for
+        inválido nada é gravado. Retorna a lista de ids na mesma ordem.
+        """
+        produtos = self.catalogo.produtos.dados().por_nome
+        validados = []
+        for pedido in pedidos:
+            cliente, data_entrega, itens = pedido[:3]
+            status = pedido[3] if len(pedido) > 3 else 'pendente'
+            if not cliente:
+                raise ErroPedido("O pedido precisa de um cliente")
+            validados.append((cliente, data_entrega, status, self._validar_itens(itens, produtos)))
+
+        ids = []
+        with self.transacao() as conn:
+            clientes = self._ids_clientes(conn, [pedido[0] for pedido in validados])
+            for cliente, data_entrega, status, itens in validados:
+                pedido_id = conn.execute('''
+                    INSERT INTO pedidos (cliente_id, data_entrega, status, total)
+                    VALUES (?, ?, ?, 0)
+                ''', (clientes[cliente], data_entrega, status)).lastrowid
+
+                # O nome do produto fica gravado no item (comandas e histórico)
+                conn.executemany('''
+                    INSERT INTO itens_pedido (pedido_id, produto_id, produto, quantidade, preco_unitario, total)
+                    VALUES (?1, ?2, ?3, ?4, ?5, ?4 * ?5)
+                ''', [(pedido_id, *item) for item in itens])
+
+                conn.execute('''
+                    UPDATE pedidos
+                    SET total = (SELECT COALESCE(SUM(total), 0) FROM itens_pedido WHERE pedido_id = ?1)
+                    WHERE id = ?1
+                ''', (pedido_id,))
+
+                self.publicar('pedidos', INSERIR, pedido_id, self._linha_pedido(conn, pedido_id))
+                ids.append(pedido_id)
+        return ids
+
+    def remover_todos_pedidos(self):
+        """Remove todos os pedidos e itens, inclusive os arquivados, e reseta os IDs"""
+        with self.transacao() as conn:
+            # Os ids recomeçam em 1 e não podem colidir com pedidos arquivados;
+            # o arquivo só é limpo se a remoção no banco principal for gravada
+            self.pool.apos_commit(self.arquivo.limpar)
+            conn.execute('DELETE FROM itens_pedido')
+            conn.execute('DELETE FROM pedidos')
+            conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('pedidos', 'itens_pedido')")
+            self.publicar('itens_pedido', LIMPAR, None)
+            self.publicar('pedidos', LIMPAR, None)
+
+    def _linha_pedido(self, conn, pedido_id):
+        """Linha de um pedido como dict, no formato das listas de pedidos"""
+        linha = conn.execute(
+            SELECT_PEDIDO + 'WHERE p.id = ?', (pedido_id,)
+        ).fetchone()
+        if not linha:
+            return None
+        return dict(zip(COLUNAS_PEDIDO, linha))
+
+    def fechar(self):
+        """Fecha todas as conexões (ex.: antes de apagar o arquivo do banco)"""
+        self.pool.fechar()
+        self.catalogo.invalidar()
+
+    def estatisticas_pool(self):
+        """Contadores de conexões abertas, reutilizadas e em espera"""
+        return self.pool.estatisticas()
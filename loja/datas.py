@@ -0,0 +1,129 @@
+"""Datas dos pedidos: formato gravado, normalização e exibição
+
+``data`` e ``data_entrega`` são gravadas como texto ISO ``aaaa-mm-dd``,
+que ordena e compara corretamente e usa os índices de ``pedidos``.
+Versões antigas gravavam outros formatos (``dd/mm/aaaa``,
+``aaaa-mm-dd hh:mm:ss``...); ``normalizar_datas`` converte o banco em
+lotes, guardando o último id processado em ``tarefas_manutencao`` para
+continuar de onde parou se for interrompida.
+
+Na exibição, ``data_br`` troca a ordem dos campos sem ``strptime`` e
+guarda o resultado em cache (poucas datas distintas, muitas linhas).
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+from loja.eventos import RECARREGAR
+
+COLUNAS_DATA = ('data', 'data_entrega')
+
+TAREFA_NORMALIZAR = 'normalizar_datas'
+
+# Formatos aceitos na entrada, do mais ao menos comum
+FORMATOS = (
+    '%Y-%m-%d',
+    '%d/%m/%Y',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%d/%m/%y',
+    '%d-%m-%Y',
+    '%Y/%m/%d',
+)
+
+_ISO = re.compile(r'\d{4}-\d{2}-\d{2}$')
+
+
+@lru_cache(maxsize=4096)
+def data_iso(valor):
+    """Data em qualquer formato de ``FORMATOS`` -> aaaa-mm-dd (ValueError se inválida)"""
+    texto = (valor or '').strip()
+    for formato in FORMATOS:
+        try:
+            return datetime.strptime(texto, formato).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {valor!r}")
+
+
+@lru_cache(maxsize=4096)
+def data_br(valor):
+    """aaaa-mm-dd -> dd/mm/aaaa; outros formatos são devolvidos como estão"""
+    if not valor or len(valor) < 10 or valor[4] != '-' or valor[7] != '-':
+        return valor or ''
+    return f"{valor[8:10]}/{valor[5:7]}/{valor[0:4]}"
+
+
+def normalizacao_pendente(db):
+    """Indica se ``normalizar_datas`` ainda não terminou neste banco"""
+    with db.get_connection() as conn:
+        linha = conn.execute(
+            'SELECT concluida FROM tarefas_manutencao WHERE tarefa = ?', (TAREFA_NORMALIZAR,)
+        ).fetchone()
+    return linha is not None and not linha[0]
+
+
+def normalizar_datas(db, lote=2000, reiniciar=False, progresso=None):
+    """Converte as datas de ``pedidos`` para aaaa-mm-dd, um lote por transação
+
+    Continua do último lote confirmado, a menos que ``reiniciar`` seja
+    verdadeiro. ``progresso(ultimo_id)`` é chamado após cada lote.
+    Retorna {coluna: alteradas, 'invalidas': não reconhecidas}.
+    """
+    with db.transacao() as conn:
+        if reiniciar:
+            conn.execute('''
+                INSERT INTO tarefas_manutencao (tarefa, ultimo_id, concluida) VALUES (?, 0, 0)
+                ON CONFLICT(tarefa) DO UPDATE SET ultimo_id = 0, concluida = 0
+            ''', (TAREFA_NORMALIZAR,))
+        linha = conn.execute(
+            'SELECT ultimo_id, concluida FROM tarefas_manutencao WHERE tarefa = ?',
+            (TAREFA_NORMALIZAR,)
+        ).fetchone()
+    ultimo_id, concluida = linha or (0, 0)
+
+    resultado = dict.fromkeys(COLUNAS_DATA, 0)
+    resultado['invalidas'] = 0
+
+    while not concluida:
+        with db.transacao() as conn:
+            linhas = conn.execute(f'''
+                SELECT id, {', '.join(COLUNAS_DATA)} FROM pedidos
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (ultimo_id, lote)).fetchall()
+
+            for indice, coluna in enumerate(COLUNAS_DATA, start=1):
+                alteracoes = []
+                for linha in linhas:
+                    valor = linha[indice]
+                    if valor is None or _ISO.match(valor):
+                        continue
+                    try:
+                        alteracoes.append((data_iso(valor), linha[0]))
+                    except ValueError:
+                        resultado['invalidas'] += 1
+                conn.executemany(f'UPDATE pedidos SET {coluna} = ? WHERE id = ?', alteracoes)
+                resultado[coluna] += len(alteracoes)
+
+            concluida = len(linhas) < lote
+            if linhas:
+                ultimo_id = linhas[-1][0]
+            conn.execute('''
+                INSERT INTO tarefas_manutencao (tarefa, ultimo_id, concluida) VALUES (?, ?, ?)
+                ON CONFLICT(tarefa) DO UPDATE SET
+                    ultimo_id = excluded.ultimo_id, concluida = excluded.concluida
+            ''', (TAREFA_NORMALIZAR, ultimo_id, int(concluida)))
+
+        if progresso:
+            progresso(ultimo_id)
+
+    if resultado['data'] or resultado['data_entrega']:
+        db.publicar('pedidos', RECARREGAR, None)
+    return resultado
+
+
+def atualizar_formato_datas(db, lote=2000):
+    """Revisa todas as datas de ``pedidos`` desde o início (ver ``normalizar_datas``)"""
+    return normalizar_datas(db, lote=lote, reiniciar=True)
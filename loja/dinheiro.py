@@ -0,0 +1,41 @@
+"""Valores em dinheiro como inteiros de centavos
+
+Preços e totais são gravados em centavos (INTEGER), então somas no SQL e
+em Python são exatas. Reais só aparecem na entrada (formulários,
+importação) e na saída (telas, comandas, exportação).
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+
+
+def centavos(valor):
+    """Converte reais (número ou texto como "12.5", "1.234,56", "R$ 3,00") em centavos"""
+    if isinstance(valor, str):
+        texto = valor.replace('R$', '').strip().replace(' ', '')
+        if ',' in texto:
+            texto = texto.replace('.', '').replace(',', '.')
+        valor = texto
+    elif isinstance(valor, float):
+        valor = repr(valor)
+
+    try:
+        return int((Decimal(valor) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f"Valor inválido: {valor!r}") from None
+
+
+def reais(valor_centavos):
+    """Centavos -> texto decimal com ponto ("1234.56"), para arquivos"""
+    sinal = '-' if valor_centavos < 0 else ''
+    inteiro, resto = divmod(abs(int(valor_centavos)), 100)
+    return f"{sinal}{inteiro}.{resto:02d}"
+
+
+@lru_cache(maxsize=8192)
+def formatar(valor_centavos):
+    """Centavos -> "R$ 1.234,56" """
+    valor_centavos = int(valor_centavos or 0)
+    sinal = '-' if valor_centavos < 0 else ''
+    inteiro, resto = divmod(abs(valor_centavos), 100)
+    return f"{sinal}R$ {inteiro:,}".replace(',', '.') + f",{resto:02d}"
@@ -0,0 +1,97 @@
+"""Resumo em memória das entregas pendentes
+
+A tabela ``resumo_entregas`` (migração 4) guarda quantos pedidos pendentes
+existem por data de entrega e é mantida por gatilhos. ``ResumoEntregas``
+carrega essa tabela uma vez, aplica as alterações de pedidos feitas pelo
+próprio aplicativo (via barramento de alterações) e recalcula atrasados/hoje/amanhã na virada do dia,
+sem consultar o banco a cada pulso do botão de notificações.
+"""
+
+import threading
+from datetime import date, timedelta
+
+from loja.eventos import LIMPAR, RECARREGAR
+
+
+class ResumoEntregas:
+    """Contagem de entregas atrasadas, de hoje, de amanhã e pendentes"""
+
+    def __init__(self, db, hoje=date.today):
+        self.db = db
+        self._hoje = hoje
+        self._lock = threading.Lock()
+        self._por_data = {}
+        self._data_referencia = None
+        self._contagens = {}
+        self.carregar()
+        db.eventos.assinar('pedidos', self.ao_alterar)
+
+    def carregar(self):
+        """Relê a tabela de resumo (ex.: após alterações feitas por outro processo)"""
+        with self.db.get_connection() as conn:
+            linhas = conn.execute(
+                'SELECT data_entrega, pendentes FROM resumo_entregas WHERE pendentes > 0'
+            ).fetchall()
+
+        with self._lock:
+            self._por_data = dict(linhas)
+            self._recalcular()
+
+    def aplicar(self, antes, depois):
+        """Atualiza o resumo com a alteração de um pedido
+
+        ``antes`` e ``depois`` são tuplas ``(data_entrega, status)``; use
+        ``None`` para inserção (``antes``) ou exclusão (``depois``).
+        """
+        with self._lock:
+            if antes and antes[1] == 'pendente' and antes[0]:
+                restantes = self._por_data.get(antes[0], 0) - 1
+                if restantes > 0:
+                    self._por_data[antes[0]] = restantes
+                else:
+                    self._por_data.pop(antes[0], None)
+            if depois and depois[1] == 'pendente' and depois[0]:
+                self._por_data[depois[0]] = self._por_data.get(depois[0], 0) + 1
+            self._recalcular()
+
+    def ao_alterar(self, alteracao):
+        """Aplica uma alteração de pedido publicada pela camada de dados"""
+        if alteracao.operacao in (LIMPAR, RECARREGAR):
+            self.carregar()
+            return
+
+        def chave(linha):
+            return (linha["data_entrega"], linha["status"]) if linha else None
+
+        self.aplicar(chave(alteracao.anterior), chave(alteracao.dados))
+
+    def _recalcular(self):
+        """Distribui as datas entre atrasados, hoje e amanhã (chamar com o lock)"""
+        hoje = self._hoje()
+        hoje_iso = hoje.isoformat()
+        amanha_iso = (hoje + timedelta(days=1)).isoformat()
+
+        atrasados = pendentes = 0
+        for data_entrega, quantidade in self._por_data.items():
+            pendentes += quantidade
+            if data_entrega < hoje_iso:
+                atrasados += quantidade
+
+        self._data_referencia = hoje
+        self._contagens = {
+            "atrasados": atrasados,
+            "hoje": self._por_data.get(hoje_iso, 0),
+            "amanha": self._por_data.get(amanha_iso, 0),
+            "pendentes": pendentes,
+        }
+
+    def contagens(self):
+        """Contagens atuais; recalculadas em memória na virada do dia"""
+        with self._lock:
+            if self._data_referencia != self._hoje():
+                self._recalcular()
+            return dict(self._contagens)
+
+    def atrasados(self):
+        """Quantidade de entregas pendentes com data já vencida"""
+        return self.contagens()["atrasados"]
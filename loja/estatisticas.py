@@ -0,0 +1,188 @@
+"""Estatísticas do sistema a partir das tabelas de agregados
+
+As tabelas ``estatisticas_*`` (migração 5) são mantidas por gatilhos a
+cada escrita, então nenhuma consulta daqui percorre ``pedidos`` ou
+``itens_pedido``. O resumo geral fica em memória e é ajustado pelos
+eventos do barramento de alterações.
+
+Com pedidos arquivados (``loja.arquivamento``) cada consulta soma os
+agregados do banco principal aos do arquivo, anexado só nesse caso.
+"""
+
+import threading
+
+from loja.arquivamento import unir
+from loja.eventos import ATUALIZAR, INSERIR, LIMPAR, RECARREGAR, REMOVER
+
+# Formato strftime de cada período das séries de receita
+PERIODOS = {
+    'dia': '%Y-%m-%d',
+    'semana': '%Y-%W',
+    'mes': '%Y-%m',
+}
+
+# Consultas com ``{...}`` no lugar das tabelas de agregados (ver ``_consultar``)
+SQL_RESUMO = '''
+    SELECT
+        (SELECT valor FROM estatisticas_totais WHERE chave = 'clientes'),
+        (SELECT valor FROM estatisticas_totais WHERE chave = 'produtos'),
+        SUM(pedidos),
+        SUM(CASE WHEN status = 'pendente' THEN pedidos END),
+        SUM(receita)
+    FROM {estatisticas_status}
+'''
+SQL_RECEITA = '''
+    SELECT strftime(?, dia) AS periodo, SUM(pedidos), SUM(receita)
+    FROM {estatisticas_diarias}
+    WHERE dia <> ''
+    GROUP BY periodo
+    ORDER BY periodo DESC
+    LIMIT ?
+'''
+SQL_STATUS = '''
+    SELECT status, SUM(pedidos), SUM(receita)
+    FROM {estatisticas_status}
+    GROUP BY status
+    ORDER BY status
+'''
+# Sem arquivo a ordenação usa os índices de receita, sem agrupar
+SQL_TOP_CLIENTES = '''
+    SELECT c.nome, e.pedidos, e.receita
+    FROM estatisticas_clientes e
+    JOIN clientes c ON c.id = e.cliente_id
+    ORDER BY e.receita DESC
+    LIMIT ?
+'''
+SQL_TOP_CLIENTES_ARQUIVO = '''
+    SELECT c.nome, SUM(e.pedidos), SUM(e.receita) AS receita
+    FROM {estatisticas_clientes} e
+    JOIN clientes c ON c.id = e.cliente_id
+    GROUP BY e.cliente_id
+    ORDER BY receita DESC
+    LIMIT ?
+'''
+SQL_TOP_PRODUTOS = '''
+    SELECT p.nome, e.quantidade, e.receita
+    FROM estatisticas_produtos e
+    JOIN produtos p ON p.id = e.produto_id
+    ORDER BY e.receita DESC
+    LIMIT ?
+'''
+SQL_TOP_PRODUTOS_ARQUIVO = '''
+    SELECT p.nome, SUM(e.quantidade), SUM(e.receita) AS receita
+    FROM {estatisticas_produtos} e
+    JOIN produtos p ON p.id = e.produto_id
+    GROUP BY e.produto_id
+    ORDER BY receita DESC
+    LIMIT ?
+'''
+
+# Colunas somadas de cada tabela de agregados
+COLUNAS = {
+    'estatisticas_diarias': 'dia, pedidos, receita',
+    'estatisticas_status': 'status, pedidos, receita',
+    'estatisticas_clientes': 'cliente_id, pedidos, receita',
+    'estatisticas_produtos': 'produto_id, quantidade, receita',
+}
+TABELAS = {tabela: tabela for tabela in COLUNAS}
+TABELAS_COM_ARQUIVO = {tabela: unir(tabela, colunas) for tabela, colunas in COLUNAS.items()}
+
+
+class MotorEstatisticas:
+    """Resumo em memória e séries temporais dos pedidos"""
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._resumo = None
+        db.eventos.assinar('pedidos', self.ao_alterar_pedido)
+        db.eventos.assinar('clientes', self.ao_alterar_cadastro)
+        db.eventos.assinar('produtos', self.ao_alterar_cadastro)
+
+    def _consultar(self, sql, parametros=(), sql_arquivo=None):
+        """Linhas de ``sql`` com as tabelas de agregados do principal ou dos dois bancos
+
+        ``sql_arquivo`` substitui ``sql`` quando há pedidos arquivados.
+        """
+        arquivo = self.db.arquivo
+        if not arquivo.ativo():
+            with self.db.get_connection() as conn:
+                return conn.execute(sql.format(**TABELAS), parametros).fetchall()
+        with arquivo.conexao() as conn:
+            return conn.execute((sql_arquivo or sql).format(**TABELAS_COM_ARQUIVO), parametros).fetchall()
+
+    def carregar(self):
+        """Lê todos os totais em uma única consulta"""
+        linha = self._consultar(SQL_RESUMO)[0]
+
+        resumo = {
+            "clientes": linha[0] or 0,
+            "produtos": linha[1] or 0,
+            "pedidos": linha[2] or 0,
+            "pendentes": linha[3] or 0,
+            "receita": linha[4] or 0,
+        }
+        with self._lock:
+            self._resumo = resumo
+        return dict(resumo)
+
+    def resumo(self):
+        """Totais gerais (carregados uma vez e mantidos pelos eventos)"""
+        with self._lock:
+            if self._resumo is not None:
+                resumo = dict(self._resumo)
+            else:
+                resumo = None
+        if resumo is None:
+            resumo = self.carregar()
+
+        # Valores em centavos; média arredondada para o centavo
+        resumo["media"] = round(resumo["receita"] / resumo["pedidos"]) if resumo["pedidos"] else 0
+        return resumo
+
+    def ao_alterar_pedido(self, alteracao):
+        """Ajusta os totais em memória com a alteração de um pedido"""
+        with self._lock:
+            if self._resumo is None:
+                return
+            if alteracao.operacao in (LIMPAR, RECARREGAR):
+                self._resumo = None
+                return
+
+            for linha, sinal in ((alteracao.anterior, -1), (alteracao.dados, 1)):
+                if not linha:
+                    continue
+                self._resumo["pedidos"] += sinal
+                self._resumo["receita"] += sinal * (linha.get("total") or 0)
+                if linha.get("status") == 'pendente':
+                    self._resumo["pendentes"] += sinal
+
+    def ao_alterar_cadastro(self, alteracao):
+        """Ajusta a contagem de clientes ou produtos"""
+        with self._lock:
+            if self._resumo is None or alteracao.operacao == ATUALIZAR:
+                return
+            if alteracao.operacao in (LIMPAR, RECARREGAR):
+                self._resumo = None
+            elif alteracao.operacao in (INSERIR, REMOVER):
+                self._resumo[alteracao.entidade] += 1 if alteracao.operacao == INSERIR else -1
+
+    def receita_por_periodo(self, periodo='dia', limite=30):
+        """[(período, pedidos, receita)] dos períodos mais recentes"""
+        linhas = self._consultar(SQL_RECEITA, (PERIODOS[periodo], limite))
+        return linhas[::-1]
+
+    def pedidos_por_status(self):
+        """{status: (pedidos, receita)}"""
+        return {
+            status: (pedidos, receita)
+            for status, pedidos, receita in self._consultar(SQL_STATUS)
+        }
+
+    def top_clientes(self, limite=10):
+        """[(cliente, pedidos, receita)] ordenado por receita"""
+        return self._consultar(SQL_TOP_CLIENTES, (limite,), SQL_TOP_CLIENTES_ARQUIVO)
+
+    def top_produtos(self, limite=10):
+        """[(produto, quantidade, receita)] ordenado por receita"""
+        return self._consultar(SQL_TOP_PRODUTOS, (limite,), SQL_TOP_PRODUTOS_ARQUIVO)
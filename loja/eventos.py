@@ -0,0 +1,62 @@
+"""Barramento de alterações emitidas pela camada de dados
+
+Cada escrita publica uma ``Alteracao(entidade, operacao, chave, ...)``
+depois do commit, para que as telas apliquem só a diferença (inserir,
+atualizar ou remover uma linha) em vez de recarregar a tabela inteira.
+"""
+
+import threading
+from collections import namedtuple
+
+INSERIR = 'inserir'
+ATUALIZAR = 'atualizar'
+REMOVER = 'remover'
+LIMPAR = 'limpar'  # todas as linhas da entidade foram removidas
+RECARREGAR = 'recarregar'  # muitas linhas mudaram (ex.: importação em lote)
+
+# ``dados``: linha nova como dict; ``anterior``: linha antes da alteração
+Alteracao = namedtuple(
+    'Alteracao',
+    'entidade operacao chave dados anterior',
+    defaults=(None, None)
+)
+
+
+class BarramentoAlteracoes:
+    """Publica alterações para os assinantes de cada entidade"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assinantes = {}
+
+    def assinar(self, entidade, callback, entregar=None):
+        """Registra ``callback(alteracao)`` para a entidade ('*' para todas)
+
+        ``entregar`` opcional recebe uma função sem argumentos e a executa
+        na thread certa (ex.: ``Clock.schedule_once`` ou ``janela.after``).
+        Retorna uma função que cancela a assinatura.
+        """
+        assinatura = (callback, entregar)
+        with self._lock:
+            self._assinantes.setdefault(entidade, []).append(assinatura)
+
+        def cancelar():
+            with self._lock:
+                lista = self._assinantes.get(entidade, [])
+                if assinatura in lista:
+                    lista.remove(assinatura)
+        return cancelar
+
+    def publicar(self, alteracao):
+        """Entrega a alteração a todos os assinantes interessados"""
+        with self._lock:
+            assinaturas = (
+                list(self._assinantes.get(alteracao.entidade, ())) +
+                list(self._assinantes.get('*', ()))
+            )
+
+        for callback, entregar in assinaturas:
+            if entregar is None:
+                callback(alteracao)
+            else:
+                entregar(lambda c=callback: c(alteracao))
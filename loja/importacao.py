@@ -0,0 +1,494 @@
+"""Importação e exportação em fluxo de clientes, produtos e pedidos
+
+Leitura e escrita são feitas com geradores e ``fetchmany``, gravando em
+lotes de ``lote`` registros por transação, então o uso de memória não
+depende do tamanho do arquivo. Formatos aceitos: CSV e JSON Lines.
+
+Pedidos em JSON Lines têm os itens aninhados::
+
+    {"cliente": "Ana", "data": "2024-05-01", "data_entrega": "2024-05-03",
+     "status": "pendente", "itens": [{"produto": "Bolo", "quantidade": 2,
+     "preco_unitario": 35.0}]}
+
+Preços nos arquivos são em reais ("35.0" ou "35,00"); no banco ficam em
+centavos (ver ``loja.dinheiro``).
+
+Em CSV cada linha é um item e as linhas consecutivas com o mesmo
+``pedido_id`` formam um pedido. A exportação de pedidos inclui os
+pedidos arquivados (``loja.arquivamento``).
+"""
+
+import csv
+import itertools
+import json
+import sqlite3
+import time
+from functools import partial
+
+from loja.arquivamento import ESQUEMA
+from loja.datas import data_iso
+from loja.dinheiro import centavos
+from loja.eventos import RECARREGAR
+
+ENTIDADES = ('clientes', 'produtos', 'pedidos')
+
+COLUNAS_CSV = {
+    'clientes': ('nome', 'telefone', 'endereco', 'data_cadastro'),
+    'produtos': ('nome', 'preco'),
+    'pedidos': (
+        'pedido_id', 'cliente', 'data', 'data_entrega', 'status',
+        'produto', 'quantidade', 'preco_unitario'
+    ),
+}
+
+STATUS_VALIDOS = ('pendente', 'entregue', 'cancelado')
+
+
+class ErroImportacao(ValueError):
+    """Registro inválido no arquivo de importação"""
+
+
+class Relatorio:
+    """Contadores e vazão de uma importação ou exportação"""
+
+    MAXIMO_ERROS = 100
+
+    def __init__(self, entidade, simulacao=False):
+        self.entidade = entidade
+        self.simulacao = simulacao
+        self.lidos = 0
+        self.gravados = 0
+        self.rejeitados = 0
+        self.erros = []
+        self._inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    def rejeitar(self, numero, mensagem):
+        """Conta um registro rejeitado e guarda a mensagem (até MAXIMO_ERROS)"""
+        self.rejeitados += 1
+        if len(self.erros) < self.MAXIMO_ERROS:
+            self.erros.append(f"registro {numero}: {mensagem}")
+
+    def somar(self, parcial):
+        """Acumula o ``como_dict()`` de outra parte da mesma operação"""
+        self.lidos += parcial["lidos"]
+        self.gravados += parcial["gravados"]
+        self.rejeitados += parcial["rejeitados"]
+        self.erros.extend(parcial["erros"][:self.MAXIMO_ERROS - len(self.erros)])
+
+    def finalizar(self):
+        """Marca o fim da operação e calcula o tempo total"""
+        self.segundos = time.perf_counter() - self._inicio
+        return self
+
+    @property
+    def por_segundo(self):
+        return self.lidos / self.segundos if self.segundos else 0.0
+
+    def como_dict(self):
+        """Relatório em formato serializável (JSON)"""
+        return {
+            "entidade": self.entidade,
+            "simulacao": self.simulacao,
+            "lidos": self.lidos,
+            "gravados": self.gravados,
+            "rejeitados": self.rejeitados,
+            "erros": self.erros,
+            "segundos": round(self.segundos, 3),
+            "registros_por_segundo": round(self.por_segundo, 1),
+        }
+
+
+# Leitura
+
+def formato_do_arquivo(caminho, formato=None):
+    """'csv' ou 'jsonl', pelo parâmetro ou pela extensão do arquivo"""
+    if formato:
+        return formato
+    return 'jsonl' if caminho.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def ler_csv(caminho):
+    """Gera um dict por linha do CSV"""
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        yield from csv.DictReader(arquivo)
+
+
+def ler_jsonl(caminho):
+    """Gera um objeto por linha não vazia do arquivo JSON Lines"""
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def agrupar_pedidos_csv(linhas):
+    """Junta linhas de itens consecutivas com o mesmo pedido_id em um pedido"""
+    for _, grupo in itertools.groupby(linhas, key=lambda linha: linha.get('pedido_id')):
+        grupo = list(grupo)
+        primeira = grupo[0]
+        yield {
+            'cliente': primeira.get('cliente'),
+            'data': primeira.get('data'),
+            'data_entrega': primeira.get('data_entrega'),
+            'status': primeira.get('status'),
+            'itens': [
+                {
+                    'produto': linha.get('produto'),
+                    'quantidade': linha.get('quantidade'),
+                    'preco_unitario': linha.get('preco_unitario'),
+                }
+                for linha in grupo if linha.get('produto')
+            ],
+        }
+
+
+def ler(caminho, entidade, formato=None):
+    """Gera os registros de uma entidade a partir do arquivo"""
+    if formato_do_arquivo(caminho, formato) == 'jsonl':
+        return ler_jsonl(caminho)
+    linhas = ler_csv(caminho)
+    return agrupar_pedidos_csv(linhas) if entidade == 'pedidos' else linhas
+
+
+# Validação
+
+def _texto(valor):
+    return (valor or '').strip() if isinstance(valor, str) or valor is None else str(valor)
+
+
+def _numero(valor, campo, tipo=float):
+    try:
+        numero = tipo(valor)
+    except (TypeError, ValueError):
+        raise ErroImportacao(f"{campo} inválido: {valor!r}")
+    if numero < 0:
+        raise ErroImportacao(f"{campo} negativo: {valor!r}")
+    return numero
+
+
+def _dinheiro(valor, campo):
+    """Reais do arquivo -> centavos"""
+    try:
+        valor = centavos(valor)
+    except ValueError:
+        raise ErroImportacao(f"{campo} inválido: {valor!r}")
+    if valor < 0:
+        raise ErroImportacao(f"{campo} negativo: {valor!r}")
+    return valor
+
+
+def _data(valor, campo):
+    """Data do arquivo em qualquer formato conhecido -> aaaa-mm-dd (ou None)"""
+    valor = _texto(valor)
+    if not valor:
+        return None
+    try:
+        return data_iso(valor)
+    except ValueError:
+        raise ErroImportacao(f"{campo} inválida: {valor!r}")
+
+
+def validar_cliente(registro):
+    """(nome, telefone, endereco, data_cadastro) de um registro de cliente"""
+    nome = _texto(registro.get('nome'))
+    if not nome:
+        raise ErroImportacao("nome do cliente vazio")
+    return (
+        nome,
+        _texto(registro.get('telefone')),
+        _texto(registro.get('endereco')),
+        _texto(registro.get('data_cadastro')) or None,
+    )
+
+
+def validar_produto(registro):
+    """(nome, preco) de um registro de produto"""
+    nome = _texto(registro.get('nome'))
+    if not nome:
+        raise ErroImportacao("nome do produto vazio")
+    return (nome, _dinheiro(registro.get('preco'), 'preço'))
+
+
+def validar_pedido(registro):
+    """(cliente, data, data_entrega, status, [(produto, quantidade, preço)])"""
+    cliente = _texto(registro.get('cliente') or registro.get('cliente_nome'))
+    if not cliente:
+        raise ErroImportacao("pedido sem cliente")
+
+    status = _texto(registro.get('status')) or 'pendente'
+    if status not in STATUS_VALIDOS:
+        raise ErroImportacao(f"status inválido: {status!r}")
+
+    itens = []
+    for item in registro.get('itens') or ():
+        produto = _texto(item.get('produto'))
+        if not produto:
+            raise ErroImportacao("item sem produto")
+        quantidade = _numero(item.get('quantidade'), 'quantidade', int)
+        if quantidade == 0:
+            raise ErroImportacao(f"quantidade zero para {produto}")
+        itens.append((produto, quantidade, _dinheiro(item.get('preco_unitario'), 'preço unitário')))
+    if not itens:
+        raise ErroImportacao("pedido sem itens")
+
+    return (
+        cliente,
+        _data(registro.get('data'), 'data'),
+        _data(registro.get('data_entrega'), 'data de entrega'),
+        status,
+        itens,
+    )
+
+
+VALIDADORES = {
+    'clientes': validar_cliente,
+    'produtos': validar_produto,
+    'pedidos': validar_pedido,
+}
+
+
+# Gravação
+
+def _gravar_cliente(conn, cliente):
+    conn.execute('''
+        INSERT INTO clientes (nome, telefone, endereco, data_cadastro)
+        VALUES (?1, ?2, ?3, COALESCE(?4, datetime('now', 'localtime')))
+        ON CONFLICT(nome) DO UPDATE SET
+            telefone = excluded.telefone,
+            endereco = excluded.endereco
+    ''', cliente)
+
+
+def _gravar_produto(conn, produto):
+    conn.execute('''
+        INSERT INTO produtos (nome, preco) VALUES (?, ?)
+        ON CONFLICT(nome) DO UPDATE SET preco = excluded.preco
+    ''', produto)
+
+
+def _gravar_pedido(conn, pedido):
+    cliente, data, data_entrega, status, itens = pedido
+    # Cliente que ainda não está no cadastro é criado só com o nome
+    conn.execute('''
+        INSERT INTO clientes (nome, data_cadastro) VALUES (?, datetime('now', 'localtime'))
+        ON CONFLICT(nome) DO NOTHING
+    ''', (cliente,))
+    pedido_id = conn.execute('''
+        INSERT INTO pedidos (cliente_id, data, data_entrega, status, total)
+        SELECT id, COALESCE(?2, date('now', 'localtime')), ?3, ?4, 0
+        FROM clientes WHERE nome = ?1
+    ''', (cliente, data, data_entrega, status)).lastrowid
+
+    # produto_id fica nulo para produtos fora do cadastro; o nome é mantido
+    conn.executemany('''
+        INSERT INTO itens_pedido (pedido_id, produto_id, produto, quantidade, preco_unitario, total)
+        VALUES (?1, (SELECT id FROM produtos WHERE nome = ?2), ?2, ?3, ?4, ?3 * ?4)
+    ''', [(pedido_id, *item) for item in itens])
+
+    conn.execute('''
+        UPDATE pedidos
+        SET total = (SELECT COALESCE(SUM(total), 0) FROM itens_pedido WHERE pedido_id = ?1)
+        WHERE id = ?1
+    ''', (pedido_id,))
+
+
+GRAVADORES = {
+    'clientes': _gravar_cliente,
+    'produtos': _gravar_produto,
+    'pedidos': _gravar_pedido,
+}
+
+
+class _Simulacao(Exception):
+    """Força o rollback do lote em modo de simulação"""
+
+
+def importar(db, entidade, registros, lote=1000, simular=False, primeiro=1):
+    """Valida e grava registros em lotes; retorna um ``Relatorio``
+
+    Cada registro é gravado no seu SAVEPOINT: um registro rejeitado não
+    deixa nada no banco (nem o cabeçalho de um pedido sem os itens).
+    Clientes e produtos são atualizados pelo nome quando já existem. Em
+    modo ``simular`` cada lote é executado e desfeito, validando também
+    as restrições do banco sem gravar nada. ``primeiro`` é o número do
+    primeiro registro nas mensagens de erro.
+    """
+    if entidade not in ENTIDADES:
+        raise ValueError(f"Entidade desconhecida: {entidade}")
+
+    if hasattr(db, 'importar'):
+        # Terminal do modo servidor (``loja.remoto.BancoRemoto``): o servidor grava
+        return db.importar(entidade, registros, lote=lote, simular=simular)
+
+    validar = VALIDADORES[entidade]
+    gravar = GRAVADORES[entidade]
+    relatorio = Relatorio(entidade, simular)
+    numerados = enumerate(registros, start=primeiro)
+
+    while True:
+        bloco = list(itertools.islice(numerados, lote))
+        if not bloco:
+            break
+
+        gravados = 0
+        try:
+            with db.transacao() as conn:
+                for numero, registro in bloco:
+                    relatorio.lidos += 1
+                    try:
+                        with db.pool.ponto_salvamento('registro'):
+                            gravar(conn, validar(registro))
+                        gravados += 1
+                    except (ErroImportacao, sqlite3.IntegrityError, AttributeError, OverflowError) as e:
+                        relatorio.rejeitar(numero, str(e))
+                if simular:
+                    raise _Simulacao
+        except _Simulacao:
+            pass
+        relatorio.gravados += gravados
+
+    if relatorio.gravados and not simular:
+        # Muitas linhas mudaram: telas e caches recarregam de uma vez
+        db.publicar(entidade, RECARREGAR, None)
+        if entidade == 'pedidos':
+            db.publicar('itens_pedido', RECARREGAR, None)
+            # Pedidos de clientes fora do cadastro criam o cliente
+            db.publicar('clientes', RECARREGAR, None)
+
+    return relatorio.finalizar()
+
+
+def importar_arquivo(db, entidade, caminho, formato=None, lote=1000, simular=False):
+    """Importa um arquivo CSV ou JSON Lines"""
+    return importar(db, entidade, ler(caminho, entidade, formato), lote=lote, simular=simular)
+
+
+# Exportação
+
+def _em_lotes(cursor, tamanho=1000):
+    while True:
+        linhas = cursor.fetchmany(tamanho)
+        if not linhas:
+            return
+        yield from linhas
+
+
+def registros_clientes(conn):
+    cursor = conn.execute(
+        'SELECT nome, telefone, endereco, data_cadastro FROM clientes ORDER BY nome'
+    )
+    for linha in _em_lotes(cursor):
+        yield dict(zip(COLUNAS_CSV['clientes'], linha))
+
+
+def registros_produtos(conn):
+    cursor = conn.execute('SELECT nome, preco / 100.0 FROM produtos ORDER BY nome')
+    for linha in _em_lotes(cursor):
+        yield dict(zip(COLUNAS_CSV['produtos'], linha))
+
+
+SQL_ITENS_PEDIDOS = '''
+    SELECT p.id, c.nome, p.data, p.data_entrega, p.status,
+           i.produto, i.quantidade, i.preco_unitario / 100.0
+    FROM pedidos p
+    JOIN clientes c ON c.id = p.cliente_id
+    JOIN itens_pedido i ON i.pedido_id = p.id
+    ORDER BY p.id, i.id
+'''
+
+# Com o arquivo anexado; pedidos ainda no principal (arquivamento
+# interrompido) saem uma vez só, e o nome atual do cliente tem preferência
+SQL_ITENS_PEDIDOS_ARQUIVO = f'''
+    SELECT p.id, COALESCE(c.nome, p.cliente_nome), p.data, p.data_entrega, p.status,
+           p.produto, p.quantidade, p.preco_unitario / 100.0
+    FROM (
+        SELECT p.id, p.cliente_id, NULL AS cliente_nome, p.data, p.data_entrega, p.status,
+               i.id AS item_id, i.produto, i.quantidade, i.preco_unitario
+        FROM main.pedidos p
+        JOIN main.itens_pedido i ON i.pedido_id = p.id
+        UNION ALL
+        SELECT a.id, a.cliente_id, a.cliente_nome, a.data, a.data_entrega, a.status,
+               i.id, i.produto, i.quantidade, i.preco_unitario
+        FROM {ESQUEMA}.pedidos a
+        JOIN {ESQUEMA}.itens_pedido i ON i.pedido_id = a.id
+        WHERE NOT EXISTS (SELECT 1 FROM main.pedidos WHERE id = a.id)
+    ) p
+    LEFT JOIN main.clientes c ON c.id = p.cliente_id
+    ORDER BY p.id, p.item_id
+'''
+
+
+def itens_pedidos(conn, com_arquivo=False):
+    """Uma linha por item, com os dados do pedido repetidos"""
+    cursor = conn.execute(SQL_ITENS_PEDIDOS_ARQUIVO if com_arquivo else SQL_ITENS_PEDIDOS)
+    for linha in _em_lotes(cursor):
+        yield dict(zip(COLUNAS_CSV['pedidos'], linha))
+
+
+def registros_pedidos(conn, com_arquivo=False):
+    """Um pedido por registro, com os itens aninhados"""
+    linhas = itens_pedidos(conn, com_arquivo)
+    for pedido_id, grupo in itertools.groupby(linhas, key=lambda l: l['pedido_id']):
+        grupo = list(grupo)
+        primeira = grupo[0]
+        yield {
+            'pedido_id': pedido_id,
+            'cliente': primeira['cliente'],
+            'data': primeira['data'],
+            'data_entrega': primeira['data_entrega'],
+            'status': primeira['status'],
+            'itens': [
+                {
+                    'produto': item['produto'],
+                    'quantidade': item['quantidade'],
+                    'preco_unitario': item['preco_unitario'],
+                }
+                for item in grupo
+            ],
+        }
+
+
+def exportar(db, entidade, caminho, formato=None):
+    """Grava todos os registros da entidade no arquivo; retorna um ``Relatorio``"""
+    if entidade not in ENTIDADES:
+        raise ValueError(f"Entidade desconhecida: {entidade}")
+
+    formato = formato_do_arquivo(caminho, formato)
+    relatorio = Relatorio(entidade)
+
+    with db.get_connection() as conn:
+        # Pedidos arquivados também saem (ATTACH precisa ser fora da transação)
+        com_arquivo = entidade == 'pedidos' and db.arquivo.ativo()
+        if com_arquivo:
+            db.arquivo.anexar(conn)
+        # Transação de leitura: o arquivo reflete um único instante do banco
+        conn.execute('BEGIN')
+        try:
+            if formato == 'jsonl':
+                gerador = {
+                    'clientes': registros_clientes,
+                    'produtos': registros_produtos,
+                    'pedidos': partial(registros_pedidos, com_arquivo=com_arquivo),
+                }[entidade](conn)
+                with open(caminho, 'w', encoding='utf-8') as arquivo:
+                    for registro in gerador:
+                        arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                        relatorio.lidos += 1
+            else:
+                gerador = {
+                    'clientes': registros_clientes,
+                    'produtos': registros_produtos,
+                    'pedidos': partial(itens_pedidos, com_arquivo=com_arquivo),
+                }[entidade](conn)
+                with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+                    escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_CSV[entidade])
+                    escritor.writeheader()
+                    for registro in gerador:
+                        escritor.writerow(registro)
+                        relatorio.lidos += 1
+        finally:
+            conn.rollback()
+
+    relatorio.gravados = relatorio.lidos
+    return relatorio.finalizar()
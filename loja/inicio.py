@@ -0,0 +1,102 @@
+"""Apoio à inicialização rápida do aplicativo
+
+- ``ModuloTardio``: adia o import de módulos pesados (customtkinter,
+  tkinter) até o primeiro uso.
+- ``SnapshotInicial``: guarda em JSON um pedaço pequeno das listas para
+  a primeira tela aparecer antes de o banco ser aberto.
+- ``MedidorInicio``: com ``LOJA_MEDIR_INICIO=1`` mede o tempo de cada
+  etapa (imports, primeiro quadro, dados carregados) e dos imports
+  tardios, e imprime o resultado em JSON.
+"""
+
+import importlib
+import json
+import os
+import sys
+import time
+
+
+class MedidorInicio:
+    """Marca o tempo decorrido desde o início do processo em cada etapa"""
+
+    def __init__(self, inicio=None, ativo=None):
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        if ativo is None:
+            ativo = os.environ.get("LOJA_MEDIR_INICIO", "") not in ("", "0")
+        self.ativo = ativo
+        self.etapas = []
+        self.imports = []
+
+    def marcar(self, etapa):
+        """Registra que a etapa terminou agora"""
+        if self.ativo:
+            self.etapas.append((etapa, time.perf_counter() - self.inicio))
+
+    def registrar_import(self, modulo, segundos):
+        if self.ativo:
+            self.imports.append((modulo, segundos))
+
+    def relatorio(self):
+        """Etapas e imports tardios em milissegundos"""
+        return {
+            "etapas_ms": {etapa: round(s * 1000, 1) for etapa, s in self.etapas},
+            "imports_tardios_ms": {modulo: round(s * 1000, 1) for modulo, s in self.imports},
+            "modulos_carregados": len(sys.modules),
+        }
+
+    def imprimir(self):
+        """Imprime o relatório em uma linha JSON (só no modo de medição)"""
+        if self.ativo:
+            print(json.dumps({"medicao_inicio": self.relatorio()}, ensure_ascii=False), flush=True)
+
+
+class ModuloTardio:
+    """Representa um módulo que só é importado no primeiro acesso a um atributo"""
+
+    def __init__(self, nome, medidor=None):
+        self._nome = nome
+        self._medidor = medidor
+        self._modulo = None
+
+    def _carregar(self):
+        if self._modulo is None:
+            inicio = time.perf_counter()
+            self._modulo = importlib.import_module(self._nome)
+            if self._medidor is not None:
+                self._medidor.registrar_import(self._nome, time.perf_counter() - inicio)
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._carregar(), atributo)
+
+
+class SnapshotInicial:
+    """Cópia pequena das listas da tela inicial, gravada em JSON"""
+
+    LIMITE = 50
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def carregar(self):
+        """Retorna {'clientes', 'produtos', 'pedidos'} ou None se não houver snapshot"""
+        try:
+            with open(self.caminho, encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+
+    def salvar(self, clientes, produtos, pedidos):
+        """Grava as primeiras linhas de cada lista (troca atômica do arquivo)"""
+        dados = {
+            "clientes": list(clientes)[:self.LIMITE],
+            "produtos": [list(p) for p in list(produtos)[:self.LIMITE]],
+            "pedidos": [list(p) for p in list(pedidos)[:self.LIMITE]],
+        }
+        temporario = self.caminho + ".tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                json.dump(dados, arquivo, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except OSError:
+            pass
@@ -0,0 +1,34 @@
+"""Medição de tempos: percentis e repetição cronometrada
+
+Usados pelas estatísticas da busca enquanto digita, do executor de
+tarefas e pelo ``loja.benchmark``.
+"""
+
+import statistics
+import time
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0-100) de uma lista de números, ou 0.0 se vazia"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def medir(funcao, repeticoes=20, aquecimento=1):
+    """Executa ``funcao`` várias vezes; retorna tempos em ms"""
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "repeticoes": repeticoes,
+        "min_ms": round(min(tempos), 3),
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "p95_ms": round(percentil(tempos, 95), 3),
+    }
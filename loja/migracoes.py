@@ -0,0 +1,751 @@
+"""Criação e atualização versionada do esquema do banco
+
+A versão aplicada fica em ``PRAGMA user_version``. Cada migração é uma
+lista de comandos SQL (ou funções que recebem a conexão) executada em uma
+única transação; migrações novas devem ser acrescentadas ao final.
+As chaves estrangeiras ficam desligadas durante as migrações (para as
+reconstruções de tabela) e, a partir de ``VERSAO_CHAVES``, são conferidas
+antes de cada commit.
+"""
+
+import re
+import sqlite3
+
+
+def fts5_disponivel(conn):
+    """Indica se o SQLite em uso foi compilado com FTS5"""
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp._teste_fts5 USING fts5(x)')
+        conn.execute('DROP TABLE temp._teste_fts5')
+        return True
+    except Exception:
+        return False
+
+
+# Tokenizador sem acentos ("joao" encontra "João") e com índice de prefixos
+TOKENIZADOR = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# Documento de busca do pedido: número, cliente e nomes dos produtos
+DOCUMENTO_PEDIDO = '''
+    INSERT INTO busca_pedidos(rowid, numero, cliente, produtos)
+    SELECT p.id, p.id, p.cliente_nome,
+           (SELECT group_concat(i.produto, ' ') FROM itens_pedido i WHERE i.pedido_id = p.id)
+    FROM pedidos p
+'''
+
+INDICES_BUSCA = [
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS busca_clientes USING fts5(
+        nome, telefone, endereco,
+        content = 'clientes', content_rowid = 'id', {TOKENIZADOR}
+    )
+    ''',
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS busca_produtos USING fts5(
+        nome,
+        content = 'produtos', content_rowid = 'id', {TOKENIZADOR}
+    )
+    ''',
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS busca_pedidos USING fts5(
+        numero, cliente, produtos, {TOKENIZADOR}
+    )
+    ''',
+
+    # Clientes
+    '''
+    CREATE TRIGGER IF NOT EXISTS busca_clientes_ai AFTER INSERT ON clientes BEGIN
+        INSERT INTO busca_clientes(rowid, nome, telefone, endereco)
+        VALUES (new.id, new.nome, new.telefone, new.endereco);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS busca_clientes_ad AFTER DELETE ON clientes BEGIN
+        INSERT INTO busca_clientes(busca_clientes, rowid, nome, telefone, endereco)
+        VALUES ('delete', old.id, old.nome, old.telefone, old.endereco);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS busca_clientes_au AFTER UPDATE ON clientes BEGIN
+        INSERT INTO busca_clientes(busca_clientes, rowid, nome, telefone, endereco)
+        VALUES ('delete', old.id, old.nome, old.telefone, old.endereco);
+        INSERT INTO busca_clientes(rowid, nome, telefone, endereco)
+        VALUES (new.id, new.nome, new.telefone, new.endereco);
+    END
+    ''',
+
+    # Produtos
+    '''
+    CREATE TRIGGER IF NOT EXISTS busca_produtos_ai AFTER INSERT ON produtos BEGIN
+        INSERT INTO busca_produtos(rowid, nome) VALUES (new.id, new.nome);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS busca_produtos_ad AFTER DELETE ON produtos BEGIN
+        INSERT INTO busca_produtos(busca_produtos, rowid, nome) VALUES ('delete', old.id, old.nome);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS busca_produtos_au AFTER UPDATE OF nome ON produtos BEGIN
+        INSERT INTO busca_produtos(busca_produtos, rowid, nome) VALUES ('delete', old.id, old.nome);
+        INSERT INTO busca_produtos(rowid, nome) VALUES (new.id, new.nome);
+    END
+    ''',
+
+    # Pedidos e itens: o documento do pedido é remontado a cada mudança
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_pedidos_ai AFTER INSERT ON pedidos BEGIN
+        {DOCUMENTO_PEDIDO} WHERE p.id = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS busca_pedidos_ad AFTER DELETE ON pedidos BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = old.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_pedidos_au AFTER UPDATE OF cliente_nome ON pedidos BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = old.id;
+        {DOCUMENTO_PEDIDO} WHERE p.id = new.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_itens_ai AFTER INSERT ON itens_pedido BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = new.pedido_id;
+        {DOCUMENTO_PEDIDO} WHERE p.id = new.pedido_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_itens_ad AFTER DELETE ON itens_pedido BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = old.pedido_id;
+        {DOCUMENTO_PEDIDO} WHERE p.id = old.pedido_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_itens_au AFTER UPDATE OF produto ON itens_pedido BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = new.pedido_id;
+        {DOCUMENTO_PEDIDO} WHERE p.id = new.pedido_id;
+    END
+    ''',
+
+    # Indexar o que já existe
+    "INSERT INTO busca_clientes(busca_clientes) VALUES ('rebuild')",
+    "INSERT INTO busca_produtos(busca_produtos) VALUES ('rebuild')",
+    'DELETE FROM busca_pedidos',
+    DOCUMENTO_PEDIDO,
+]
+
+
+def _criar_indices_busca(conn):
+    """Cria os índices FTS5 e os gatilhos que os mantêm sincronizados"""
+    # Sem FTS5 a busca cai para LIKE (ver loja.busca)
+    if not fts5_disponivel(conn):
+        return
+    for comando in INDICES_BUSCA:
+        conn.execute(comando)
+
+
+# Pedidos pendentes por data de entrega, mantido pelos gatilhos abaixo
+RESUMO_ENTREGAS = [
+    '''
+    CREATE TABLE IF NOT EXISTS resumo_entregas (
+        data_entrega TEXT PRIMARY KEY,
+        pendentes INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    'DELETE FROM resumo_entregas',
+    '''
+    INSERT INTO resumo_entregas (data_entrega, pendentes)
+    SELECT data_entrega, COUNT(*)
+    FROM pedidos
+    WHERE status = 'pendente' AND data_entrega IS NOT NULL
+    GROUP BY data_entrega
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS resumo_entregas_ai AFTER INSERT ON pedidos
+    WHEN new.status = 'pendente' AND new.data_entrega IS NOT NULL BEGIN
+        INSERT INTO resumo_entregas (data_entrega, pendentes) VALUES (new.data_entrega, 1)
+        ON CONFLICT(data_entrega) DO UPDATE SET pendentes = pendentes + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS resumo_entregas_ad AFTER DELETE ON pedidos
+    WHEN old.status = 'pendente' AND old.data_entrega IS NOT NULL BEGIN
+        UPDATE resumo_entregas SET pendentes = pendentes - 1 WHERE data_entrega = old.data_entrega;
+        DELETE FROM resumo_entregas WHERE data_entrega = old.data_entrega AND pendentes <= 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS resumo_entregas_au AFTER UPDATE OF status, data_entrega ON pedidos BEGIN
+        UPDATE resumo_entregas SET pendentes = pendentes - 1
+        WHERE old.status = 'pendente' AND data_entrega = old.data_entrega;
+        DELETE FROM resumo_entregas WHERE data_entrega = old.data_entrega AND pendentes <= 0;
+        INSERT INTO resumo_entregas (data_entrega, pendentes)
+        SELECT new.data_entrega, 1
+        WHERE new.status = 'pendente' AND new.data_entrega IS NOT NULL
+        ON CONFLICT(data_entrega) DO UPDATE SET pendentes = pendentes + 1;
+    END
+    ''',
+]
+
+
+def _somar(tabela, coluna_chave, chave, valores, quando=None):
+    """UPSERT que soma ``valores`` ({coluna: expressão}) à linha da chave"""
+    colunas = ', '.join([coluna_chave, *valores])
+    expressoes = ', '.join([chave, *valores.values()])
+    soma = ', '.join(f'{c} = {c} + excluded.{c}' for c in valores)
+    origem = f'SELECT {expressoes} WHERE {quando}' if quando else f'VALUES ({expressoes})'
+    return (
+        f'INSERT INTO {tabela} ({colunas}) {origem} '
+        f'ON CONFLICT({coluna_chave}) DO UPDATE SET {soma};'
+    )
+
+
+def _gatilhos_estatisticas(cliente='cliente_nome', produto='produto'):
+    """Gatilhos que mantêm as tabelas de estatísticas a cada escrita
+
+    ``cliente`` e ``produto`` são as colunas de ``pedidos`` e
+    ``itens_pedido`` usadas como chave (nomes até a migração 8, ids depois).
+    """
+    dia = "COALESCE(date({r}.data), {r}.data, '')"
+
+    def pedido(r, sinal):
+        valores = {'pedidos': f'{sinal}1', 'receita': f'{sinal}{r}.total'}
+        return '\n'.join([
+            _somar('estatisticas_diarias', 'dia', dia.format(r=r), valores),
+            _somar('estatisticas_status', 'status', f'{r}.status', valores),
+            _somar('estatisticas_clientes', cliente, f'{r}.{cliente}', valores),
+        ])
+
+    def item(r, sinal):
+        # Itens de produtos excluídos (produto_id nulo) ficam de fora
+        return _somar('estatisticas_produtos', produto, f'{r}.{produto}', {
+            'quantidade': f'{sinal}{r}.quantidade',
+            'receita': f'{sinal}{r}.total',
+        }, quando=f'{r}.{produto} IS NOT NULL')
+
+    limpar_pedidos = '''
+        DELETE FROM estatisticas_diarias WHERE pedidos <= 0;
+        DELETE FROM estatisticas_status WHERE pedidos <= 0;
+        DELETE FROM estatisticas_clientes WHERE pedidos <= 0;
+    '''
+    limpar_itens = 'DELETE FROM estatisticas_produtos WHERE quantidade <= 0;'
+
+    def contador(chave, sinal):
+        return f"UPDATE estatisticas_totais SET valor = valor {sinal} 1 WHERE chave = '{chave}';"
+
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_pedidos_ai AFTER INSERT ON pedidos BEGIN {pedido("new", "")} END',
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_pedidos_ad AFTER DELETE ON pedidos BEGIN {pedido("old", "-")} {limpar_pedidos} END',
+        f'''CREATE TRIGGER IF NOT EXISTS estatisticas_pedidos_au
+           AFTER UPDATE OF data, status, total, {cliente} ON pedidos BEGIN
+           {pedido("old", "-")} {pedido("new", "")} {limpar_pedidos} END''',
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_itens_ai AFTER INSERT ON itens_pedido BEGIN {item("new", "")} END',
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_itens_ad AFTER DELETE ON itens_pedido BEGIN {item("old", "-")} {limpar_itens} END',
+        f'''CREATE TRIGGER IF NOT EXISTS estatisticas_itens_au
+           AFTER UPDATE OF {produto}, quantidade, total ON itens_pedido BEGIN
+           {item("old", "-")} {item("new", "")} {limpar_itens} END''',
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_clientes_ai AFTER INSERT ON clientes BEGIN {contador("clientes", "+")} END',
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_clientes_ad AFTER DELETE ON clientes BEGIN {contador("clientes", "-")} END',
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_produtos_ai AFTER INSERT ON produtos BEGIN {contador("produtos", "+")} END',
+        f'CREATE TRIGGER IF NOT EXISTS estatisticas_produtos_ad AFTER DELETE ON produtos BEGIN {contador("produtos", "-")} END',
+    ]
+
+
+# Agregados de pedidos por dia, status, cliente e produto (ver loja.estatisticas)
+ESTATISTICAS = [
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_diarias (
+        dia TEXT PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_status (
+        status TEXT PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_clientes (
+        cliente_nome TEXT PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_produtos (
+        produto TEXT PRIMARY KEY,
+        quantidade INTEGER NOT NULL DEFAULT 0,
+        receita REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS estatisticas_totais (
+        chave TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_estatisticas_clientes_receita ON estatisticas_clientes(receita)',
+    'CREATE INDEX IF NOT EXISTS idx_estatisticas_produtos_receita ON estatisticas_produtos(receita)',
+
+    # Carga inicial a partir dos dados existentes
+    '''
+    INSERT OR REPLACE INTO estatisticas_diarias (dia, pedidos, receita)
+    SELECT COALESCE(date(data), data, ''), COUNT(*), COALESCE(SUM(total), 0)
+    FROM pedidos GROUP BY 1
+    ''',
+    '''
+    INSERT OR REPLACE INTO estatisticas_status (status, pedidos, receita)
+    SELECT status, COUNT(*), COALESCE(SUM(total), 0) FROM pedidos GROUP BY status
+    ''',
+    '''
+    INSERT OR REPLACE INTO estatisticas_clientes (cliente_nome, pedidos, receita)
+    SELECT cliente_nome, COUNT(*), COALESCE(SUM(total), 0) FROM pedidos GROUP BY cliente_nome
+    ''',
+    '''
+    INSERT OR REPLACE INTO estatisticas_produtos (produto, quantidade, receita)
+    SELECT produto, SUM(quantidade), COALESCE(SUM(total), 0) FROM itens_pedido GROUP BY produto
+    ''',
+    '''
+    INSERT OR REPLACE INTO estatisticas_totais (chave, valor)
+    VALUES ('clientes', (SELECT COUNT(*) FROM clientes)),
+           ('produtos', (SELECT COUNT(*) FROM produtos))
+    ''',
+    *_gatilhos_estatisticas(),
+]
+
+
+def _remover_gatilhos(conn):
+    """Remove todos os gatilhos e retorna {nome: SQL} para recriá-los depois"""
+    gatilhos = dict(conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"
+    ).fetchall())
+    for nome in gatilhos:
+        conn.execute(f'DROP TRIGGER "{nome}"')
+    return gatilhos
+
+
+def _reconstruir(conn, tabela, criar, colunas):
+    """Recria ``tabela`` com outro esquema preservando índices e sequência
+
+    ``criar`` é o CREATE TABLE com ``{tabela}`` no lugar do nome e
+    ``colunas`` mapeia cada coluna nova à expressão sobre a tabela antiga.
+    Os gatilhos precisam ter sido removidos antes (``_remover_gatilhos``).
+    """
+    indices = [sql for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (tabela,)
+    )]
+    sequencia = conn.execute(
+        'SELECT seq FROM sqlite_sequence WHERE name = ?', (tabela,)
+    ).fetchone()
+
+    novo = f'{tabela}_novo'
+    conn.execute(criar.format(tabela=novo))
+    conn.execute(
+        f"INSERT INTO {novo} ({', '.join(colunas)}) "
+        f"SELECT {', '.join(colunas.values())} FROM {tabela}"
+    )
+    conn.execute(f'DROP TABLE {tabela}')
+    conn.execute(f'ALTER TABLE {novo} RENAME TO {tabela}')
+    for sql in indices:
+        conn.execute(sql)
+
+    # Não reutilizar ids de linhas apagadas no fim da tabela
+    if sequencia:
+        if not conn.execute(
+            'UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?', (sequencia[0], tabela)
+        ).rowcount:
+            conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (tabela, sequencia[0]))
+
+
+# Reais (REAL) -> centavos (INTEGER)
+EM_CENTAVOS = 'CAST(ROUND({} * 100) AS INTEGER)'
+
+
+def _migrar_centavos(conn):
+    """Preços e totais passam a ser centavos inteiros (somas exatas)"""
+    gatilhos = _remover_gatilhos(conn)
+
+    _reconstruir(conn, 'produtos', '''
+        CREATE TABLE {tabela} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            preco INTEGER NOT NULL DEFAULT 0
+        )
+    ''', {'id': 'id', 'nome': 'nome', 'preco': EM_CENTAVOS.format('preco')})
+
+    # Total do item recalculado a partir do preço unitário já arredondado
+    _reconstruir(conn, 'itens_pedido', '''
+        CREATE TABLE {tabela} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL REFERENCES pedidos(id),
+            produto TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_unitario INTEGER NOT NULL,
+            total INTEGER NOT NULL
+        )
+    ''', {
+        'id': 'id',
+        'pedido_id': 'pedido_id',
+        'produto': 'produto',
+        'quantidade': 'quantidade',
+        'preco_unitario': EM_CENTAVOS.format('preco_unitario'),
+        'total': f"quantidade * {EM_CENTAVOS.format('preco_unitario')}",
+    })
+
+    # Total do pedido = soma exata dos itens (pedidos sem itens mantêm o valor)
+    _reconstruir(conn, 'pedidos', '''
+        CREATE TABLE {tabela} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_nome TEXT NOT NULL,
+            data TEXT NOT NULL DEFAULT (date('now', 'localtime')),
+            data_entrega TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            total INTEGER NOT NULL DEFAULT 0
+        )
+    ''', {
+        'id': 'id',
+        'cliente_nome': 'cliente_nome',
+        'data': 'data',
+        'data_entrega': 'data_entrega',
+        'status': 'status',
+        'total': (
+            'COALESCE((SELECT SUM(i.total) FROM itens_pedido i WHERE i.pedido_id = pedidos.id), '
+            f"{EM_CENTAVOS.format('total')})"
+        ),
+    })
+
+    # Estatísticas: mesmas tabelas com receita INTEGER, recalculadas do zero
+    for tabela in ('estatisticas_diarias', 'estatisticas_status',
+                   'estatisticas_clientes', 'estatisticas_produtos'):
+        conn.execute(f'DROP TABLE IF EXISTS {tabela}')
+    for comando in ESTATISTICAS:
+        if not comando.lstrip().startswith('CREATE TRIGGER'):
+            conn.execute(comando.replace('receita REAL', 'receita INTEGER'))
+
+    for sql in gatilhos.values():
+        conn.execute(sql)
+
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'busca_produtos'").fetchone():
+        conn.execute("INSERT INTO busca_produtos(busca_produtos) VALUES ('rebuild')")
+
+
+# Documento de busca do pedido a partir da migração 8 (nome vem do cadastro)
+DOCUMENTO_PEDIDO_IDS = '''
+    INSERT INTO busca_pedidos(rowid, numero, cliente, produtos)
+    SELECT p.id, p.id, c.nome,
+           (SELECT group_concat(i.produto, ' ') FROM itens_pedido i WHERE i.pedido_id = p.id)
+    FROM pedidos p
+    JOIN clientes c ON c.id = p.cliente_id
+'''
+
+GATILHOS_BUSCA_PEDIDOS_IDS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_pedidos_ai AFTER INSERT ON pedidos BEGIN
+        {DOCUMENTO_PEDIDO_IDS} WHERE p.id = new.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_pedidos_au AFTER UPDATE OF cliente_id ON pedidos BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = old.id;
+        {DOCUMENTO_PEDIDO_IDS} WHERE p.id = new.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_itens_ai AFTER INSERT ON itens_pedido BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = new.pedido_id;
+        {DOCUMENTO_PEDIDO_IDS} WHERE p.id = new.pedido_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_itens_ad AFTER DELETE ON itens_pedido BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = old.pedido_id;
+        {DOCUMENTO_PEDIDO_IDS} WHERE p.id = old.pedido_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_itens_au AFTER UPDATE OF produto ON itens_pedido BEGIN
+        DELETE FROM busca_pedidos WHERE rowid = new.pedido_id;
+        {DOCUMENTO_PEDIDO_IDS} WHERE p.id = new.pedido_id;
+    END
+    ''',
+    # Cliente renomeado: só os documentos dos pedidos dele (idx_pedidos_cliente)
+    f'''
+    CREATE TRIGGER IF NOT EXISTS busca_pedidos_cliente_au AFTER UPDATE OF nome ON clientes
+    WHEN new.nome IS NOT old.nome BEGIN
+        DELETE FROM busca_pedidos WHERE rowid IN (SELECT id FROM pedidos WHERE cliente_id = new.id);
+        {DOCUMENTO_PEDIDO_IDS} WHERE p.cliente_id = new.id;
+    END
+    ''',
+]
+
+# Agregados por cliente e produto passam a usar o id como chave
+ESTATISTICAS_IDS = [
+    'DROP TABLE IF EXISTS estatisticas_clientes',
+    'DROP TABLE IF EXISTS estatisticas_produtos',
+    '''
+    CREATE TABLE estatisticas_clientes (
+        cliente_id INTEGER PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE estatisticas_produtos (
+        produto_id INTEGER PRIMARY KEY,
+        quantidade INTEGER NOT NULL DEFAULT 0,
+        receita INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX idx_estatisticas_clientes_receita ON estatisticas_clientes(receita)',
+    'CREATE INDEX idx_estatisticas_produtos_receita ON estatisticas_produtos(receita)',
+    '''
+    INSERT INTO estatisticas_clientes (cliente_id, pedidos, receita)
+    SELECT cliente_id, COUNT(*), COALESCE(SUM(total), 0) FROM pedidos GROUP BY cliente_id
+    ''',
+    '''
+    INSERT INTO estatisticas_produtos (produto_id, quantidade, receita)
+    SELECT produto_id, SUM(quantidade), COALESCE(SUM(total), 0)
+    FROM itens_pedido WHERE produto_id IS NOT NULL GROUP BY produto_id
+    ''',
+]
+
+_NOME_GATILHO = re.compile(r'CREATE TRIGGER IF NOT EXISTS (\w+)')
+
+
+def _migrar_chaves(conn):
+    """Pedidos e itens passam a referenciar clientes e produtos pelo id
+
+    O item guarda também o nome do produto na data do pedido (comandas e
+    histórico); renomear um cliente ou produto altera uma única linha.
+    """
+    # Ainda com os gatilhos ativos, para busca e contadores verem as mudanças
+    conn.execute('DELETE FROM itens_pedido WHERE pedido_id NOT IN (SELECT id FROM pedidos)')
+    conn.execute('''
+        INSERT INTO clientes (nome)
+        SELECT DISTINCT cliente_nome FROM pedidos
+        WHERE cliente_nome NOT IN (SELECT nome FROM clientes)
+    ''')
+
+    gatilhos = _remover_gatilhos(conn)
+
+    _reconstruir(conn, 'pedidos', '''
+        CREATE TABLE {tabela} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL REFERENCES clientes(id) ON DELETE RESTRICT,
+            data TEXT NOT NULL DEFAULT (date('now', 'localtime')),
+            data_entrega TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            total INTEGER NOT NULL DEFAULT 0
+        )
+    ''', {
+        'id': 'id',
+        'cliente_id': '(SELECT c.id FROM clientes c WHERE c.nome = pedidos.cliente_nome)',
+        'data': 'data',
+        'data_entrega': 'data_entrega',
+        'status': 'status',
+        'total': 'total',
+    })
+
+    # Produto excluído do cadastro: o item fica com produto_id nulo e o nome
+    _reconstruir(conn, 'itens_pedido', '''
+        CREATE TABLE {tabela} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL REFERENCES pedidos(id) ON DELETE CASCADE,
+            produto_id INTEGER REFERENCES produtos(id) ON DELETE SET NULL,
+            produto TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_unitario INTEGER NOT NULL,
+            total INTEGER NOT NULL
+        )
+    ''', {
+        'id': 'id',
+        'pedido_id': 'pedido_id',
+        'produto_id': '(SELECT pr.id FROM produtos pr WHERE pr.nome = itens_pedido.produto)',
+        'produto': 'produto',
+        'quantidade': 'quantidade',
+        'preco_unitario': 'preco_unitario',
+        'total': 'total',
+    })
+
+    # Histórico do cliente só pelo índice; produto_id também serve ao ON DELETE
+    conn.execute(
+        'CREATE INDEX idx_pedidos_cliente ON pedidos(cliente_id, data, data_entrega, status, total)'
+    )
+    conn.execute('CREATE INDEX idx_itens_pedido_produto ON itens_pedido(produto_id, pedido_id)')
+
+    for comando in ESTATISTICAS_IDS:
+        conn.execute(comando)
+
+    novos = _gatilhos_estatisticas('cliente_id', 'produto_id')
+    if 'busca_pedidos_ai' in gatilhos:
+        novos += GATILHOS_BUSCA_PEDIDOS_IDS
+    substituidos = {_NOME_GATILHO.search(sql).group(1) for sql in novos}
+    for nome, sql in gatilhos.items():
+        if nome not in substituidos:
+            conn.execute(sql)
+    for sql in novos:
+        conn.execute(sql)
+
+
+# Contador de alterações por tabela de cadastro (ver loja.catalogo)
+VERSOES_TABELAS = [
+    '''
+    CREATE TABLE IF NOT EXISTS versoes_tabelas (
+        tabela TEXT PRIMARY KEY,
+        versao INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    "INSERT OR IGNORE INTO versoes_tabelas (tabela) VALUES ('clientes'), ('produtos')",
+] + [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS versao_{tabela}_{sufixo} AFTER {evento} ON {tabela} BEGIN
+        UPDATE versoes_tabelas SET versao = versao + 1 WHERE tabela = '{tabela}';
+    END
+    '''
+    for tabela in ('clientes', 'produtos')
+    for sufixo, evento in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+]
+
+
+MIGRACOES = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS clientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            telefone TEXT,
+            endereco TEXT,
+            data_cadastro TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            preco REAL NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_nome TEXT NOT NULL,
+            data TEXT NOT NULL DEFAULT (date('now', 'localtime')),
+            data_entrega TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            total REAL NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS itens_pedido (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL REFERENCES pedidos(id),
+            produto TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_unitario REAL NOT NULL,
+            total REAL NOT NULL
+        )
+        ''',
+    ]),
+    (2, [
+        # Índices usados pelas consultas de entregas, listagem e itens
+        'CREATE INDEX IF NOT EXISTS idx_pedidos_status_entrega ON pedidos(status, data_entrega)',
+        'CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos(data)',
+        'CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido ON itens_pedido(pedido_id)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_clientes_nome ON clientes(nome)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_produtos_nome ON produtos(nome)',
+    ]),
+    (3, [
+        _criar_indices_busca,
+    ]),
+    (4, RESUMO_ENTREGAS),
+    (5, ESTATISTICAS),
+    (6, [
+        _migrar_centavos,
+    ]),
+    (7, [
+        # Progresso de tarefas longas feitas em lotes fora das migrações
+        '''
+        CREATE TABLE IF NOT EXISTS tarefas_manutencao (
+            tarefa TEXT PRIMARY KEY,
+            ultimo_id INTEGER NOT NULL DEFAULT 0,
+            concluida INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        # Datas antigas são convertidas por loja.datas.normalizar_datas
+        "INSERT OR IGNORE INTO tarefas_manutencao (tarefa) VALUES ('normalizar_datas')",
+    ]),
+    (8, [
+        _migrar_chaves,
+    ]),
+    (9, VERSOES_TABELAS),
+]
+
+
+# Primeira versão com as chaves conferidas: antes dela bancos antigos podem
+# ter itens de pedidos excluídos, removidos por ``_migrar_chaves``
+VERSAO_CHAVES = 8
+
+
+def versao_atual(conn):
+    """Versão do esquema gravada no banco"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def versao_mais_recente():
+    """Maior versão conhecida pelo código"""
+    return MIGRACOES[-1][0] if MIGRACOES else 0
+
+
+def migrar(conn):
+    """Aplica as migrações pendentes e retorna a versão final do esquema"""
+    if conn.in_transaction:
+        conn.commit()
+
+    versao = versao_atual(conn)
+    aplicou = False
+
+    # Só tem efeito fora de transação; restaurado no fim
+    chaves_estrangeiras = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys = OFF')
+    try:
+        for numero, passos in MIGRACOES:
+            if numero <= versao:
+                continue
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for passo in passos:
+                    if callable(passo):
+                        passo(conn)
+                    else:
+                        conn.execute(passo)
+                violacoes = []
+                if numero >= VERSAO_CHAVES:
+                    violacoes = conn.execute('PRAGMA foreign_key_check').fetchall()
+                if violacoes:
+                    raise sqlite3.IntegrityError(
+                        f"Migração {numero} deixou chaves estrangeiras inválidas: {violacoes[:5]}"
+                    )
+                conn.execute(f'PRAGMA user_version = {int(numero)}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            versao = numero
+            aplicou = True
+    finally:
+        conn.execute(f'PRAGMA foreign_keys = {int(chaves_estrangeiras)}')
+
+    # Atualizar estatísticas do planejador depois de mudanças no esquema
+    if aplicou:
+        conn.execute('ANALYZE')
+        if conn.in_transaction:
+            conn.commit()
+
+    return versao
@@ -0,0 +1,47 @@
+"""Paginação por chave (keyset) da lista de pedidos
+
+Em vez de ``OFFSET``, cada página continua a partir do último par
+``(data, id)`` já entregue, então buscar a página 500 custa o mesmo que
+buscar a primeira e o índice ``idx_pedidos_data`` é usado diretamente.
+Com ``com_arquivo`` as páginas incluem os pedidos arquivados
+(``loja.arquivamento``), consultados só quando podem entrar na página.
+"""
+
+from loja.repositorio import PedidoRepo
+
+
+class PaginadorPedidos:
+    """Fonte de dados paginada de pedidos, ordenada por data e id decrescentes"""
+
+    def __init__(self, db, tamanho_pagina=100, com_arquivo=False):
+        self.db = db
+        self.pedidos = PedidoRepo(db)
+        self.com_arquivo = com_arquivo
+        self.tamanho_pagina = tamanho_pagina
+        self.reiniciar()
+
+    def reiniciar(self, termo='', status=None):
+        """Volta para a primeira página com novos filtros"""
+        self.termo = (termo or '').strip()
+        self.status = status if status and status != 'todos' else None
+        self._ultima_chave = None
+        self.fim = False
+        self.carregados = 0
+
+    def proxima_pagina(self):
+        """Retorna as linhas da próxima página (lista vazia no fim)"""
+        if self.fim:
+            return []
+
+        fonte = self.db.arquivo if self.com_arquivo else self.pedidos
+        linhas = fonte.pagina(
+            self.termo, self.status, self._ultima_chave, self.tamanho_pagina
+        )
+
+        if len(linhas) < self.tamanho_pagina:
+            self.fim = True
+        if linhas:
+            ultima = linhas[-1]
+            self._ultima_chave = (ultima[1], ultima[0])
+            self.carregados += len(linhas)
+        return linhas
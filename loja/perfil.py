@@ -0,0 +1,244 @@
+"""Perfil das consultas SQL executadas pelo pool de conexões
+
+Com o perfil desligado o pool usa conexões e cursores comuns do sqlite3,
+sem custo algum. Ligado (menu de debug ou ``LOJA_PERFIL_SQL=1``), as
+conexões retiradas do pool são ``ConexaoPerfilada`` e uma fração
+``amostragem`` dos comandos é medida no ``execute``: tempo de execução e
+leitura das linhas, quantidade de linhas e o local que chamou.
+Comandos acima de ``limite_ms`` entram no registro de consultas lentas
+junto com o ``EXPLAIN QUERY PLAN`` (calculado uma vez por SQL).
+"""
+
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+_ESPACOS = re.compile(r'\s+')
+_ARQUIVOS_IGNORADOS = (os.path.normcase(__file__),)
+
+
+def _origem():
+    """arquivo:linha (função) do primeiro chamador fora deste módulo"""
+    quadro = sys._getframe(2)
+    while quadro is not None and os.path.normcase(quadro.f_code.co_filename) in _ARQUIVOS_IGNORADOS:
+        quadro = quadro.f_back
+    if quadro is None:
+        return '?'
+    codigo = quadro.f_code
+    return f"{os.path.basename(codigo.co_filename)}:{quadro.f_lineno} ({codigo.co_name})"
+
+
+class Medicao:
+    """Uma execução medida: tempo acumulado até a última linha lida"""
+
+    __slots__ = ('sql', 'parametros', 'origem', 'inicio', 'segundos', 'linhas', 'conexao')
+
+    def __init__(self, sql, parametros, origem, conexao):
+        self.sql = sql
+        self.parametros = parametros
+        self.origem = origem
+        self.conexao = conexao
+        self.inicio = time.time()
+        self.segundos = 0.0
+        self.linhas = 0
+
+
+class PerfilConsultas:
+    """Totais por comando SQL e registro rotativo das consultas lentas"""
+
+    def __init__(self, ativo=None, amostragem=None, limite_ms=50.0, tamanho_registro=200):
+        if ativo is None:
+            ativo = os.environ.get("LOJA_PERFIL_SQL", "") not in ("", "0")
+        if amostragem is None:
+            amostragem = float(os.environ.get("LOJA_PERFIL_AMOSTRAGEM", "1.0"))
+        self.ativo = ativo
+        self.amostragem = amostragem
+        self.limite_ms = limite_ms
+
+        self._lock = threading.Lock()
+        self._totais = {}
+        self._lentas = deque(maxlen=tamanho_registro)
+        self._planos = {}
+
+    def amostrar(self):
+        return self.ativo and (self.amostragem >= 1.0 or random.random() < self.amostragem)
+
+    def ativar(self, amostragem=None, limite_ms=None):
+        if amostragem is not None:
+            self.amostragem = amostragem
+        if limite_ms is not None:
+            self.limite_ms = limite_ms
+        self.ativo = True
+
+    def desativar(self):
+        self.ativo = False
+
+    def limpar(self):
+        with self._lock:
+            self._totais.clear()
+            self._lentas.clear()
+
+    def registrar(self, medicao):
+        """Acumula a medição; consultas lentas ganham o plano de execução"""
+        sql = _ESPACOS.sub(' ', medicao.sql).strip()
+        milissegundos = medicao.segundos * 1000
+
+        lenta = milissegundos >= self.limite_ms
+        plano = None
+        if lenta:
+            plano = self._plano(sql, medicao)
+
+        with self._lock:
+            total = self._totais.get(sql)
+            if total is None:
+                total = self._totais[sql] = {
+                    "sql": sql, "execucoes": 0, "ms_total": 0.0, "ms_max": 0.0,
+                    "linhas": 0, "origens": {},
+                }
+            total["execucoes"] += 1
+            total["ms_total"] += milissegundos
+            total["ms_max"] = max(total["ms_max"], milissegundos)
+            total["linhas"] += medicao.linhas
+            total["origens"][medicao.origem] = total["origens"].get(medicao.origem, 0) + 1
+
+            if lenta:
+                self._lentas.append({
+                    "quando": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(medicao.inicio)),
+                    "sql": sql,
+                    "ms": round(milissegundos, 2),
+                    "linhas": medicao.linhas,
+                    "origem": medicao.origem,
+                    "plano": plano,
+                })
+
+    def _plano(self, sql, medicao):
+        plano = self._planos.get(sql)
+        if plano is None and medicao.conexao is not None:
+            if not sql.upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')):
+                return None
+            try:
+                # Direto pela classe base, para não medir o próprio EXPLAIN
+                linhas = sqlite3.Connection.execute(
+                    medicao.conexao, 'EXPLAIN QUERY PLAN ' + medicao.sql, medicao.parametros
+                ).fetchall()
+            except Exception:
+                return None
+            plano = self._planos[sql] = [linha[-1] for linha in linhas]
+        return plano
+
+    def totais(self, limite=20, ordem="ms_total"):
+        """Comandos mais caros, com média por execução"""
+        with self._lock:
+            totais = [dict(t, origens=dict(t["origens"])) for t in self._totais.values()]
+        for total in totais:
+            total["ms_medio"] = total["ms_total"] / total["execucoes"]
+            total["ms_total"] = round(total["ms_total"], 2)
+            total["ms_max"] = round(total["ms_max"], 2)
+            total["ms_medio"] = round(total["ms_medio"], 3)
+        totais.sort(key=lambda t: t[ordem], reverse=True)
+        return totais[:limite]
+
+    def consultas_lentas(self):
+        """Consultas acima do limite, da mais recente para a mais antiga"""
+        with self._lock:
+            return list(reversed(self._lentas))
+
+    def como_dict(self, limite=50):
+        return {
+            "ativo": self.ativo,
+            "amostragem": self.amostragem,
+            "limite_ms": self.limite_ms,
+            "totais": self.totais(limite),
+            "lentas": self.consultas_lentas(),
+        }
+
+    def salvar_json(self, caminho):
+        """Grava o perfil atual em JSON e retorna o caminho"""
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.como_dict(), arquivo, ensure_ascii=False, indent=2)
+        return caminho
+
+
+class CursorPerfilado(sqlite3.Cursor):
+    """Cursor do perfil ligado: mede o comando inteiro dentro do ``execute``
+
+    Numa execução amostrada as linhas da consulta são lidas todas no
+    ``execute`` (tempo e contagem completos) e entregues da memória.
+    """
+
+    _linhas = None
+
+    def execute(self, sql, parametros=()):
+        self._linhas = None
+        perfil = self.connection.perfil
+        if perfil is None or not perfil.amostrar():
+            return super().execute(sql, parametros)
+
+        medicao = Medicao(sql, parametros, _origem(), self.connection)
+        inicio = time.perf_counter()
+        super().execute(sql, parametros)
+        if self.description is None:
+            medicao.linhas = max(self.rowcount, 0)
+        else:
+            linhas = super().fetchall()
+            medicao.linhas = len(linhas)
+            self._linhas = iter(linhas)
+        medicao.segundos = time.perf_counter() - inicio
+        perfil.registrar(medicao)
+        return self
+
+    def executemany(self, sql, sequencia):
+        self._linhas = None
+        perfil = self.connection.perfil
+        if perfil is None or not perfil.amostrar():
+            return super().executemany(sql, sequencia)
+
+        medicao = Medicao(sql, (), _origem(), None)
+        inicio = time.perf_counter()
+        super().executemany(sql, sequencia)
+        medicao.segundos = time.perf_counter() - inicio
+        medicao.linhas = max(self.rowcount, 0)
+        perfil.registrar(medicao)
+        return self
+
+    def fetchone(self):
+        if self._linhas is None:
+            return super().fetchone()
+        return next(self._linhas, None)
+
+    def fetchmany(self, size=None):
+        if self._linhas is None:
+            return super().fetchmany(size or self.arraysize)
+        return list(islice(self._linhas, size or self.arraysize))
+
+    def fetchall(self):
+        if self._linhas is None:
+            return super().fetchall()
+        return list(self._linhas)
+
+    def __next__(self):
+        if self._linhas is None:
+            return super().__next__()
+        return next(self._linhas)
+
+
+class ConexaoPerfilada(sqlite3.Connection):
+    """Conexão aberta pelo pool enquanto o perfil está ligado"""
+
+    perfil = None
+
+    def cursor(self, factory=CursorPerfilado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
@@ -0,0 +1,64 @@
+"""Protocolo entre o servidor (``loja.servidor``) e os terminais (``loja.remoto``)
+
+Uma mensagem JSON por linha, em UTF-8, sobre TCP:
+
+- pedido do terminal: ``{"id": 7, "op": "criar_pedidos", "args": [...]}``;
+- resposta: ``{"id": 7, "ok": true, "resultado": ...}`` ou
+  ``{"id": 7, "ok": false, "erro": "mensagem", "tipo": "ErroPedido"}``;
+- aviso enviado a todos os terminais depois de cada commit:
+  ``{"evento": [entidade, operacao, chave, dados, anterior]}``
+  (os campos de ``loja.eventos.Alteracao``).
+
+As respostas podem chegar fora de ordem; o terminal as casa pelo ``id``.
+"""
+
+import json
+import sqlite3
+
+from loja.database import ErroPedido
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+
+# Exceções recriadas no terminal pelo nome; as demais viram ErroServidor
+ERROS = {
+    'ErroPedido': ErroPedido,
+    'IntegrityError': sqlite3.IntegrityError,
+    'OperationalError': sqlite3.OperationalError,
+    'ValueError': ValueError,
+}
+
+
+class ErroServidor(Exception):
+    """Servidor fora do ar, conexão perdida ou erro sem equivalente local"""
+
+
+def codificar(mensagem):
+    """Mensagem como linha de bytes"""
+    return json.dumps(
+        mensagem, ensure_ascii=False, separators=(',', ':'), default=str
+    ).encode('utf-8') + b'\n'
+
+
+def decodificar(linha):
+    """Linha de bytes como mensagem"""
+    return json.loads(linha)
+
+
+def resposta_erro(numero, erro):
+    """Resposta de erro para a exceção ``erro``"""
+    return {"id": numero, "ok": False, "erro": str(erro), "tipo": type(erro).__name__}
+
+
+def excecao(resposta):
+    """Exceção equivalente a uma resposta de erro"""
+    return ERROS.get(resposta.get('tipo'), ErroServidor)(resposta.get('erro'))
+
+
+def separar_endereco(endereco):
+    """``"host:porta"``, ``"host"`` ou ``":porta"`` → (host, porta)"""
+    endereco = endereco.strip()
+    host, separador, porta = endereco.rpartition(':')
+    if not separador:
+        host, porta = endereco, ''
+    return host or HOST_PADRAO, int(porta) if porta else PORTA_PADRAO
@@ -0,0 +1,374 @@
+"""Terminal ligado ao modo servidor, com a interface do ``DatabaseManager``
+
+Com ``LOJA_SERVIDOR=host:porta`` o aplicativo usa ``BancoRemoto`` no
+lugar do ``DatabaseManager``. Repositórios, catálogo, busca, paginação,
+estatísticas e comandas continuam lendo por ``get_connection()``, que
+aqui envia cada consulta ao servidor; as escritas entram na fila do
+escritor (``loja.servidor``) e as alterações feitas em qualquer
+terminal chegam pelo barramento ``eventos``, como se fossem locais.
+"""
+
+import itertools
+import queue
+import socket
+import sys
+import threading
+import traceback
+from contextlib import contextmanager
+from itertools import islice
+
+from loja.arquivamento import DIAS_PADRAO, ArquivoPedidos
+from loja.catalogo import Catalogo
+from loja.eventos import RECARREGAR, Alteracao, BarramentoAlteracoes
+from loja.importacao import Relatorio
+from loja.perfil import PerfilConsultas
+from loja.protocolo import ErroServidor, codificar, decodificar, excecao, separar_endereco
+
+# Recarregadas depois de uma reconexão (avisos perdidos no intervalo)
+ENTIDADES = ('clientes', 'produtos', 'pedidos')
+
+
+class ClienteServidor:
+    """Conexão TCP com o servidor, compartilhada pelas threads do aplicativo
+
+    Uma thread lê as respostas (casadas pelo ``id``) e os avisos; os
+    avisos são entregues por outra thread, então um assinante pode
+    consultar o servidor sem travar a leitura. Caindo a conexão, a
+    próxima chamada reconecta.
+    """
+
+    def __init__(self, endereco, ao_evento, timeout=30.0):
+        self.host, self.porta = separar_endereco(endereco)
+        self.ao_evento = ao_evento
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pendentes = {}
+        self._socket = None
+        self._avisos = queue.Queue()
+
+        # Contadores
+        self.conexoes = 0
+        self.chamadas = 0
+        self.avisos = 0
+
+        threading.Thread(target=self._entregar, name="avisos-servidor", daemon=True).start()
+
+    def conectar(self):
+        """Conecta agora, se ainda não conectado (ErroServidor se fora do ar)"""
+        with self._lock:
+            self._conectado()
+
+    def _conectado(self):
+        """Socket atual, abrindo a conexão se preciso (com ``_lock``)"""
+        if self._socket is not None:
+            return self._socket
+        try:
+            sock = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+        except OSError as e:
+            raise ErroServidor(f"Servidor {self.host}:{self.porta} indisponível: {e}") from e
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket = sock
+        self.conexoes += 1
+        if self.conexoes > 1:
+            for entidade in ENTIDADES:
+                self._avisos.put(Alteracao(entidade, RECARREGAR, None))
+        threading.Thread(
+            target=self._ler, args=(sock,), name="leitor-servidor", daemon=True
+        ).start()
+        return sock
+
+    def chamar(self, operacao, *args, timeout=-1):
+        """Executa a operação no servidor e retorna o resultado
+
+        Erros do servidor são levantados como a exceção equivalente
+        (``ErroPedido``, ``sqlite3.IntegrityError``...). ``timeout=None``
+        espera sem limite (backup, arquivamento).
+        """
+        if timeout == -1:
+            timeout = self.timeout
+        espera = threading.Event()
+        caixa = []
+        with self._lock:
+            sock = self._conectado()
+            numero = next(self._ids)
+            self._pendentes[numero] = (espera, caixa, sock)
+            self.chamadas += 1
+            try:
+                sock.sendall(codificar({"id": numero, "op": operacao, "args": args}))
+            except OSError as e:
+                del self._pendentes[numero]
+                self._derrubar(sock)
+                raise ErroServidor(f"Conexão com o servidor perdida: {e}") from e
+
+        if not espera.wait(timeout):
+            with self._lock:
+                self._pendentes.pop(numero, None)
+            raise ErroServidor(f"O servidor não respondeu ({operacao})")
+        resposta = caixa[0]
+        if resposta.get('ok'):
+            return resposta.get('resultado')
+        raise excecao(resposta)
+
+    def _derrubar(self, sock):
+        """Descarta o socket (com ``_lock``); a thread de leitura encerra"""
+        if self._socket is sock:
+            self._socket = None
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _ler(self, sock):
+        """Thread de leitura de uma conexão"""
+        try:
+            with sock.makefile('rb') as arquivo:
+                for linha in arquivo:
+                    mensagem = decodificar(linha)
+                    if 'evento' in mensagem:
+                        self._avisos.put(Alteracao(*mensagem['evento']))
+                        continue
+                    with self._lock:
+                        pendente = self._pendentes.pop(mensagem.get('id'), None)
+                    if pendente is not None:
+                        pendente[1].append(mensagem)
+                        pendente[0].set()
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._derrubar(sock)
+                perdidos = [
+                    numero for numero, pendente in self._pendentes.items() if pendente[2] is sock
+                ]
+                perdidos = [self._pendentes.pop(numero) for numero in perdidos]
+            sock.close()
+            for espera, caixa, _ in perdidos:
+                caixa.append({"ok": False, "erro": "Conexão com o servidor perdida", "tipo": "ErroServidor"})
+                espera.set()
+
+    def _entregar(self):
+        """Thread dos avisos: repassa cada alteração ao ``ao_evento``"""
+        while True:
+            alteracao = self._avisos.get()
+            if alteracao is None:
+                return
+            self.avisos += 1
+            try:
+                self.ao_evento(alteracao)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def estatisticas(self):
+        """Conexões abertas, chamadas feitas e avisos recebidos"""
+        with self._lock:
+            return {
+                "conectado": self._socket is not None,
+                "conexoes": self.conexoes,
+                "chamadas": self.chamadas,
+                "pendentes": len(self._pendentes),
+                "avisos": self.avisos,
+            }
+
+    def fechar(self):
+        """Fecha a conexão e a thread dos avisos"""
+        with self._lock:
+            if self._socket is not None:
+                self._derrubar(self._socket)
+        self._avisos.put(None)
+
+
+class CursorRemoto:
+    """Cursor sobre as linhas de uma consulta feita no servidor"""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.row_factory = None
+        self._linhas = iter(())
+
+    def execute(self, sql, parametros=()):
+        if not isinstance(parametros, dict):
+            parametros = list(parametros)
+        linhas = self.cliente.chamar('consultar', sql, parametros)
+        if self.row_factory is None:
+            linhas = [tuple(linha) for linha in linhas]
+        else:
+            linhas = [self.row_factory(self, tuple(linha)) for linha in linhas]
+        self._linhas = iter(linhas)
+        return self
+
+    def fetchone(self):
+        return next(self._linhas, None)
+
+    def fetchmany(self, tamanho=1):
+        return list(islice(self._linhas, tamanho))
+
+    def fetchall(self):
+        return list(self._linhas)
+
+    def __iter__(self):
+        return self._linhas
+
+
+class ConexaoRemota:
+    """Conexão de leitura do ``BancoRemoto``: cada ``execute`` vai ao servidor"""
+
+    in_transaction = False
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def cursor(self):
+        return CursorRemoto(self.cliente)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def interrupt(self):
+        """Sem efeito: a consulta termina no servidor e a resposta é descartada"""
+
+
+class PoolRemoto:
+    """Parte do ``ConnectionPool`` usada pelos serviços"""
+
+    def __init__(self, cliente, tamanho=4):
+        self.cliente = cliente
+        self.tamanho = tamanho
+        self.timeout = cliente.timeout
+        self.versao = 0
+
+    def interromper(self, thread):
+        return False
+
+    def versao_dados(self):
+        """Avisos recebidos: muda a cada commit feito no servidor"""
+        return self.versao
+
+    def estatisticas(self):
+        return dict(self.cliente.chamar('estatisticas_pool'), terminal=self.cliente.estatisticas())
+
+    def fechar(self):
+        self.cliente.fechar()
+
+
+class ArquivoRemoto(ArquivoPedidos):
+    """Pedidos arquivados no servidor, que os anexa às próprias conexões"""
+
+    def ativo(self):
+        return self.db.cliente.chamar('arquivo_ativo')
+
+    def data_maxima(self):
+        return self.db.cliente.chamar('arquivo_data_maxima')
+
+    def anexar(self, conn):
+        pass
+
+    def arquivar(self, dias=DIAS_PADRAO):
+        return self.db.cliente.chamar('arquivar', dias, timeout=None)
+
+
+class BackupRemoto:
+    """Backup feito pelo servidor, na pasta ``backup`` ao lado do banco"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def executar(self, progresso=None):
+        """Retorna o caminho do backup no servidor (sem progresso parcial)"""
+        caminho = self.db.cliente.chamar('backup', timeout=None)
+        if progresso:
+            progresso(1, 1)
+        return caminho
+
+
+class BancoRemoto:
+    """``DatabaseManager`` de um terminal ligado a ``loja.servidor``"""
+
+    def __init__(self, endereco, timeout=30.0):
+        self.db_path = endereco
+        self.perfil = PerfilConsultas()
+        self.eventos = BarramentoAlteracoes()
+        self.cliente = ClienteServidor(endereco, self._ao_evento, timeout)
+        self.pool = PoolRemoto(self.cliente)
+        self.catalogo = Catalogo(self)
+        self.arquivo = ArquivoRemoto(self)
+        self.cliente.conectar()
+
+    def _ao_evento(self, alteracao):
+        self.pool.versao += 1
+        self.eventos.publicar(alteracao)
+
+    @contextmanager
+    def get_connection(self):
+        """Conexão de leitura para uso em bloco ``with``"""
+        yield ConexaoRemota(self.cliente)
+
+    def transacao(self):
+        raise ErroServidor("Transações só no servidor; use as operações de escrita")
+
+    def criar_banco_dados(self):
+        """O esquema é criado e migrado pelo servidor"""
+
+    def inserir_cliente(self, nome, telefone, endereco):
+        return self.cliente.chamar('inserir_cliente', nome, telefone, endereco)
+
+    def atualizar_cliente(self, nome_atual, novo_nome, telefone, endereco):
+        return self.cliente.chamar('atualizar_cliente', nome_atual, novo_nome, telefone, endereco)
+
+    def atualizar_pedido(self, pedido_id, data_entrega, status):
+        return self.cliente.chamar('atualizar_pedido', pedido_id, data_entrega, status)
+
+    def precos_produtos(self):
+        return self.catalogo.precos()
+
+    def criar_pedido(self, cliente, data_entrega, itens, status='pendente'):
+        return self.criar_pedidos([(cliente, data_entrega, itens, status)])[0]
+
+    def criar_pedidos(self, pedidos):
+        pedidos = [
+            [cliente, data_entrega, [list(item) for item in itens], *resto]
+            for cliente, data_entrega, itens, *resto in pedidos
+        ]
+        return self.cliente.chamar('criar_pedidos', pedidos)
+
+    def inserir_clientes(self, clientes):
+        return self.cliente.chamar('inserir_clientes', [list(cliente) for cliente in clientes])
+
+    def atualizar_clientes(self, alteracoes):
+        return self.cliente.chamar('atualizar_clientes', [list(alteracao) for alteracao in alteracoes])
+
+    def inserir_produtos(self, produtos):
+        return self.cliente.chamar('inserir_produtos', [list(produto) for produto in produtos])
+
+    def atualizar_pedidos(self, alteracoes):
+        return self.cliente.chamar('atualizar_pedidos', [list(alteracao) for alteracao in alteracoes])
+
+    def importar(self, entidade, registros, lote=1000, simular=False):
+        """Como ``loja.importacao.importar``, gravado pelo servidor a cada ``lote`` registros"""
+        relatorio = Relatorio(entidade, simular)
+        registros = iter(registros)
+        primeiro = 1
+        while True:
+            bloco = list(islice(registros, lote))
+            if not bloco:
+                break
+            relatorio.somar(self.cliente.chamar(
+                'importar', entidade, bloco, lote, simular, primeiro, timeout=None
+            ))
+            primeiro += len(bloco)
+        return relatorio.finalizar()
+
+    def remover_todos_pedidos(self):
+        return self.cliente.chamar('remover_todos_pedidos', timeout=None)
+
+    def atualizar_formato_datas(self):
+        """Como ``loja.datas.atualizar_formato_datas``, feito pelo servidor"""
+        return self.cliente.chamar('atualizar_formato_datas', timeout=None)
+
+    def fechar(self):
+        self.cliente.fechar()
+        self.catalogo.invalidar()
+
+    def estatisticas_pool(self):
+        return self.pool.estatisticas()
@@ -0,0 +1,304 @@
+"""Repositórios de clientes, produtos e pedidos, sem dependência de interface
+
+Cada consulta tem nome e texto fixo (constantes ``SQL_*``): o cache de
+comandos de cada conexão do pool (``cached_statements``) compila o SQL
+na primeira execução e reaproveita o comando preparado daí em diante.
+Consultas por vários ids usam sempre ``LOTE`` marcadores, completando
+o último lote com ``NULL``, para que o texto não varie com a quantidade.
+
+As linhas voltam como namedtuples (``Cliente``, ``Produto``, ``Pedido``,
+``ItemPedido``), que continuam indexáveis como as tuplas de antes. As
+escritas passam pelo ``DatabaseManager`` (validação e eventos) e toda
+operação tem uma variante em lote, gravada em uma única transação.
+"""
+
+from collections import namedtuple
+
+from loja.busca import BuscaTextual
+from loja.database import COLUNAS_PEDIDO, SELECT_PEDIDO
+
+Cliente = namedtuple('Cliente', 'id nome telefone endereco data_cadastro')
+Produto = namedtuple('Produto', 'id nome preco')
+Pedido = namedtuple('Pedido', COLUNAS_PEDIDO)
+ItemPedido = namedtuple('ItemPedido', 'pedido_id produto_id produto quantidade preco_unitario total')
+
+# Marcadores por consulta ``IN (...)`` das variantes em lote
+LOTE = 100
+_MARCADORES = ', '.join('?' * LOTE)
+
+# Texto da consulta de página por combinação de filtros (ver ``PedidoRepo.pagina``)
+_PAGINAS = {}
+
+SQL_CLIENTES = 'SELECT id, nome, telefone, endereco, data_cadastro FROM clientes ORDER BY nome'
+SQL_CLIENTES_LIMITE = SQL_CLIENTES + ' LIMIT ?'
+SQL_CLIENTE_POR_NOME = 'SELECT id, nome, telefone, endereco, data_cadastro FROM clientes WHERE nome = ?'
+SQL_CLIENTES_POR_IDS = f'SELECT id, nome, telefone, endereco, data_cadastro FROM clientes WHERE id IN ({_MARCADORES})'
+SQL_CLIENTES_POR_NOMES = f'SELECT id, nome, telefone, endereco, data_cadastro FROM clientes WHERE nome IN ({_MARCADORES})'
+
+SQL_PRODUTOS = 'SELECT id, nome, preco FROM produtos ORDER BY nome'
+SQL_PRODUTOS_LIMITE = SQL_PRODUTOS + ' LIMIT ?'
+SQL_PRODUTO_POR_NOME = 'SELECT id, nome, preco FROM produtos WHERE nome = ?'
+SQL_PRODUTOS_POR_IDS = f'SELECT id, nome, preco FROM produtos WHERE id IN ({_MARCADORES})'
+
+SQL_PEDIDO = SELECT_PEDIDO + 'WHERE p.id = ?'
+SQL_PEDIDOS_POR_IDS = SELECT_PEDIDO + f'WHERE p.id IN ({_MARCADORES})'
+SQL_ITENS = '''
+    SELECT pedido_id, produto_id, produto, quantidade, preco_unitario, total
+    FROM itens_pedido
+    WHERE pedido_id = ?
+    ORDER BY id
+'''
+SQL_ITENS_POR_PEDIDOS = f'''
+    SELECT pedido_id, produto_id, produto, quantidade, preco_unitario, total
+    FROM itens_pedido
+    WHERE pedido_id IN ({_MARCADORES})
+    ORDER BY pedido_id, id
+'''
+
+# Peso de uso: cada pedido conta 1 / (1 + idade em dias / meia_vida)
+SQL_USO_CLIENTES = '''
+    SELECT cliente_id, SUM(1.0 / (1 + (julianday(?1) - julianday(data)) / ?2))
+    FROM pedidos
+    WHERE data >= date(?1, ?3)
+    GROUP BY cliente_id
+'''
+SQL_USO_PRODUTOS = '''
+    SELECT i.produto_id, SUM(1.0 / (1 + (julianday(?1) - julianday(p.data)) / ?2))
+    FROM pedidos p
+    JOIN itens_pedido i ON i.pedido_id = p.id
+    WHERE p.data >= date(?1, ?3) AND i.produto_id IS NOT NULL
+    GROUP BY i.produto_id
+'''
+
+
+def fabrica(tipo):
+    """``row_factory`` que monta uma namedtuple ``tipo`` por linha"""
+    criar = tipo._make
+    return lambda cursor, linha: criar(linha)
+
+
+class _Repositorio:
+    """Execução das consultas nomeadas com a fábrica de linhas do tipo"""
+
+    tipo = None
+
+    def __init__(self, db):
+        self.db = db
+        self._fabrica = fabrica(self.tipo)
+
+    def _todas(self, sql, parametros=()):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica
+            return cursor.execute(sql, parametros).fetchall()
+
+    def _uma(self, sql, parametros=()):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica
+            return cursor.execute(sql, parametros).fetchone()
+
+    def _em_lotes(self, sql, chaves):
+        """Linhas de ``sql`` (com ``LOTE`` marcadores) para todas as chaves"""
+        chaves = list(dict.fromkeys(chaves))
+        linhas = []
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica
+            for inicio in range(0, len(chaves), LOTE):
+                parte = chaves[inicio:inicio + LOTE]
+                parte += [None] * (LOTE - len(parte))
+                linhas.extend(cursor.execute(sql, parte).fetchall())
+        return linhas
+
+
+class ClienteRepo(_Repositorio):
+    """Consultas e escritas de clientes"""
+
+    tipo = Cliente
+
+    def listar(self, limite=None):
+        """Clientes em ordem de nome"""
+        if limite is None:
+            return self._todas(SQL_CLIENTES)
+        return self._todas(SQL_CLIENTES_LIMITE, (limite,))
+
+    def nomes(self, limite=None):
+        """Só os nomes, em ordem"""
+        return [cliente.nome for cliente in self.listar(limite)]
+
+    def por_nome(self, nome):
+        """Cliente com o nome exato ou None"""
+        return self._uma(SQL_CLIENTE_POR_NOME, (nome,))
+
+    def por_ids(self, ids):
+        """{id: Cliente} dos ids encontrados"""
+        return {cliente.id: cliente for cliente in self._em_lotes(SQL_CLIENTES_POR_IDS, ids)}
+
+    def por_nomes(self, nomes):
+        """{nome: Cliente} dos nomes encontrados"""
+        return {cliente.nome: cliente for cliente in self._em_lotes(SQL_CLIENTES_POR_NOMES, nomes)}
+
+    def inserir(self, nome, telefone, endereco):
+        """Cadastra um cliente e retorna o id (IntegrityError se o nome já existe)"""
+        return self.db.inserir_cliente(nome, telefone, endereco)
+
+    def inserir_varios(self, clientes):
+        """Cadastra ``(nome, telefone, endereco)`` em uma transação; retorna os ids
+
+        Um nome repetido desfaz o lote inteiro (IntegrityError).
+        """
+        return self.db.inserir_clientes(clientes)
+
+    def atualizar(self, nome_atual, novo_nome, telefone, endereco):
+        """Altera o cliente identificado pelo nome atual; False se não existe"""
+        return self.db.atualizar_cliente(nome_atual, novo_nome, telefone, endereco)
+
+    def atualizar_varios(self, alteracoes):
+        """Aplica ``(nome_atual, novo_nome, telefone, endereco)`` em uma transação
+
+        Retorna quantos clientes foram encontrados e alterados.
+        """
+        return self.db.atualizar_clientes(alteracoes)
+
+
+class ProdutoRepo(_Repositorio):
+    """Consultas e escritas de produtos"""
+
+    tipo = Produto
+
+    def listar(self, limite=None):
+        """Produtos em ordem de nome"""
+        if limite is None:
+            return self._todas(SQL_PRODUTOS)
+        return self._todas(SQL_PRODUTOS_LIMITE, (limite,))
+
+    def nomes(self, limite=None):
+        """Só os nomes, em ordem"""
+        return [produto.nome for produto in self.listar(limite)]
+
+    def por_nome(self, nome):
+        """Produto com o nome exato ou None"""
+        return self._uma(SQL_PRODUTO_POR_NOME, (nome,))
+
+    def por_ids(self, ids):
+        """{id: Produto} dos ids encontrados"""
+        return {produto.id: produto for produto in self._em_lotes(SQL_PRODUTOS_POR_IDS, ids)}
+
+    def precos(self):
+        """Mapa nome → preço em centavos (cache do ``DatabaseManager``)"""
+        return self.db.precos_produtos()
+
+    def inserir(self, nome, preco):
+        """Cadastra um produto (preço em centavos) e retorna o id"""
+        return self.inserir_varios([(nome, preco)])[0]
+
+    def inserir_varios(self, produtos):
+        """Cadastra ``(nome, preco)`` em uma transação; retorna os ids"""
+        return self.db.inserir_produtos(produtos)
+
+
+class PedidoRepo(_Repositorio):
+    """Consultas e escritas de pedidos e itens"""
+
+    tipo = Pedido
+
+    def __init__(self, db):
+        super().__init__(db)
+        self.busca = BuscaTextual(db)
+        self._fabrica_item = fabrica(ItemPedido)
+
+    def por_id(self, pedido_id):
+        """Pedido no formato das listas ou None"""
+        return self._uma(SQL_PEDIDO, (pedido_id,))
+
+    def por_ids(self, ids):
+        """{id: Pedido} dos ids encontrados"""
+        return {pedido.id: pedido for pedido in self._em_lotes(SQL_PEDIDOS_POR_IDS, ids)}
+
+    def itens(self, pedido_id):
+        """Itens de um pedido na ordem em que foram lançados"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica_item
+            return cursor.execute(SQL_ITENS, (pedido_id,)).fetchall()
+
+    def itens_de(self, pedido_ids):
+        """{pedido_id: [ItemPedido]} para vários pedidos de uma vez"""
+        pedido_ids = list(dict.fromkeys(pedido_ids))
+        itens = {pedido_id: [] for pedido_id in pedido_ids}
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._fabrica_item
+            for inicio in range(0, len(pedido_ids), LOTE):
+                parte = pedido_ids[inicio:inicio + LOTE]
+                parte += [None] * (LOTE - len(parte))
+                for item in cursor.execute(SQL_ITENS_POR_PEDIDOS, parte):
+                    itens[item.pedido_id].append(item)
+        return itens
+
+    @staticmethod
+    def _sql_pagina(filtro, status, continuar):
+        """Texto da consulta de página; uma variante por combinação de filtros"""
+        chave = (filtro, status, continuar)
+        sql = _PAGINAS.get(chave)
+        if sql is None:
+            sql = SELECT_PEDIDO + 'WHERE 1=1' + filtro
+            if status:
+                sql += ' AND p.status = ?'
+            if continuar:
+                sql += ' AND (p.data, p.id) < (?, ?)'
+            sql += ' ORDER BY p.data DESC, p.id DESC LIMIT ?'
+            _PAGINAS[chave] = sql
+        return sql
+
+    def pagina(self, termo='', status=None, depois_de=None, limite=100):
+        """Pedidos por data e id decrescentes, continuando após ``depois_de``
+
+        ``depois_de`` é o par ``(data, id)`` da última linha já entregue.
+        """
+        filtro, parametros = '', []
+        if termo:
+            filtro, parametros = self.busca.filtro_pedidos(termo)
+            parametros = list(parametros)
+        if status:
+            parametros.append(status)
+        if depois_de is not None:
+            parametros.extend(depois_de)
+        parametros.append(limite)
+        return self._todas(self._sql_pagina(filtro, bool(status), depois_de is not None), parametros)
+
+    def criar(self, cliente, data_entrega, itens, status='pendente'):
+        """Grava um pedido ``itens=[(produto, quantidade)]`` e retorna o id"""
+        return self.db.criar_pedido(cliente, data_entrega, itens, status)
+
+    def criar_varios(self, pedidos):
+        """Grava ``(cliente, data_entrega, itens[, status])`` em uma transação"""
+        return self.db.criar_pedidos(pedidos)
+
+    def atualizar(self, pedido_id, data_entrega, status):
+        """Altera data de entrega e status; False se o pedido não existe"""
+        return self.db.atualizar_pedido(pedido_id, data_entrega, status)
+
+    def atualizar_varios(self, alteracoes):
+        """Aplica ``(pedido_id, data_entrega, status)`` em uma transação
+
+        Retorna quantos pedidos foram encontrados e alterados.
+        """
+        return self.db.atualizar_pedidos(alteracoes)
+
+    def remover_todos(self):
+        """Remove todos os pedidos e itens e reseta os IDs"""
+        self.db.remover_todos_pedidos()
+
+    def _uso(self, sql, hoje, dias, meia_vida):
+        with self.db.get_connection() as conn:
+            return dict(conn.execute(sql, (hoje, meia_vida, f'-{int(dias)} days')).fetchall())
+
+    def uso_clientes(self, hoje, dias=365, meia_vida=30.0):
+        """{cliente_id: peso} dos pedidos dos últimos ``dias`` (recentes pesam mais)"""
+        return self._uso(SQL_USO_CLIENTES, hoje, dias, meia_vida)
+
+    def uso_produtos(self, hoje, dias=365, meia_vida=30.0):
+        """{produto_id: peso} dos itens pedidos nos últimos ``dias``"""
+        return self._uso(SQL_USO_PRODUTOS, hoje, dias, meia_vida)
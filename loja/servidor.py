@@ -0,0 +1,381 @@
+"""Modo servidor: um processo dono do banco atende vários terminais
+
+Uso: ``python -m loja [--banco ARQUIVO] servidor [--host H] [--porta P]``
+e, em cada terminal, ``LOJA_SERVIDOR=host:porta`` (ver ``loja.remoto``).
+
+As escritas entram em uma fila atendida por uma única tarefa escritora.
+Ela grava tudo o que estiver esperando (até ``lote_escrita`` operações)
+em uma só transação, cada operação no seu SAVEPOINT: um erro desfaz só
+a operação que falhou e o lote inteiro custa um commit (group commit).
+Com um único escritor os terminais nunca disputam a trava do banco.
+
+As leituras rodam em paralelo. As consultas enviadas pelos terminais
+(só SELECT) usam conexões próprias abertas em ``mode=ro``, com um
+autorizador que nega PRAGMA, ATTACH e escritas. Depois de cada commit
+as alterações publicadas no barramento seguem para todos os terminais
+conectados.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.request import pathname2url
+
+from loja.arquivamento import DIAS_PADRAO, ESQUEMA
+from loja.backup import ServicoBackup
+from loja.database import DatabaseManager
+from loja.datas import atualizar_formato_datas, normalizacao_pendente, normalizar_datas
+from loja.importacao import importar
+from loja.protocolo import HOST_PADRAO, PORTA_PADRAO, codificar, decodificar, resposta_erro
+
+# Operações esperando na fila gravadas em uma mesma transação
+LOTE_ESCRITA = 64
+
+# Maior linha aceita de um terminal (um lote grande de pedidos)
+LIMITE_LINHA = 16 * 1024 * 1024
+
+# Escritas agrupadas: cada uma em um SAVEPOINT da transação do lote
+ESCRITAS = {
+    'inserir_cliente': DatabaseManager.inserir_cliente,
+    'inserir_clientes': DatabaseManager.inserir_clientes,
+    'atualizar_cliente': DatabaseManager.atualizar_cliente,
+    'atualizar_clientes': DatabaseManager.atualizar_clientes,
+    'inserir_produtos': DatabaseManager.inserir_produtos,
+    'atualizar_pedido': DatabaseManager.atualizar_pedido,
+    'atualizar_pedidos': DatabaseManager.atualizar_pedidos,
+    'criar_pedidos': DatabaseManager.criar_pedidos,
+}
+
+# Escritas que rodam sozinhas, com as próprias transações (várias, ou no arquivo)
+EXCLUSIVAS = {
+    'remover_todos_pedidos': DatabaseManager.remover_todos_pedidos,
+    'arquivar': lambda db, dias=DIAS_PADRAO: db.arquivo.arquivar(dias=dias),
+    'atualizar_formato_datas': atualizar_formato_datas,
+    'importar': lambda db, *args: importar(db, *args).como_dict(),
+}
+
+
+# Consultas dos terminais: um único SELECT, conferido também pelo SQLite
+INICIO_CONSULTA = ('SELECT', 'WITH')
+ACOES_LEITURA = frozenset({
+    sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE,
+})
+
+
+def _uri_leitura(caminho):
+    return 'file:' + pathname2url(os.path.abspath(caminho)) + '?mode=ro'
+
+
+def _autorizar_leitura(acao, nome, argumento, *detalhes):
+    """Autorizador das conexões de leitura: nega PRAGMA, ATTACH e escritas"""
+    if acao in ACOES_LEITURA:
+        return sqlite3.SQLITE_OK
+    # Feitos pelo próprio SQLite ao conectar as tabelas FTS5 (a conexão é ``mode=ro``)
+    if acao == sqlite3.SQLITE_UPDATE and nome == 'sqlite_master':
+        return sqlite3.SQLITE_OK
+    if acao == sqlite3.SQLITE_PRAGMA and nome == 'data_version' and argumento is None:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+class Leitores:
+    """Conexões ``mode=ro`` das threads leitoras, nunca usadas para escrever
+
+    Cada thread leitora abre a sua no primeiro uso, com o arquivo de
+    pedidos anexado (também só leitura) quando ele existe. As consultas
+    vindas dos terminais rodam só nelas, então nada que um terminal envie
+    alcança as conexões do pool usadas pelo escritor.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._todas = []
+
+    def conexao(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                _uri_leitura(self.db.db_path), uri=True,
+                timeout=self.db.pool.timeout, check_same_thread=False
+            )
+            conn.set_authorizer(_autorizar_leitura)
+            self._local.conn = conn
+            self._local.anexado = False
+            with self._lock:
+                self._todas.append(conn)
+        if not self._local.anexado and self.db.arquivo.ativo():
+            conn.set_authorizer(None)
+            try:
+                conn.execute(f'ATTACH DATABASE ? AS {ESQUEMA}', (_uri_leitura(self.db.arquivo.caminho),))
+            finally:
+                conn.set_authorizer(_autorizar_leitura)
+            self._local.anexado = True
+        return conn
+
+    def consultar(self, sql, parametros=()):
+        """Linhas de um SELECT; outro comando é recusado (ValueError)"""
+        palavras = sql.split(None, 1)
+        if not palavras or palavras[0].upper() not in INICIO_CONSULTA:
+            raise ValueError("Consulta recusada: só SELECT")
+        try:
+            return self.conexao().execute(sql, parametros).fetchall()
+        except sqlite3.ProgrammingError as e:
+            # Mais de um comando no texto
+            raise ValueError(f"Consulta recusada: {e}") from e
+
+    def fechar(self):
+        with self._lock:
+            conexoes, self._todas = self._todas, []
+        for conn in conexoes:
+            conn.close()
+
+
+# Leituras, em paralelo
+LEITURAS = {
+    'arquivo_ativo': lambda db: db.arquivo.ativo(),
+    'arquivo_data_maxima': lambda db: db.arquivo.data_maxima(),
+    'estatisticas_pool': DatabaseManager.estatisticas_pool,
+}
+
+
+class ServidorLoja:
+    """Servidor asyncio de um ``DatabaseManager``"""
+
+    def __init__(self, db, host=HOST_PADRAO, porta=PORTA_PADRAO, lote_escrita=LOTE_ESCRITA):
+        self.db = db
+        self.host = host
+        self.porta = porta
+        self.lote_escrita = lote_escrita
+        self.backup = ServicoBackup(db)
+        # Uma thread escreve; as leituras usam as demais conexões do pool
+        self._escritor = ThreadPoolExecutor(1, thread_name_prefix='escritor')
+        self._leitores = ThreadPoolExecutor(max(1, db.pool.tamanho - 1), thread_name_prefix='leitor')
+        self.leitura = Leitores(db)
+        self._loop = None
+        self._fila = None
+        self._servidor = None
+        self._tarefas = []
+        self._clientes = set()
+        self._cancelar_assinatura = None
+
+        # Contadores
+        self.lotes = 0
+        self.escritas = 0
+        self.maior_lote = 0
+        self.leituras = 0
+
+    async def iniciar(self):
+        """Abre o socket e inicia a tarefa escritora (porta 0: escolhida pelo sistema)"""
+        self._loop = asyncio.get_running_loop()
+        self._fila = asyncio.Queue()
+        self._tarefas.append(asyncio.create_task(self._escrever()))
+        self._cancelar_assinatura = self.db.eventos.assinar('*', self._ao_alterar)
+        self._servidor = await asyncio.start_server(
+            self._atender, self.host, self.porta, limit=LIMITE_LINHA
+        )
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self._servidor
+
+    async def servir(self):
+        """Atende até ser cancelado, com backup e arquivamento periódicos"""
+        await self.iniciar()
+        self._tarefas.append(asyncio.create_task(self._manutencao()))
+        print(f"Servindo {self.db.db_path} em {self.host}:{self.porta}", file=sys.stderr)
+        try:
+            await self._servidor.serve_forever()
+        finally:
+            self.fechar()
+
+    def fechar(self):
+        """Encerra conexões e tarefas; espera o lote em gravação terminar"""
+        if self._cancelar_assinatura is not None:
+            self._cancelar_assinatura()
+            self._cancelar_assinatura = None
+        if self._servidor is not None:
+            self._servidor.close()
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        for escritor in list(self._clientes):
+            escritor.close()
+        self._leitores.shutdown(wait=False, cancel_futures=True)
+        self._escritor.shutdown(wait=True)
+        self.leitura.fechar()
+
+    def estatisticas(self):
+        """Terminais conectados, lotes gravados e operações atendidas"""
+        return {
+            "terminais": len(self._clientes),
+            "lotes": self.lotes,
+            "escritas": self.escritas,
+            "maior_lote": self.maior_lote,
+            "leituras": self.leituras,
+            "na_fila": self._fila.qsize() if self._fila is not None else 0,
+        }
+
+    async def executar(self, operacao, *args):
+        """Resultado de uma operação: escritas pela fila, leituras em paralelo"""
+        if operacao in ESCRITAS or operacao in EXCLUSIVAS:
+            futuro = self._loop.create_future()
+            await self._fila.put((operacao, args, futuro))
+            return await futuro
+        if operacao == 'consultar':
+            self.leituras += 1
+            return await self._loop.run_in_executor(
+                self._leitores, partial(self.leitura.consultar, *args)
+            )
+        if operacao in LEITURAS:
+            self.leituras += 1
+            return await self._loop.run_in_executor(
+                self._leitores, partial(LEITURAS[operacao], self.db, *args)
+            )
+        if operacao == 'backup':
+            return await self._loop.run_in_executor(self._leitores, self.backup.executar)
+        if operacao == 'estatisticas_servidor':
+            return self.estatisticas()
+        raise ValueError(f"Operação desconhecida: {operacao}")
+
+    # Conexões dos terminais
+
+    async def _atender(self, leitor, escritor):
+        """Uma conexão: cada pedido é respondido por uma tarefa própria"""
+        self._clientes.add(escritor)
+        pendentes = set()
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                tarefa = asyncio.create_task(self._responder(linha, escritor))
+                pendentes.add(tarefa)
+                tarefa.add_done_callback(pendentes.discard)
+        except (ConnectionError, ValueError):
+            # Conexão derrubada ou linha acima de LIMITE_LINHA
+            pass
+        finally:
+            self._clientes.discard(escritor)
+            escritor.close()
+
+    async def _responder(self, linha, escritor):
+        numero = None
+        try:
+            mensagem = decodificar(linha)
+            numero = mensagem.get('id')
+            resultado = await self.executar(mensagem['op'], *mensagem.get('args', ()))
+            resposta = {"id": numero, "ok": True, "resultado": resultado}
+        except Exception as e:
+            resposta = resposta_erro(numero, e)
+        self._enviar(escritor, codificar(resposta))
+
+    def _enviar(self, escritor, linha):
+        if not escritor.is_closing():
+            escritor.write(linha)
+
+    def _ao_alterar(self, alteracao):
+        """Roda na thread escritora, após o commit: avisa todos os terminais"""
+        linha = codificar({"evento": list(alteracao)})
+        try:
+            self._loop.call_soon_threadsafe(self._difundir, linha)
+        except RuntimeError:
+            # Laço já encerrado
+            pass
+
+    def _difundir(self, linha):
+        for escritor in list(self._clientes):
+            self._enviar(escritor, linha)
+
+    # Escritor
+
+    async def _escrever(self):
+        """Tarefa escritora: grava a fila em lotes, um de cada vez"""
+        while True:
+            itens = [await self._fila.get()]
+            while len(itens) < self.lote_escrita and not self._fila.empty():
+                itens.append(self._fila.get_nowait())
+
+            # Exclusivas gravam sozinhas, na ordem de chegada
+            lote = []
+            for item in itens:
+                if item[0] in EXCLUSIVAS:
+                    await self._gravar(lote, self._gravar_lote)
+                    await self._gravar([item], self._gravar_exclusiva)
+                    lote = []
+                else:
+                    lote.append(item)
+            await self._gravar(lote, self._gravar_lote)
+
+    async def _gravar(self, itens, gravar):
+        """Grava ``itens`` na thread escritora e entrega os resultados"""
+        if not itens:
+            return
+        operacoes = [(operacao, args) for operacao, args, _ in itens]
+        resultados = await self._loop.run_in_executor(self._escritor, gravar, operacoes)
+        for (_, _, futuro), (ok, valor) in zip(itens, resultados):
+            if futuro.cancelled():
+                continue
+            if ok:
+                futuro.set_result(valor)
+            else:
+                futuro.set_exception(valor)
+
+    def _gravar_lote(self, operacoes):
+        """Todas as operações em uma transação; retorna [(ok, resultado ou exceção)]"""
+        # Cadastros alterados por outros processos (ex.: importação pela linha de comando)
+        self.db.catalogo.verificar()
+        resultados = []
+        try:
+            with self.db.transacao():
+                for operacao, args in operacoes:
+                    try:
+                        with self.db.pool.ponto_salvamento():
+                            resultados.append((True, ESCRITAS[operacao](self.db, *args)))
+                    except Exception as e:
+                        resultados.append((False, e))
+        except Exception as e:
+            # BEGIN ou commit falhou: nada do lote foi gravado
+            return [(False, e)] * len(operacoes)
+        self.lotes += 1
+        self.escritas += len(operacoes)
+        self.maior_lote = max(self.maior_lote, len(operacoes))
+        return resultados
+
+    def _gravar_exclusiva(self, operacoes):
+        (operacao, args), = operacoes
+        try:
+            resultado = (True, EXCLUSIVAS[operacao](self.db, *args))
+        except Exception as e:
+            resultado = (False, e)
+        self.lotes += 1
+        self.escritas += 1
+        return [resultado]
+
+    async def _manutencao(self, intervalo=3600):
+        """Backup diário conferido a cada hora; arquivamento uma vez por dia"""
+        horas = 0
+        while True:
+            await asyncio.sleep(intervalo)
+            horas += 1
+            try:
+                await self._loop.run_in_executor(self._leitores, self.backup.executar_se_vencido)
+                if horas % 24 == 0:
+                    await self.executar('arquivar')
+            except Exception as e:
+                print(f"Manutenção falhou: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+def servir(db, host=HOST_PADRAO, porta=PORTA_PADRAO, lote_escrita=LOTE_ESCRITA):
+    """Atende os terminais até Ctrl+C; retorna as estatísticas do servidor"""
+    # Conversão de datas antigas, antes de aceitar escritas
+    if normalizacao_pendente(db):
+        normalizar_datas(db)
+    servidor = ServidorLoja(db, host, porta, lote_escrita)
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+    return servidor.estatisticas()
@@ -0,0 +1,138 @@
+"""Gerador determinístico de dados sintéticos
+
+Com a mesma semente e os mesmos tamanhos o banco gerado é sempre igual,
+o que permite comparar medições entre versões (ver ``loja.benchmark``).
+Os nomes têm acentos e prefixos repetidos para exercitar a busca.
+"""
+
+import random
+from datetime import date, timedelta
+
+from loja.eventos import RECARREGAR
+
+NOMES = (
+    'Ana', 'João', 'Maria', 'José', 'Antônio', 'Francisca', 'Carlos', 'Paulo',
+    'Luíza', 'Márcia', 'Pedro', 'Lucas', 'Sebastião', 'Conceição', 'Raimundo',
+    'Letícia', 'Fábio', 'Cecília', 'Otávio', 'Inês',
+)
+SOBRENOMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Ferreira',
+    'Costa', 'Rodrigues', 'Almeida', 'Nascimento', 'Araújo', 'Gonçalves',
+    'Conceição', 'Ribeiro', 'Magalhães',
+)
+PRODUTOS = (
+    'Bolo', 'Torta', 'Pão', 'Brigadeiro', 'Pudim', 'Quindim', 'Empada',
+    'Coxinha', 'Pastel', 'Biscoito', 'Rocambole', 'Pavê', 'Mousse', 'Sonho',
+)
+SABORES = (
+    'Chocolate', 'Limão', 'Morango', 'Côco', 'Maracujá', 'Doce de Leite',
+    'Queijo', 'Frango', 'Palmito', 'Nozes', 'Abacaxi', 'Café',
+)
+STATUS = (('entregue', 70), ('pendente', 25), ('cancelado', 5))
+
+# "Hoje" dos dados gerados; fixo para o banco não depender do dia da geração
+DATA_REFERENCIA = date(2025, 1, 15)
+
+ESCALAS = {
+    '1k': {'clientes': 100, 'produtos': 50, 'pedidos': 1_000},
+    '100k': {'clientes': 5_000, 'produtos': 500, 'pedidos': 100_000},
+    '1m': {'clientes': 20_000, 'produtos': 1_000, 'pedidos': 1_000_000},
+}
+
+
+def _nomes_unicos(gerar, quantidade):
+    vistos = set()
+    nomes = []
+    while len(nomes) < quantidade:
+        nome = gerar()
+        if nome in vistos:
+            nome = f"{nome} {len(nomes) + 1}"
+        vistos.add(nome)
+        nomes.append(nome)
+    return nomes
+
+
+def gerar(db, clientes=100, produtos=50, pedidos=1_000, semente=42, dias=730,
+          hoje=DATA_REFERENCIA, lote=5_000, progresso=None):
+    """Preenche o banco e retorna {'clientes', 'produtos', 'pedidos', 'itens'}
+
+    As datas dos pedidos ficam nos ``dias`` anteriores a ``hoje`` e as
+    entregas de até uma semana depois, então há pedidos atrasados, de hoje
+    e de amanhã. ``progresso(pedidos_gravados)`` é chamado a cada lote.
+    """
+    aleatorio = random.Random(semente)
+
+    nomes_clientes = _nomes_unicos(
+        lambda: f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}",
+        clientes
+    )
+    nomes_produtos = _nomes_unicos(
+        lambda: f"{aleatorio.choice(PRODUTOS)} de {aleatorio.choice(SABORES)}",
+        produtos
+    )
+    precos = [aleatorio.randrange(250, 15_000, 50) for _ in nomes_produtos]
+
+    with db.transacao() as conn:
+        conn.executemany(
+            'INSERT INTO clientes (nome, telefone, endereco, data_cadastro) VALUES (?, ?, ?, ?)',
+            [
+                (nome, f"(11) 9{aleatorio.randrange(10**7, 10**8)}",
+                 f"Rua {aleatorio.choice(SOBRENOMES)}, {aleatorio.randrange(1, 2000)}",
+                 (hoje - timedelta(days=aleatorio.randrange(dias))).isoformat())
+                for nome in nomes_clientes
+            ]
+        )
+        conn.executemany(
+            'INSERT INTO produtos (nome, preco) VALUES (?, ?)',
+            list(zip(nomes_produtos, precos))
+        )
+        ids = dict(conn.execute('SELECT nome, id FROM clientes'))
+        ids_clientes = [ids[nome] for nome in nomes_clientes]
+        ids = dict(conn.execute('SELECT nome, id FROM produtos'))
+        ids_produtos = [ids[nome] for nome in nomes_produtos]
+
+    status, pesos = zip(*STATUS)
+    itens_gravados = 0
+    gravados = 0
+    while gravados < pedidos:
+        quantidade = min(lote, pedidos - gravados)
+        with db.transacao() as conn:
+            for _ in range(quantidade):
+                data = hoje - timedelta(days=aleatorio.randrange(dias))
+                entrega = data + timedelta(days=aleatorio.randrange(8))
+                pedido_id = conn.execute('''
+                    INSERT INTO pedidos (cliente_id, data, data_entrega, status, total)
+                    VALUES (?, ?, ?, ?, 0)
+                ''', (
+                    aleatorio.choice(ids_clientes), data.isoformat(), entrega.isoformat(),
+                    aleatorio.choices(status, pesos)[0]
+                )).lastrowid
+
+                itens = []
+                for indice in aleatorio.sample(range(produtos), min(produtos, aleatorio.randint(1, 4))):
+                    itens.append((
+                        pedido_id, ids_produtos[indice], nomes_produtos[indice],
+                        aleatorio.randint(1, 5), precos[indice]
+                    ))
+                conn.executemany('''
+                    INSERT INTO itens_pedido (pedido_id, produto_id, produto, quantidade, preco_unitario, total)
+                    VALUES (?1, ?2, ?3, ?4, ?5, ?4 * ?5)
+                ''', itens)
+                conn.execute('''
+                    UPDATE pedidos
+                    SET total = (SELECT COALESCE(SUM(total), 0) FROM itens_pedido WHERE pedido_id = ?1)
+                    WHERE id = ?1
+                ''', (pedido_id,))
+                itens_gravados += len(itens)
+        gravados += quantidade
+        if progresso:
+            progresso(gravados)
+
+    for entidade in ('clientes', 'produtos', 'pedidos'):
+        db.publicar(entidade, RECARREGAR, None)
+    return {
+        'clientes': clientes,
+        'produtos': produtos,
+        'pedidos': pedidos,
+        'itens': itens_gravados,
+    }
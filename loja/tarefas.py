@@ -0,0 +1,373 @@
+"""Executor de tarefas em segundo plano ligado ao pool de conexões
+
+Consultas e escritas saem da thread da interface: ``submeter`` devolve
+uma ``Tarefa`` (um futuro) e os callbacks ``concluido``/``erro`` são
+entregues à interface por ``entregar`` (``Clock.schedule_once`` no Kivy,
+``after`` no Tk). As tarefas têm prioridade (interativa > periódica >
+manutenção) e podem ser canceladas: na fila são descartadas; em execução
+a consulta atual é interrompida (``Connection.interrupt``) e o resultado
+nunca é entregue.
+
+O número de threads fica abaixo do tamanho do pool, para sempre sobrar
+uma conexão para a thread da interface, e no máximo ``max_manutencao``
+tarefas de manutenção rodam ao mesmo tempo.
+"""
+
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from loja.medicao import percentil
+
+# Prioridades (menor número sai primeiro)
+INTERATIVA = 0
+PERIODICA = 1
+MANUTENCAO = 2
+
+NOMES_PRIORIDADE = {INTERATIVA: 'interativa', PERIODICA: 'periodica', MANUTENCAO: 'manutencao'}
+
+# Estados de uma tarefa
+AGUARDANDO = 'aguardando'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+CANCELADA = 'cancelada'
+
+_local = threading.local()
+
+
+class TarefaCancelada(Exception):
+    """A tarefa foi cancelada antes de terminar"""
+
+
+def tarefa_atual():
+    """Tarefa em execução nesta thread (``None`` fora do executor)
+
+    Laços longos podem consultar ``tarefa_atual().cancelada`` entre lotes.
+    """
+    return getattr(_local, 'tarefa', None)
+
+
+class Tarefa:
+    """Resultado futuro de uma função submetida ao executor"""
+
+    def __init__(self, executor, funcao, args, kwargs, prioridade, descricao,
+                 concluido, erro, entregar):
+        self.executor = executor
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+        self.prioridade = prioridade
+        self.descricao = descricao or getattr(funcao, '__name__', repr(funcao))
+        self.concluido = concluido
+        self.erro = erro
+        self.entregar = entregar
+
+        self.estado = AGUARDANDO
+        self.criada = time.perf_counter()
+        self.iniciada = None
+        self.terminada = None
+        self._resultado = None
+        self._excecao = None
+        self._cancelar = False
+        self._thread = None
+        self._fim = threading.Event()
+        self._ao_terminar = []
+
+    @property
+    def cancelada(self):
+        return self._cancelar or self.estado == CANCELADA
+
+    def feita(self):
+        return self._fim.is_set()
+
+    def cancelar(self):
+        """Cancela a tarefa; retorna False se ela já tinha terminado"""
+        return self.executor._cancelar(self)
+
+    def resultado(self, timeout=None):
+        """Espera o fim e retorna o valor (ou levanta o erro da função)"""
+        if not self._fim.wait(timeout):
+            raise TimeoutError(f"Tarefa {self.descricao} não terminou em {timeout}s")
+        if self.estado == CANCELADA:
+            raise TarefaCancelada(self.descricao)
+        if self._excecao is not None:
+            raise self._excecao
+        return self._resultado
+
+    def como_dict(self):
+        return {
+            "descricao": self.descricao,
+            "prioridade": NOMES_PRIORIDADE.get(self.prioridade, self.prioridade),
+            "estado": self.estado,
+            "espera_ms": round(((self.iniciada or time.perf_counter()) - self.criada) * 1000, 2),
+            "duracao_ms": round((self.terminada - self.iniciada) * 1000, 2)
+            if self.terminada and self.iniciada else None,
+        }
+
+
+class Agendamento:
+    """Execução repetida de uma função a cada ``intervalo`` segundos"""
+
+    def __init__(self, executor, intervalo, criar):
+        self.executor = executor
+        self.intervalo = intervalo
+        self._criar = criar
+        self._lock = threading.Lock()
+        self._timer = None
+        self._parado = False
+        self.tarefa = None
+
+    def _disparar(self):
+        with self._lock:
+            if self._parado:
+                return
+            self._timer = None
+            tarefa = self.tarefa = self._criar()
+            # Próxima execução conta a partir do fim desta
+            tarefa._ao_terminar.append(self._reagendar)
+        try:
+            self.executor._enfileirar(tarefa)
+        except RuntimeError:
+            # Executor encerrado entre o timer e a execução
+            pass
+
+    def _reagendar(self, tarefa):
+        self._iniciar_timer(self.intervalo)
+
+    def _iniciar_timer(self, atraso):
+        with self._lock:
+            if self._parado:
+                return
+            self._timer = threading.Timer(atraso, self._disparar)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancelar(self):
+        """Para as próximas execuções e cancela a atual"""
+        with self._lock:
+            self._parado = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            tarefa = self.tarefa
+        if tarefa is not None:
+            tarefa.cancelar()
+
+
+class ExecutorTarefas:
+    """Threads de trabalho com fila de prioridade e entrega na interface"""
+
+    def __init__(self, db, entregar=None, trabalhadores=None, max_manutencao=1, amostras=200):
+        self.db = db
+        self.entregar = entregar or (lambda funcao: funcao())
+        if trabalhadores is None:
+            # Uma conexão do pool fica livre para a thread da interface
+            trabalhadores = max(1, db.pool.tamanho - 1)
+        self.trabalhadores = trabalhadores
+        self.max_manutencao = max_manutencao
+
+        self._cond = threading.Condition()
+        self._fila = []
+        self._sequencia = itertools.count()
+        self._em_execucao = set()
+        self._agendamentos = set()
+        self._threads = []
+        self._parar = False
+
+        # Métricas
+        self._esperas = {prioridade: deque(maxlen=amostras) for prioridade in NOMES_PRIORIDADE}
+        self.executadas = 0
+        self.canceladas = 0
+        self.erros = 0
+
+    def submeter(self, funcao, *args, prioridade=INTERATIVA, concluido=None, erro=None,
+                 entregar=None, descricao=None, **kwargs):
+        """Enfileira ``funcao(*args, **kwargs)`` e retorna a ``Tarefa``
+
+        ``concluido(resultado)`` e ``erro(excecao)`` rodam na interface,
+        via ``entregar`` (ou o ``entregar`` do executor).
+        """
+        return self._enfileirar(self._criar(
+            funcao, args, kwargs, prioridade, concluido, erro, entregar, descricao
+        ))
+
+    def agendar(self, intervalo, funcao, *args, prioridade=PERIODICA, atraso=0,
+                concluido=None, erro=None, entregar=None, descricao=None, **kwargs):
+        """Executa ``funcao`` após ``atraso`` segundos e depois a cada ``intervalo``"""
+        agendamento = Agendamento(self, intervalo, lambda: self._criar(
+            funcao, args, kwargs, prioridade, concluido, erro, entregar, descricao
+        ))
+        with self._cond:
+            self._agendamentos.add(agendamento)
+        if atraso:
+            agendamento._iniciar_timer(atraso)
+        else:
+            agendamento._disparar()
+        return agendamento
+
+    def _criar(self, funcao, args, kwargs, prioridade, concluido, erro, entregar, descricao):
+        return Tarefa(
+            self, funcao, args, kwargs, prioridade, descricao,
+            concluido, erro, entregar or self.entregar
+        )
+
+    def _enfileirar(self, tarefa):
+        with self._cond:
+            if self._parar:
+                raise RuntimeError("Executor de tarefas encerrado")
+            heapq.heappush(self._fila, (tarefa.prioridade, next(self._sequencia), tarefa))
+            self._iniciar_threads()
+            self._cond.notify()
+        return tarefa
+
+    def _iniciar_threads(self):
+        # Chamado com self._cond travado; threads só nascem quando há trabalho
+        while len(self._threads) < min(self.trabalhadores, len(self._fila) + len(self._em_execucao)):
+            thread = threading.Thread(
+                target=self._trabalhar, name=f"tarefas-{len(self._threads) + 1}", daemon=True
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _cancelar(self, tarefa):
+        with self._cond:
+            if tarefa.estado == AGUARDANDO:
+                # Sai da fila quando chegar a vez (heap não remove do meio)
+                tarefa.estado = CANCELADA
+                self.canceladas += 1
+                tarefa._fim.set()
+                return True
+            if tarefa.estado != EXECUTANDO:
+                return False
+            tarefa._cancelar = True
+            thread = tarefa._thread
+        self.db.pool.interromper(thread)
+        return True
+
+    def _proxima(self):
+        """Próxima tarefa que pode rodar agora, ou None ao encerrar"""
+        with self._cond:
+            while True:
+                if self._parar:
+                    return None
+                while self._fila and self._fila[0][2].estado == CANCELADA:
+                    heapq.heappop(self._fila)
+                if self._fila:
+                    prioridade, _, tarefa = self._fila[0]
+                    manutencao = sum(t.prioridade == MANUTENCAO for t in self._em_execucao)
+                    # Manutenção é a menor prioridade: se está no topo, só há manutenção
+                    if prioridade != MANUTENCAO or manutencao < self.max_manutencao:
+                        heapq.heappop(self._fila)
+                        tarefa.estado = EXECUTANDO
+                        tarefa.iniciada = time.perf_counter()
+                        tarefa._thread = threading.get_ident()
+                        self._em_execucao.add(tarefa)
+                        self._esperas[tarefa.prioridade].append(tarefa.iniciada - tarefa.criada)
+                        return tarefa
+                self._cond.wait()
+
+    def _trabalhar(self):
+        while True:
+            tarefa = self._proxima()
+            if tarefa is None:
+                return
+
+            _local.tarefa = tarefa
+            try:
+                tarefa._resultado = tarefa.funcao(*tarefa.args, **tarefa.kwargs)
+            except sqlite3.OperationalError as e:
+                if not (tarefa._cancelar and 'interrupt' in str(e)):
+                    tarefa._excecao = e
+            except Exception as e:
+                tarefa._excecao = e
+            finally:
+                _local.tarefa = None
+
+            with self._cond:
+                self._em_execucao.discard(tarefa)
+                tarefa.terminada = time.perf_counter()
+                if tarefa._cancelar:
+                    tarefa.estado = CANCELADA
+                    self.canceladas += 1
+                elif tarefa._excecao is not None:
+                    tarefa.estado = FALHOU
+                    self.erros += 1
+                else:
+                    tarefa.estado = CONCLUIDA
+                    self.executadas += 1
+                # Manutenção pode ter ficado esperando esta vaga
+                self._cond.notify_all()
+            tarefa._fim.set()
+
+            self._entregar(tarefa)
+            for funcao in tarefa._ao_terminar:
+                funcao(tarefa)
+
+    def _entregar(self, tarefa):
+        if tarefa.estado == CONCLUIDA and tarefa.concluido:
+            callback, valor = tarefa.concluido, tarefa._resultado
+        elif tarefa.estado == FALHOU and tarefa.erro:
+            callback, valor = tarefa.erro, tarefa._excecao
+        else:
+            return
+
+        def aplicar():
+            # Cancelada depois de terminar, antes de chegar à interface
+            if not tarefa._cancelar:
+                callback(valor)
+        tarefa.entregar(aplicar)
+
+    def pendentes(self):
+        """Tarefas na fila e em execução, das mais prioritárias para as menos"""
+        with self._cond:
+            tarefas = list(self._em_execucao) + [
+                tarefa for _, _, tarefa in sorted(self._fila) if tarefa.estado == AGUARDANDO
+            ]
+        return [tarefa.como_dict() for tarefa in tarefas]
+
+    def metricas(self):
+        """Espera na fila (p50/p95, em ms) por prioridade e contadores"""
+        with self._cond:
+            esperas = {prioridade: list(valores) for prioridade, valores in self._esperas.items()}
+            na_fila = sum(tarefa.estado == AGUARDANDO for _, _, tarefa in self._fila)
+            em_execucao = len(self._em_execucao)
+        resultado = {
+            "trabalhadores": self.trabalhadores,
+            "na_fila": na_fila,
+            "em_execucao": em_execucao,
+            "executadas": self.executadas,
+            "canceladas": self.canceladas,
+            "erros": self.erros,
+        }
+        for prioridade, valores in esperas.items():
+            nome = NOMES_PRIORIDADE[prioridade]
+            resultado[f"espera_{nome}_p50_ms"] = percentil(valores, 50) * 1000
+            resultado[f"espera_{nome}_p95_ms"] = percentil(valores, 95) * 1000
+        return resultado
+
+    def parar(self, esperar=False, timeout=None):
+        """Cancela agendamentos e tarefas pendentes e encerra as threads"""
+        with self._cond:
+            agendamentos = list(self._agendamentos)
+            self._agendamentos.clear()
+        for agendamento in agendamentos:
+            agendamento.cancelar()
+
+        with self._cond:
+            self._parar = True
+            fila, self._fila = self._fila, []
+            em_execucao = list(self._em_execucao)
+            threads = list(self._threads)
+            self._cond.notify_all()
+        for _, _, tarefa in fila:
+            tarefa.cancelar()
+        for tarefa in em_execucao:
+            tarefa.cancelar()
+
+        if esperar:
+            for thread in threads:
+                thread.join(timeout)
@@ -1,26 +1,200 @@
+import time
+_inicio_processo = time.perf_counter()
+
 from kivymd.app import MDApp
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.button import MDRaisedButton
-from kivymd.uix.dialog import MDDialog
 from kivymd.uix.list import OneLineListItem
-from kivy.core.window import Window
+from kivy.clock import Clock
 from kivy.utils import platform
 import sqlite3
 import os
+import threading
 from datetime import datetime
-import customtkinter as ctk
-import tkinter.messagebox as messagebox
-import subprocess
+from bisect import bisect_left
+from loja.autocompletar import Autocompletar
+from loja.backup import ServicoBackup
+from loja.busca import BuscaTextual
+from loja.busca_assincrona import BuscaAssincrona
+from loja.comandas import FALHOU, ServicoComandas
+from loja.database import COLUNAS_PEDIDO, DatabaseManager, ErroPedido, caminho_banco_padrao
+from loja.datas import atualizar_formato_datas, data_br, data_iso, normalizacao_pendente, normalizar_datas
+from loja.dinheiro import formatar
+from loja.entregas import ResumoEntregas
+from loja.estatisticas import MotorEstatisticas
+from loja.eventos import ATUALIZAR, INSERIR, LIMPAR, RECARREGAR, REMOVER
+from loja.inicio import MedidorInicio, ModuloTardio, SnapshotInicial
+from loja.paginacao import PaginadorPedidos
+from loja.repositorio import ClienteRepo, PedidoRepo, ProdutoRepo
+from loja.tarefas import MANUTENCAO, PERIODICA, ExecutorTarefas
+
+# Toolkits das janelas secundárias só são importados no primeiro uso.
+# Com LOJA_MEDIR_INICIO=1 os tempos de inicialização são impressos em JSON.
+medidor = MedidorInicio(_inicio_processo)
+ctk = ModuloTardio("customtkinter", medidor)
+messagebox = ModuloTardio("tkinter.messagebox", medidor)
+ttk = ModuloTardio("tkinter.ttk", medidor)
+tk = ModuloTardio("tkinter", medidor)
+medidor.marcar("imports")
 
 class MainScreen(MDScreen):
     pass
 
+class CampoAutocompletar:
+    """Entrada com sugestões por prefixo, no lugar de um menu com todos os nomes"""
+    
+    # Teclas de navegação não refazem as sugestões
+    NAVEGACAO = ("Up", "Down", "Return", "KP_Enter", "Escape", "Tab")
+    
+    def __init__(self, pai, autocompletar, placeholder, width=300, height=35):
+        self.autocompletar = autocompletar
+        self.entrada = ctk.CTkEntry(pai, width=width, height=height, placeholder_text=placeholder)
+        self.lista = tk.Listbox(
+            self.entrada.winfo_toplevel(),
+            height=autocompletar.limite,
+            activestyle="none",
+            exportselection=False
+        )
+        self.entrada.bind("<KeyRelease>", self._ao_digitar)
+        self.entrada.bind("<FocusIn>", self._ao_digitar)
+        self.entrada.bind("<FocusOut>", lambda e: self.entrada.after(200, self._esconder_sem_foco))
+        self.entrada.bind("<Down>", self._descer)
+        self.entrada.bind("<Return>", self._confirmar)
+        self.entrada.bind("<Escape>", lambda e: self.esconder())
+        self.lista.bind("<ButtonRelease-1>", self._confirmar)
+        self.lista.bind("<Return>", self._confirmar)
+        self.lista.bind("<Escape>", lambda e: (self.esconder(), self.entrada.focus_set()))
+    
+    def pack(self, **kwargs):
+        self.entrada.pack(**kwargs)
+    
+    def get(self):
+        """Nome cadastrado indicado pelo texto ou, se nenhum, o texto digitado"""
+        texto = self.entrada.get().strip()
+        return self.autocompletar.resolver(texto) or texto
+    
+    def set(self, valor):
+        self.entrada.delete(0, "end")
+        if valor:
+            self.entrada.insert(0, valor)
+        self.esconder()
+    
+    def esconder(self):
+        self.lista.place_forget()
+    
+    def _ao_digitar(self, event=None):
+        if event is not None and getattr(event, "keysym", None) in self.NAVEGACAO:
+            return
+        sugestoes = self.autocompletar.sugerir(self.entrada.get())
+        if not sugestoes:
+            self.esconder()
+            return
+        self.lista.delete(0, "end")
+        self.lista.insert("end", *sugestoes)
+        self.lista.configure(height=len(sugestoes))
+        self.lista.place(in_=self.entrada, x=0, rely=1.0, relwidth=1.0)
+        self.lista.lift()
+    
+    def _descer(self, event=None):
+        if self.lista.winfo_ismapped() and self.lista.size():
+            self.lista.focus_set()
+            self.lista.selection_clear(0, "end")
+            self.lista.selection_set(0)
+            self.lista.activate(0)
+        return "break"
+    
+    def _confirmar(self, event=None):
+        if self.lista.winfo_ismapped() and self.lista.size():
+            selecao = self.lista.curselection()
+            self.set(self.lista.get(selecao[0] if selecao else 0))
+            self.entrada.focus_set()
+        return "break"
+    
+    def _esconder_sem_foco(self):
+        try:
+            foco = self.entrada.focus_get()
+        except KeyError:
+            foco = None
+        if foco is not self.lista and not str(foco).startswith(str(self.entrada)):
+            self.esconder()
+
 class SistemaLojaApp(MDApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.db = DatabaseManager()
+        # O banco é aberto só depois do primeiro quadro (ver on_start)
+        self.db = None
+        self.tarefas = None
+        # Com LOJA_SERVIDOR=host:porta o banco é o do servidor (python -m loja servidor)
+        self.remoto = os.environ.get("LOJA_SERVIDOR")
+        self.busca_historico = None
         self.dialog = None
+        self.snapshot = SnapshotInicial(os.path.join(
+            os.path.dirname(os.path.abspath(caminho_banco_padrao())),
+            'snapshot_inicial.json'
+        ))
+        
+        # Itens da lista de clientes por id
+        self._itens_clientes = {}
+        
+        # Cargas das listas em andamento (canceladas por uma pesquisa nova)
+        self._carga_clientes = None
+        self._carga_produtos = None
+        self._carga_pedidos = None
+        self._carga_historico = None
+        self._verificacao_entregas = None
+    
+    def _abrir_banco(self):
+        """Abre o banco e cria os serviços que dependem dele"""
+        if self.remoto:
+            from loja.remoto import BackupRemoto, BancoRemoto
+            self.db = BancoRemoto(self.remoto)
+        else:
+            self.db = DatabaseManager()
+        self.tarefas = ExecutorTarefas(self.db, entregar=self._na_interface)
+        # Conversão de datas antigas (continua de onde parou, se interrompida);
+        # no modo servidor, feita pelo servidor
+        if not self.remoto and normalizacao_pendente(self.db):
+            normalizar_datas(self.db)
+        self.clientes = ClienteRepo(self.db)
+        self.produtos = ProdutoRepo(self.db)
+        self.pedidos = PedidoRepo(self.db)
+        self.catalogo = self.db.catalogo
+        self.arquivo = self.db.arquivo
+        self.sugestoes_clientes = Autocompletar(self.catalogo.clientes)
+        self.sugestoes_produtos = Autocompletar(self.catalogo.produtos)
+        self.busca = BuscaTextual(self.db)
+        self.resumo_entregas = ResumoEntregas(self.db)
+        self.estatisticas = MotorEstatisticas(self.db)
+        self.servico_backup = BackupRemoto(self.db) if self.remoto else ServicoBackup(self.db)
+        self.comandas = ServicoComandas(self.db)
+        self.comandas.fila.ao_mudar = self._ao_mudar_impressao
+        self.paginador_pedidos = PaginadorPedidos(self.db)
+        self.paginador_historico = PaginadorPedidos(self.db, com_arquivo=True)
+        self.busca_pedidos = BuscaAssincrona(
+            self.db,
+            consultar=self._consultar_pedidos,
+            aplicar=self._aplicar_pedidos,
+            entregar=lambda funcao: Clock.schedule_once(lambda dt: funcao())
+        )
         
+        # Telas aplicam só a diferença de cada escrita. Os avisos saem da
+        # thread que fez o commit (tarefas, servidor): listas do Kivy e
+        # janelas Tk só são alteradas no laço principal
+        self.db.eventos.assinar('clientes', self.ao_alterar_cliente, entregar=self._na_interface)
+        self.db.eventos.assinar('pedidos', self.ao_alterar_pedido, entregar=self._na_interface)
+        
+        # Índices das sugestões são refeitos fora da thread da interface
+        # (_aquecer_sugestoes só enfileira, pode rodar em qualquer thread)
+        self.db.eventos.assinar('clientes', lambda alteracao: self._aquecer_sugestoes())
+        self.db.eventos.assinar('produtos', lambda alteracao: self._aquecer_sugestoes())
+        
+    def _na_interface(self, funcao):
+        """Entrega ``funcao`` ao laço do Kivy (callbacks das tarefas)"""
+        Clock.schedule_once(lambda dt: funcao())
+    
+    def _na_janela(self, funcao):
+        """Entrega ``funcao`` ao laço do Tk (janelas customtkinter)"""
+        self.janela.after(0, funcao)
+    
     def build(self):
         self.theme_cls.primary_palette = "Blue"
         self.theme_cls.theme_style = "Dark"
@@ -28,7 +202,132 @@ class SistemaLojaApp(MDApp):
     
     def on_start(self):
         """Chamado quando o aplicativo inicia"""
+        from kivy.core.window import Window
+        Window.bind(on_flip=self._primeiro_quadro)
+        
+        # Primeira tela a partir do snapshot; banco aberto (migrações,
+        # resumos) fora da thread da interface
+        self.mostrar_snapshot()
+        threading.Thread(target=self._iniciar_dados, name="abrir-banco", daemon=True).start()
+        
+    def _primeiro_quadro(self, *args):
+        from kivy.core.window import Window
+        Window.unbind(on_flip=self._primeiro_quadro)
+        medidor.marcar("primeiro quadro")
+        
+    def _iniciar_dados(self):
+        """Roda em segundo plano: abre o banco e agenda a carga completa
+        
+        Uma falha (banco corrompido, servidor fora do ar) é mostrada no laço
+        principal, que também é o das janelas Tk, com a opção de tentar de novo.
+        """
+        try:
+            self._abrir_banco()
+        except Exception as e:
+            self._descartar_banco()
+            self._na_interface(lambda erro=e: self._falha_ao_abrir(erro))
+            return
+        medidor.marcar("banco aberto")
+        Clock.schedule_once(lambda dt: self._dados_prontos())
+        
+    def _descartar_banco(self):
+        """Fecha o que ``_abrir_banco`` chegou a abrir antes de falhar"""
+        if self.db is not None:
+            self.tarefas.parar()
+            self.db.fechar()
+            self.db = None
+        
+    def _falha_ao_abrir(self, erro):
+        if messagebox.askretrycancel(
+            "Erro ao abrir o banco",
+            f"Não foi possível abrir o banco de dados:\n{erro}\n\nTentar novamente?",
+            icon=messagebox.ERROR
+        ):
+            threading.Thread(target=self._iniciar_dados, name="abrir-banco", daemon=True).start()
+        else:
+            self.stop()
+        
+    def _dados_prontos(self):
         self.carregar_dados()
+        self.tarefas.submeter(self.salvar_snapshot, prioridade=MANUTENCAO)
+        medidor.marcar("dados carregados")
+        medidor.imprimir()
+        
+        # Pesos de uso das sugestões (pedidos recentes e frequentes)
+        self.tarefas.agendar(1800, self._carregar_uso, prioridade=MANUTENCAO)
+        
+        # No modo servidor os avisos do servidor mantêm os cadastros em dia,
+        # e arquivamento e backup ficam com ele
+        if self.remoto:
+            return
+        
+        # Cadastros alterados por outros terminais
+        self.tarefas.agendar(5, self._verificar_catalogo, prioridade=PERIODICA)
+        
+        # Pedidos encerrados há mais de um ano vão para o arquivo, uma vez por dia
+        self.tarefas.agendar(
+            86400, self.arquivo.arquivar, prioridade=MANUTENCAO, atraso=600
+        )
+        
+        # Backup diário automático, conferido a cada hora
+        self.tarefas.agendar(
+            3600, self.servico_backup.executar_se_vencido, prioridade=MANUTENCAO
+        )
+    
+    def _verificar_catalogo(self):
+        """Roda na thread de tarefas: descarta cadastros alterados por outros terminais"""
+        if self.catalogo.verificar():
+            self.sugestoes_clientes.aquecer()
+            self.sugestoes_produtos.aquecer()
+    
+    def _carregar_uso(self):
+        """Roda na thread de tarefas: pesos de uso e índices das sugestões"""
+        hoje = datetime.now().strftime('%Y-%m-%d')
+        self.sugestoes_clientes.definir_pesos(self.pedidos.uso_clientes(hoje))
+        self.sugestoes_produtos.definir_pesos(self.pedidos.uso_produtos(hoje))
+        self.sugestoes_clientes.aquecer()
+        self.sugestoes_produtos.aquecer()
+    
+    def _aquecer_sugestoes(self):
+        """Refaz em segundo plano os índices das sugestões após uma escrita
+        
+        Chamado da thread que publicou a alteração; ``submeter`` é seguro
+        entre threads.
+        """
+        if self.tarefas is not None:
+            self.tarefas.submeter(self.sugestoes_clientes.aquecer, prioridade=MANUTENCAO)
+            self.tarefas.submeter(self.sugestoes_produtos.aquecer, prioridade=MANUTENCAO)
+    
+    def on_stop(self):
+        if self.db is not None:
+            self.tarefas.parar()
+            self.salvar_snapshot()
+        
+    def mostrar_snapshot(self):
+        """Preenche as listas com a cópia gravada na última execução"""
+        snapshot = self.snapshot.carregar()
+        if not snapshot:
+            return
+        
+        for nome in snapshot.get("clientes", []):
+            self.root.ids.lista_clientes.add_widget(self._item_cliente(nome))
+        for nome, preco in snapshot.get("produtos", []):
+            self.root.ids.lista_produtos.add_widget(OneLineListItem(
+                text=f"{nome} - {formatar(preco)}",
+                on_release=lambda x, p=nome: self.mostrar_detalhes_produto(p)
+            ))
+        self.root.ids.lista_pedidos.data = [
+            self._item_pedido(pedido) for pedido in snapshot.get("pedidos", [])
+        ]
+        
+    def salvar_snapshot(self):
+        """Grava o começo das listas para a próxima inicialização"""
+        limite = SnapshotInicial.LIMITE
+        clientes = self.catalogo.clientes.nomes()[:limite]
+        produtos = [(produto.nome, produto.preco) for produto in self.catalogo.produtos.registros()[:limite]]
+        paginador = PaginadorPedidos(self.db, tamanho_pagina=limite)
+        paginador.reiniciar()
+        self.snapshot.salvar(clientes, produtos, paginador.proxima_pagina())
         
     def carregar_dados(self):
         """Carrega os dados iniciais"""
@@ -37,50 +336,251 @@ class SistemaLojaApp(MDApp):
         self.carregar_pedidos()
     
     def carregar_clientes(self):
-        """Carrega lista de clientes"""
+        """Carrega lista de clientes (catálogo; consulta em segundo plano se invalidado)"""
+        if self._carga_clientes is not None:
+            self._carga_clientes.cancelar()
+        self._carga_clientes = self.tarefas.submeter(
+            self.catalogo.clientes.registros, concluido=self._mostrar_clientes
+        )
+    
+    def _mostrar_clientes(self, clientes):
+        """Roda na thread da interface: refaz a lista de clientes"""
         lista = self.root.ids.lista_clientes
         lista.clear_widgets()
+        self._itens_clientes = {}
         
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT nome FROM clientes ORDER BY nome')
-            for cliente in cursor.fetchall():
-                lista.add_widget(OneLineListItem(
-                    text=cliente[0],
-                    on_release=lambda x, c=cliente[0]: self.mostrar_detalhes_cliente(c)
-                ))
+        for cliente in clientes:
+            item = self._item_cliente(cliente.nome)
+            self._itens_clientes[cliente.id] = item
+            lista.add_widget(item)
+    
+    def _item_cliente(self, nome):
+        """Cria a linha da lista de clientes"""
+        return OneLineListItem(
+            text=nome,
+            on_release=lambda x, c=nome: self.mostrar_detalhes_cliente(c)
+        )
     
     def carregar_produtos(self):
-        """Carrega lista de produtos"""
+        """Carrega lista de produtos (catálogo; consulta em segundo plano se invalidado)"""
+        if self._carga_produtos is not None:
+            self._carga_produtos.cancelar()
+        self._carga_produtos = self.tarefas.submeter(
+            self.catalogo.produtos.registros, concluido=self._mostrar_produtos
+        )
+    
+    def _mostrar_produtos(self, produtos):
+        """Roda na thread da interface: refaz a lista de produtos"""
         lista = self.root.ids.lista_produtos
         lista.clear_widgets()
         
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT nome, preco FROM produtos ORDER BY nome')
-            for produto in cursor.fetchall():
-                lista.add_widget(OneLineListItem(
-                    text=f"{produto[0]} - R$ {produto[1]:.2f}",
-                    on_release=lambda x, p=produto[0]: self.mostrar_detalhes_produto(p)
-                ))
+        for produto in produtos:
+            lista.add_widget(OneLineListItem(
+                text=f"{produto.nome} - {formatar(produto.preco)}",
+                on_release=lambda x, p=produto.nome: self.mostrar_detalhes_produto(p)
+            ))
     
-    def carregar_pedidos(self):
-        """Carrega lista de pedidos"""
-        lista = self.root.ids.lista_pedidos
+    def carregar_pedidos(self, termo=''):
+        """Carrega a primeira página da lista de pedidos em segundo plano
+        
+        A lista atual continua na tela até a página nova chegar.
+        """
+        paginador = PaginadorPedidos(self.db)
+        paginador.reiniciar(termo)
+        self._trocar_paginador_pedidos(paginador)
+        self._carga_pedidos = self.tarefas.submeter(
+            paginador.proxima_pagina,
+            concluido=lambda pedidos: self._mostrar_pedidos(paginador, pedidos, substituir=True)
+        )
+    
+    def carregar_mais_pedidos(self):
+        """Pede a próxima página de pedidos (uma carga por vez)"""
+        if self._carga_pedidos is not None and not self._carga_pedidos.feita():
+            return
+        paginador = self.paginador_pedidos
+        self._carga_pedidos = self.tarefas.submeter(
+            paginador.proxima_pagina,
+            concluido=lambda pedidos: self._mostrar_pedidos(paginador, pedidos)
+        )
+    
+    def _trocar_paginador_pedidos(self, paginador):
+        """Passa a paginar por ``paginador``; a carga do anterior é cancelada"""
+        if self._carga_pedidos is not None:
+            self._carga_pedidos.cancelar()
+            self._carga_pedidos = None
+        self.paginador_pedidos = paginador
+    
+    def _mostrar_pedidos(self, paginador, pedidos, substituir=False):
+        """Roda na thread da interface: acrescenta (ou troca) a página na RecycleView"""
+        # Página de um paginador já trocado por pesquisa ou recarga
+        if paginador is not self.paginador_pedidos:
+            return
+        itens = [self._item_pedido(pedido) for pedido in pedidos]
+        if substituir:
+            self.root.ids.lista_pedidos.data = itens
+        else:
+            self.root.ids.lista_pedidos.data.extend(itens)
+    
+    def _item_pedido(self, pedido):
+        """Dados de uma linha da RecycleView de pedidos"""
+        return {
+            "pedido_id": pedido[0],
+            "text": f"Pedido #{pedido[0]} - {pedido[2]} - {formatar(pedido[5])} ({pedido[4]})",
+            "on_release": lambda p=pedido[0]: self.mostrar_detalhes_pedido(p)
+        }
+    
+    def ao_rolar_pedidos(self, lista):
+        """Carrega mais pedidos quando a rolagem chega perto do fim"""
+        if lista.scroll_y <= 0.05 and not self.paginador_pedidos.fim:
+            self.carregar_mais_pedidos()
+    
+    def pesquisar_clientes(self, texto):
+        """Pesquisa clientes em segundo plano; cada tecla cancela a pesquisa anterior"""
+        if self.db is None:
+            return
+        if not texto.strip():
+            self.carregar_clientes()
+            return
+        if self._carga_clientes is not None:
+            self._carga_clientes.cancelar()
+        self._carga_clientes = self.tarefas.submeter(
+            self.busca.clientes, texto, concluido=self._mostrar_busca_clientes
+        )
+    
+    def _mostrar_busca_clientes(self, clientes):
+        """Roda na thread da interface: clientes que casam com a pesquisa"""
+        lista = self.root.ids.lista_clientes
         lista.clear_widgets()
+        for cliente in clientes:
+            lista.add_widget(self._item_cliente(cliente[1]))
+    
+    def pesquisar_produtos(self, texto):
+        """Pesquisa produtos em segundo plano; cada tecla cancela a pesquisa anterior"""
+        if self.db is None:
+            return
+        if not texto.strip():
+            self.carregar_produtos()
+            return
+        if self._carga_produtos is not None:
+            self._carga_produtos.cancelar()
+        self._carga_produtos = self.tarefas.submeter(
+            self.busca.produtos, texto, concluido=self._mostrar_busca_produtos
+        )
+    
+    def _mostrar_busca_produtos(self, produtos):
+        """Roda na thread da interface: produtos que casam com a pesquisa"""
+        lista = self.root.ids.lista_produtos
+        lista.clear_widgets()
+        for produto in produtos:
+            lista.add_widget(OneLineListItem(
+                text=f"{produto[1]} - {formatar(produto[2])}",
+                on_release=lambda x, p=produto[1]: self.mostrar_detalhes_produto(p)
+            ))
+    
+    def pesquisar_pedidos(self, texto):
+        """Agenda a pesquisa de pedidos fora da thread da interface"""
+        if self.db is None:
+            return
+        self.busca_pedidos.submeter(texto)
+    
+    def _consultar_pedidos(self, termo):
+        """Roda na thread de busca: primeira página para o termo"""
+        paginador = PaginadorPedidos(self.db)
+        paginador.reiniciar(termo)
+        return paginador, paginador.proxima_pagina()
+    
+    def _aplicar_pedidos(self, resultado):
+        """Roda na thread da interface: troca o conteúdo da lista"""
+        paginador, linhas = resultado
+        self._trocar_paginador_pedidos(paginador)
+        self.root.ids.lista_pedidos.data = [self._item_pedido(p) for p in linhas]
+    
+    def ao_alterar_cliente(self, alteracao):
+        """Aplica na lista a alteração de um único cliente"""
+        if alteracao.operacao == RECARREGAR:
+            if self.root is not None:
+                self.carregar_clientes()
+            return
+        
+        nome_novo = alteracao.dados["nome"] if alteracao.dados else None
+        
+        # Lista filtrada pela pesquisa é refeita na próxima tecla
+        if self.root is None or self.root.ids.search_clientes.text.strip():
+            return
+        
+        lista = self.root.ids.lista_clientes
+        item = self._itens_clientes.pop(alteracao.chave, None)
+        if item is not None:
+            lista.remove_widget(item)
+        
+        if alteracao.operacao in (INSERIR, ATUALIZAR):
+            # Posição em ordem alfabética (children do MDList fica invertido)
+            nomes = sorted(i.text for i in self._itens_clientes.values())
+            posicao = bisect_left(nomes, nome_novo)
+            item = self._item_cliente(nome_novo)
+            self._itens_clientes[alteracao.chave] = item
+            lista.add_widget(item, index=len(lista.children) - posicao)
+    
+    def ao_alterar_pedido(self, alteracao):
+        """Aplica nas listas de pedidos a alteração de um único pedido"""
+        if alteracao.operacao == RECARREGAR:
+            if self.root is not None:
+                self.carregar_pedidos(self.paginador_pedidos.termo)
+            if hasattr(self, "lista_historico"):
+                self.filtrar_pedidos()
+            return
         
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, cliente_nome, total, status 
-                FROM pedidos 
-                ORDER BY data DESC
-            ''')
-            for pedido in cursor.fetchall():
-                lista.add_widget(OneLineListItem(
-                    text=f"Pedido #{pedido[0]} - {pedido[1]} - R$ {pedido[2]:.2f} ({pedido[3]})",
-                    on_release=lambda x, p=pedido[0]: self.mostrar_detalhes_pedido(p)
-                ))
+        if alteracao.operacao == LIMPAR:
+            paginador = PaginadorPedidos(self.db)
+            paginador.reiniciar(self.paginador_pedidos.termo)
+            self._trocar_paginador_pedidos(paginador)
+            if self.root is not None:
+                self.root.ids.lista_pedidos.data = []
+            if hasattr(self, "lista_historico"):
+                historico = PaginadorPedidos(self.db, com_arquivo=True)
+                historico.reiniciar(self.paginador_historico.termo, self.paginador_historico.status)
+                self._trocar_paginador_historico(historico)
+                self.lista_historico.delete(*self.lista_historico.get_children())
+            return
+        
+        linha = tuple(alteracao.dados[c] for c in COLUNAS_PEDIDO) if alteracao.dados else None
+        
+        if self.root is not None:
+            self._aplicar_na_lista_pedidos(alteracao, linha)
+        if hasattr(self, "lista_historico"):
+            self._aplicar_no_historico(alteracao, linha)
+    
+    def _aplicar_na_lista_pedidos(self, alteracao, linha):
+        """Insere, troca ou remove uma linha da RecycleView de pedidos"""
+        dados = self.root.ids.lista_pedidos.data
+        indice = next(
+            (i for i, d in enumerate(dados) if d.get("pedido_id") == alteracao.chave),
+            None
+        )
+        
+        if alteracao.operacao == REMOVER:
+            if indice is not None:
+                del dados[indice]
+        elif indice is not None:
+            dados[indice] = self._item_pedido(linha)
+        elif alteracao.operacao == INSERIR and not self.paginador_pedidos.termo:
+            # Pedido novo é o mais recente: entra no topo
+            dados.insert(0, self._item_pedido(linha))
+    
+    def _aplicar_no_historico(self, alteracao, linha):
+        """Insere, troca ou remove uma linha do Treeview do histórico"""
+        iid = str(alteracao.chave)
+        existe = self.lista_historico.exists(iid)
+        status = self.paginador_historico.status
+        visivel = linha is not None and (status is None or linha[4] == status)
+        
+        if alteracao.operacao == REMOVER or not visivel:
+            if existe:
+                self.lista_historico.delete(iid)
+        elif existe:
+            self.lista_historico.item(iid, values=self._valores_historico(linha))
+        elif alteracao.operacao == INSERIR and not self.paginador_historico.termo:
+            self.lista_historico.insert("", 0, iid=iid, values=self._valores_historico(linha))
     
     def mostrar_notificacao(self, titulo, mensagem):
         """Mostra notificação nativa"""
@@ -94,6 +594,8 @@ class SistemaLojaApp(MDApp):
             )
         else:
             if not self.dialog:
+                from kivymd.uix.button import MDRaisedButton
+                from kivymd.uix.dialog import MDDialog
                 self.dialog = MDDialog(
                     title=titulo,
                     text=mensagem,
@@ -142,6 +644,8 @@ class SistemaLojaApp(MDApp):
             ("🧹 Limpar Todos os Pedidos", self.deletar_todos_os_pedidos),
             ("📊 Ver Estatísticas", self.ver_estatisticas),
             ("💾 Backup do Banco", self.fazer_backup),
+            ("🖨️ Comandas de Hoje", self.imprimir_entregas_de_hoje),
+            ("⏱️ Perfil das Consultas", self.abrir_perfil_consultas),
             ("🔄 Atualizar Datas", self.atualizar_formato_datas)
         ]
         
@@ -165,21 +669,18 @@ class SistemaLojaApp(MDApp):
 
     def resetar_banco_dados(self):
         """Reseta o banco de dados para o estado inicial"""
+        if self.remoto:
+            messagebox.showwarning(
+                "Modo servidor",
+                "O banco de dados está no servidor.\nResete-o no computador do servidor."
+            )
+            return
+        
         if messagebox.askyesno(
             "⚠️ Confirmação",
             "Tem certeza que deseja resetar o banco de dados?\nTodos os dados serão perdidos!"
         ):
-            try:
-                # Fazer backup antes de resetar
-                self.fazer_backup()
-                
-                # Deletar banco atual
-                if os.path.exists(self.db.db_path):
-                    os.remove(self.db.db_path)
-                
-                # Recriar banco
-                self.criar_banco_dados()
-                
+            def concluido(backup_path):
                 # Recarregar dados
                 self.carregar_pedidos()
                 self.atualizar_lista_clientes()
@@ -187,90 +688,280 @@ class SistemaLojaApp(MDApp):
                 
                 messagebox.showinfo(
                     "Sucesso",
-                    "Banco de dados resetado com sucesso!\nUm backup foi criado antes da operação."
+                    "Banco de dados resetado com sucesso!\n"
+                    f"Um backup foi criado antes da operação:\n{backup_path}"
                 )
-            except Exception as e:
-                messagebox.showerror(
-                    "Erro",
-                    f"Erro ao resetar banco de dados: {str(e)}"
+            
+            self.tarefas.submeter(
+                self._resetar_banco,
+                prioridade=MANUTENCAO,
+                concluido=concluido,
+                erro=lambda e: messagebox.showerror("Erro", f"Erro ao resetar banco de dados: {str(e)}"),
+                entregar=self._na_janela
+            )
+    
+    def _resetar_banco(self):
+        """Roda na thread de tarefas: backup, remoção dos arquivos e esquema novo"""
+        # Fazer backup antes de resetar (precisa terminar antes de apagar)
+        backup_path = self.servico_backup.executar()
+        
+        # Fechar conexões do pool e deletar banco atual e arquivo de pedidos
+        self.db.fechar()
+        for caminho in (self.db.db_path, self.arquivo.caminho):
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(caminho + sufixo):
+                    os.remove(caminho + sufixo)
+        
+        # Recriar banco
+        self.db.criar_banco_dados()
+        if os.path.exists(self.snapshot.caminho):
+            os.remove(self.snapshot.caminho)
+        self.resumo_entregas.carregar()
+        return backup_path
+
+    def atualizar_formato_datas(self):
+        """Converte as datas dos pedidos para o formato aaaa-mm-dd"""
+        def concluido(alteradas):
+            messagebox.showinfo(
+                "Sucesso",
+                f"Datas atualizadas!\nData do pedido: {alteradas['data']}\n"
+                f"Data de entrega: {alteradas['data_entrega']}\n"
+                f"Não reconhecidas: {alteradas['invalidas']}"
+            )
+        
+        # No modo servidor a conversão roda no servidor
+        tarefa = (self.db.atualizar_formato_datas,) if self.remoto else (atualizar_formato_datas, self.db)
+        self.tarefas.submeter(
+            *tarefa,
+            prioridade=MANUTENCAO,
+            concluido=concluido,
+            erro=lambda e: messagebox.showerror("Erro", f"Erro ao atualizar datas: {str(e)}"),
+            entregar=self._na_janela
+        )
+    
+    def abrir_perfil_consultas(self):
+        """Mostra os comandos SQL mais caros e as consultas lentas"""
+        perfil = self.db.perfil
+        
+        janela_perfil = ctk.CTkToplevel(self.janela)
+        janela_perfil.title("⏱️ Perfil das Consultas")
+        janela_perfil.geometry("900x600")
+        
+        frame_botoes = ctk.CTkFrame(janela_perfil, fg_color="transparent")
+        frame_botoes.pack(fill="x", padx=20, pady=(20, 10))
+        
+        texto = ctk.CTkTextbox(janela_perfil, font=("Courier", 12), wrap="none")
+        texto.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+        
+        def mostrar(relatorio):
+            if not janela_perfil.winfo_exists():
+                return
+            texto.configure(state="normal")
+            texto.delete("1.0", "end")
+            texto.insert("1.0", relatorio)
+            texto.configure(state="disabled")
+            botao_ligar.configure(text="⏸️ Desligar" if perfil.ativo else "▶️ Ligar")
+        
+        def atualizar():
+            self.tarefas.submeter(self._relatorio_perfil, concluido=mostrar, entregar=self._na_janela)
+        
+        def ligar_desligar():
+            if perfil.ativo:
+                perfil.desativar()
+            else:
+                perfil.ativar()
+            atualizar()
+        
+        def limpar():
+            perfil.limpar()
+            atualizar()
+        
+        def salvar():
+            from tkinter import filedialog
+            caminho = filedialog.asksaveasfilename(
+                parent=janela_perfil,
+                defaultextension=".json",
+                initialfile=f"perfil_sql_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            )
+            if caminho:
+                self.tarefas.submeter(
+                    perfil.salvar_json, caminho,
+                    concluido=lambda salvo: messagebox.showinfo("Sucesso", f"Perfil salvo em:\n{salvo}"),
+                    erro=lambda e: messagebox.showerror("Erro", f"Erro ao salvar perfil: {str(e)}"),
+                    entregar=self._na_janela
                 )
+        
+        botao_ligar = ctk.CTkButton(frame_botoes, text="", command=ligar_desligar, width=120)
+        botao_ligar.pack(side="left", padx=5)
+        for texto_botao, comando in (
+            ("🔄 Atualizar", atualizar),
+            ("🧹 Limpar", limpar),
+            ("💾 Salvar JSON", salvar),
+        ):
+            ctk.CTkButton(frame_botoes, text=texto_botao, command=comando, width=120).pack(side="left", padx=5)
+        
+        atualizar()
+    
+    def _relatorio_perfil(self):
+        """Roda na thread de tarefas: texto do painel de perfil"""
+        perfil = self.db.perfil
+        linhas = [
+            f"Perfil {'ligado' if perfil.ativo else 'desligado'} - "
+            f"amostragem {perfil.amostragem:.0%}, lentas acima de {perfil.limite_ms:.0f} ms",
+            "",
+            f"{'total ms':>10} {'exec.':>7} {'médio ms':>9} {'máx ms':>8} {'linhas':>8}  SQL",
+        ]
+        for total in perfil.totais(30):
+            linhas.append(
+                f"{total['ms_total']:>10.1f} {total['execucoes']:>7} {total['ms_medio']:>9.3f} "
+                f"{total['ms_max']:>8.1f} {total['linhas']:>8}  {total['sql'][:120]}"
+            )
+            for origem, vezes in sorted(total["origens"].items(), key=lambda o: -o[1])[:3]:
+                linhas.append(f"{'':>46}↳ {origem} ({vezes}x)")
+        
+        linhas += ["", "Consultas lentas (mais recentes primeiro):"]
+        for lenta in perfil.consultas_lentas():
+            linhas.append(f"{lenta['quando']}  {lenta['ms']:.1f} ms  {lenta['linhas']} linha(s)  {lenta['origem']}")
+            linhas.append(f"    {lenta['sql'][:160]}")
+            for passo in lenta["plano"] or ():
+                linhas.append(f"      plano: {passo}")
+        return "\n".join(linhas)
 
     def ver_estatisticas(self):
-        """Mostra estatísticas do sistema"""
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Buscar estatísticas
-            stats = {
-                "Total de Clientes": cursor.execute("SELECT COUNT(*) FROM clientes").fetchone()[0],
-                "Total de Produtos": cursor.execute("SELECT COUNT(*) FROM produtos").fetchone()[0],
-                "Total de Pedidos": cursor.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0],
-                "Pedidos Pendentes": cursor.execute("SELECT COUNT(*) FROM pedidos WHERE status='pendente'").fetchone()[0],
-                "Valor Total de Pedidos": cursor.execute("SELECT SUM(total) FROM pedidos").fetchone()[0] or 0,
-                "Média por Pedido": cursor.execute("SELECT AVG(total) FROM pedidos").fetchone()[0] or 0
-            }
-            
-            # Criar janela de estatísticas
-            janela_stats = ctk.CTkToplevel(self.janela)
-            janela_stats.title("📊 Estatísticas do Sistema")
-            janela_stats.geometry("400x400")
+        """Mostra estatísticas do sistema (consultas em segundo plano)"""
+        self.tarefas.submeter(
+            self._consultar_estatisticas,
+            concluido=self._mostrar_estatisticas,
+            erro=lambda e: messagebox.showerror("Erro", f"Erro ao carregar estatísticas: {str(e)}"),
+            entregar=self._na_janela
+        )
+    
+    def _consultar_estatisticas(self):
+        """Roda na thread de tarefas: totais, séries e rankings"""
+        # Totais mantidos em memória e tabelas de agregados
+        resumo = self.estatisticas.resumo()
+        stats = {
+            "Total de Clientes": resumo["clientes"],
+            "Total de Produtos": resumo["produtos"],
+            "Total de Pedidos": resumo["pedidos"],
+            "Pedidos Pendentes": resumo["pendentes"],
+            "Valor Total de Pedidos": resumo["receita"],
+            "Média por Pedido": resumo["media"]
+        }
+        
+        # Séries e rankings
+        secoes = [
+            ("Receita por Mês", [
+                (mes, formatar(receita))
+                for mes, _, receita in self.estatisticas.receita_por_periodo('mes', 6)
+            ]),
+            ("Pedidos por Status", [
+                (status.title(), pedidos)
+                for status, (pedidos, _) in self.estatisticas.pedidos_por_status().items()
+            ]),
+            ("Melhores Clientes", [
+                (cliente, formatar(receita))
+                for cliente, _, receita in self.estatisticas.top_clientes(5)
+            ]),
+            ("Produtos Mais Vendidos", [
+                (produto, formatar(receita))
+                for produto, _, receita in self.estatisticas.top_produtos(5)
+            ])
+        ]
+        return stats, secoes
+    
+    def _mostrar_estatisticas(self, dados):
+        """Roda na thread da interface: monta a janela de estatísticas"""
+        stats, secoes = dados
+        
+        # Criar janela de estatísticas
+        janela_stats = ctk.CTkToplevel(self.janela)
+        janela_stats.title("📊 Estatísticas do Sistema")
+        janela_stats.geometry("400x600")
+        
+        # Frame principal
+        frame = ctk.CTkScrollableFrame(janela_stats)
+        frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        # Título
+        ctk.CTkLabel(
+            frame,
+            text="Estatísticas do Sistema",
+            font=("OpenSans", 18, "bold")
+        ).pack(pady=(20, 30))
+        
+        def adicionar_linha(titulo, valor):
+            frame_linha = ctk.CTkFrame(frame, fg_color="transparent")
+            frame_linha.pack(fill="x", pady=5)
             
-            # Frame principal
-            frame = ctk.CTkFrame(janela_stats)
-            frame.pack(fill="both", expand=True, padx=20, pady=20)
+            ctk.CTkLabel(
+                frame_linha,
+                text=f"{titulo}:",
+                font=("OpenSans", 14, "bold"),
+                width=200
+            ).pack(side="left")
             
-            # Título
+            ctk.CTkLabel(
+                frame_linha,
+                text=str(valor),
+                font=("OpenSans", 14)
+            ).pack(side="right")
+        
+        # Mostrar estatísticas
+        for titulo, valor in stats.items():
+            valor_formatado = formatar(valor) if "Valor" in titulo or "Média" in titulo else valor
+            adicionar_linha(titulo, valor_formatado)
+        
+        for titulo_secao, linhas in secoes:
             ctk.CTkLabel(
                 frame,
-                text="Estatísticas do Sistema",
-                font=("OpenSans", 18, "bold")
-            ).pack(pady=(20, 30))
-            
-            # Mostrar estatísticas
-            for titulo, valor in stats.items():
-                frame_linha = ctk.CTkFrame(frame, fg_color="transparent")
-                frame_linha.pack(fill="x", pady=5)
-                
-                ctk.CTkLabel(
-                    frame_linha,
-                    text=f"{titulo}:",
-                    font=("OpenSans", 14, "bold"),
-                    width=200
-                ).pack(side="left")
-                
-                valor_formatado = f"R$ {valor:.2f}" if "Valor" in titulo or "Média" in titulo else valor
-                ctk.CTkLabel(
-                    frame_linha,
-                    text=str(valor_formatado),
-                    font=("OpenSans", 14)
-                ).pack(side="right")
+                text=titulo_secao,
+                font=("OpenSans", 16, "bold")
+            ).pack(pady=(20, 10))
+            for titulo, valor in linhas:
+                adicionar_linha(titulo, valor)
 
     def fazer_backup(self):
         """Realiza backup do banco de dados"""
-        try:
-            # Criar pasta de backup se não existir
-            if not os.path.exists("backup"):
-                os.makedirs("backup")
-            
-            # Nome do arquivo de backup com data e hora
-            data_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = f"backup/sistema_loja_{data_hora}.db"
-            
-            # Copiar arquivo do banco
-            import shutil
-            shutil.copy2(self.db.db_path, backup_path)
-            
+        # Janela de progresso
+        janela_progresso = ctk.CTkToplevel(self.janela)
+        janela_progresso.title("💾 Backup do Banco")
+        janela_progresso.geometry("350x120")
+        
+        ctk.CTkLabel(
+            janela_progresso,
+            text="Copiando banco de dados...",
+            font=("OpenSans", 14)
+        ).pack(pady=(20, 10))
+        
+        barra = ctk.CTkProgressBar(janela_progresso, width=280)
+        barra.pack(pady=10)
+        barra.set(0)
+        
+        # Progresso roda na thread de tarefas: repassar para a interface
+        def progresso(copiadas, total):
+            if total:
+                self.janela.after(0, lambda: barra.set(copiadas / total))
+        
+        def concluido(backup_path):
+            janela_progresso.destroy()
             messagebox.showinfo(
                 "Sucesso",
                 f"Backup realizado com sucesso!\nArquivo: {backup_path}"
             )
-            return True
-        except Exception as e:
+        
+        def erro(e):
+            janela_progresso.destroy()
             messagebox.showerror(
                 "Erro",
                 f"Erro ao realizar backup: {str(e)}"
             )
-            return False
+        
+        self.tarefas.submeter(
+            self.servico_backup.executar, progresso,
+            prioridade=MANUTENCAO, concluido=concluido, erro=erro, entregar=self._na_janela
+        )
+        return True
 
     def abrir_formulario_cliente(self):
         """Abre o formulário para cadastro de novo cliente"""
@@ -344,23 +1035,20 @@ class SistemaLojaApp(MDApp):
                 messagebox.showerror("Erro", "O nome do cliente é obrigatório!")
                 return
             
-            try:
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT INTO clientes (nome, telefone, endereco, data_cadastro)
-                        VALUES (?, ?, ?, datetime('now', 'localtime'))
-                    ''', (nome, telefone, endereco))
-                    conn.commit()
-                    
-                    messagebox.showinfo("Sucesso", "Cliente cadastrado com sucesso!")
-                    self.atualizar_lista_clientes()
-                    janela_form.destroy()
-                    
-            except sqlite3.IntegrityError:
-                messagebox.showerror("Erro", "Cliente já cadastrado!")
-            except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao cadastrar cliente: {str(e)}")
+            def concluido(cliente_id):
+                messagebox.showinfo("Sucesso", "Cliente cadastrado com sucesso!")
+                janela_form.destroy()
+            
+            def erro(e):
+                if isinstance(e, sqlite3.IntegrityError):
+                    messagebox.showerror("Erro", "Cliente já cadastrado!")
+                else:
+                    messagebox.showerror("Erro", f"Erro ao cadastrar cliente: {str(e)}")
+            
+            self.tarefas.submeter(
+                self.clientes.inserir, nome, telefone, endereco,
+                concluido=concluido, erro=erro, entregar=self._na_janela
+            )
         
         # Botões
         ctk.CTkButton(
@@ -422,20 +1110,11 @@ class SistemaLojaApp(MDApp):
             font=("OpenSans", 14)
         ).pack(side="left", padx=(0, 10))
         
-        # Buscar lista de clientes
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT nome FROM clientes ORDER BY nome')
-            clientes = ["Selecione um cliente..."] + [row[0] for row in cursor.fetchall()]
-        
-        janela_form.combo_clientes = ctk.CTkOptionMenu(
-            frame_cliente,
-            values=clientes,
-            width=300,
-            height=35
+        # Sugestões por prefixo do catálogo em memória, sem consulta
+        janela_form.campo_cliente = CampoAutocompletar(
+            frame_cliente, self.sugestoes_clientes, "Digite o nome do cliente"
         )
-        janela_form.combo_clientes.pack(side="left")
-        janela_form.combo_clientes.set("Selecione um cliente...")
+        janela_form.campo_cliente.pack(side="left")
         
         # Data de entrega
         frame_data = ctk.CTkFrame(frame_superior, fg_color="transparent")
@@ -470,19 +1149,10 @@ class SistemaLojaApp(MDApp):
         frame_produtos.pack(fill="x", padx=20, pady=(0, 20))
         
         # Seleção de produto
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT nome FROM produtos ORDER BY nome')
-            produtos = ["Selecione um produto..."] + [row[0] for row in cursor.fetchall()]
-        
-        janela_form.combo_produtos = ctk.CTkOptionMenu(
-            frame_produtos,
-            values=produtos,
-            width=300,
-            height=35
+        janela_form.campo_produto = CampoAutocompletar(
+            frame_produtos, self.sugestoes_produtos, "Digite o nome do produto"
         )
-        janela_form.combo_produtos.pack(side="left", padx=(0, 10))
-        janela_form.combo_produtos.set("Selecione um produto...")
+        janela_form.campo_produto.pack(side="left", padx=(0, 10))
         
         # Quantidade
         ctk.CTkLabel(
@@ -566,18 +1236,90 @@ class SistemaLojaApp(MDApp):
             command=lambda: self.finalizar_pedido(janela_form)
         )
         btn_finalizar.pack(side="left", padx=5)
+        
+        # Itens ainda não gravados: [(produto, quantidade)]
+        janela_form.itens = []
+
+    def adicionar_ao_pedido(self, janela_form):
+        """Adiciona o produto selecionado à lista de itens do formulário"""
+        produto = janela_form.campo_produto.get()
+        if not produto:
+            messagebox.showwarning("Aviso", "Selecione um produto!")
+            return
+        
+        try:
+            quantidade = int(janela_form.entry_quantidade.get())
+            if quantidade <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Erro", "Quantidade inválida!")
+            return
+        
+        # Preço vem do cache da camada de dados, sem consulta
+        preco = self.db.precos_produtos().get(produto)
+        if preco is None:
+            messagebox.showerror("Erro", "Produto não encontrado!")
+            return
+        
+        janela_form.itens.append((produto, quantidade))
+        janela_form.campo_produto.set("")
+        janela_form.lista_itens.insert("", "end", values=(
+            produto,
+            quantidade,
+            formatar(preco),
+            formatar(preco * quantidade)
+        ))
+        
+        precos = self.db.precos_produtos()
+        total = sum(precos.get(p, 0) * q for p, q in janela_form.itens)
+        janela_form.label_total.configure(text=f"Total: {formatar(total)}")
 
+    def finalizar_pedido(self, janela_form):
+        """Grava o pedido do formulário em uma única transação"""
+        cliente = janela_form.campo_cliente.get()
+        if not cliente:
+            messagebox.showerror("Erro", "Selecione um cliente!")
+            return
+        
+        try:
+            data_entrega = data_iso(janela_form.entry_data_entrega.get())
+        except ValueError:
+            messagebox.showerror("Erro", "Data inválida! Use o formato dd/mm/aaaa")
+            return
+        
+        def concluido(pedido_id):
+            # Cliente e produtos usados agora sobem nas sugestões
+            self.sugestoes_clientes.registrar_uso(cliente)
+            for produto, _ in janela_form.itens:
+                self.sugestoes_produtos.registrar_uso(produto)
+            messagebox.showinfo("Sucesso", f"Pedido #{pedido_id} criado com sucesso!")
+            janela_form.destroy()
+        
+        def erro(e):
+            if isinstance(e, ErroPedido):
+                messagebox.showerror("Erro", str(e))
+            else:
+                messagebox.showerror("Erro", f"Erro ao finalizar pedido: {str(e)}")
+        
+        self.tarefas.submeter(
+            self.pedidos.criar, cliente, data_entrega, list(janela_form.itens),
+            concluido=concluido, erro=erro, entregar=self._na_janela
+        )
+    
     def editar_cliente(self, nome):
-        """Abre formulário para editar cliente existente"""
-        # Buscar dados do cliente
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM clientes WHERE nome = ?', (nome,))
-            cliente = cursor.fetchone()
-            
-            if not cliente:
-                messagebox.showerror("Erro", "Cliente não encontrado!")
-                return
+        """Abre formulário para editar cliente existente (dados lidos em segundo plano)"""
+        self.tarefas.submeter(
+            self.clientes.por_nome, nome,
+            concluido=lambda cliente: self._abrir_edicao_cliente(nome, cliente),
+            erro=lambda e: messagebox.showerror("Erro", f"Erro ao carregar cliente: {str(e)}"),
+            entregar=self._na_janela
+        )
+    
+    def _abrir_edicao_cliente(self, nome, cliente):
+        """Roda na thread da interface: formulário com os dados do cliente"""
+        if not cliente:
+            messagebox.showerror("Erro", "Cliente não encontrado!")
+            return
         
         # Criar janela do formulário
         janela_form = ctk.CTkToplevel(self.janela)
@@ -608,9 +1350,9 @@ class SistemaLojaApp(MDApp):
         
         # Campos do formulário
         campos = {
-            "Nome": cliente[1],
-            "Telefone": cliente[2] or "",
-            "Endereço": cliente[3] or ""
+            "Nome": cliente.nome,
+            "Telefone": cliente.telefone or "",
+            "Endereço": cliente.endereco or ""
         }
         
         entries = {}
@@ -644,29 +1386,21 @@ class SistemaLojaApp(MDApp):
                 messagebox.showerror("Erro", "O nome do cliente é obrigatório!")
                 return
             
-            try:
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    if novo_nome != nome:
-                        # Verificar se novo nome já existe
-                        cursor.execute('SELECT id FROM clientes WHERE nome = ?', (novo_nome,))
-                        if cursor.fetchone():
-                            messagebox.showerror("Erro", "Já existe um cliente com este nome!")
-                            return
-                    
-                    cursor.execute('''
-                        UPDATE clientes 
-                        SET nome = ?, telefone = ?, endereco = ?
-                        WHERE nome = ?
-                    ''', (novo_nome, telefone, endereco, nome))
-                    conn.commit()
-                    
-                    messagebox.showinfo("Sucesso", "Cliente atualizado com sucesso!")
-                    self.atualizar_lista_clientes()
-                    janela_form.destroy()
-                    
-            except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao atualizar cliente: {str(e)}")
+            def concluido(atualizado):
+                messagebox.showinfo("Sucesso", "Cliente atualizado com sucesso!")
+                janela_form.destroy()
+            
+            def erro(e):
+                # Índice único em clientes.nome
+                if isinstance(e, sqlite3.IntegrityError):
+                    messagebox.showerror("Erro", "Já existe um cliente com este nome!")
+                else:
+                    messagebox.showerror("Erro", f"Erro ao atualizar cliente: {str(e)}")
+            
+            self.tarefas.submeter(
+                self.clientes.atualizar, nome, novo_nome, telefone, endereco,
+                concluido=concluido, erro=erro, entregar=self._na_janela
+            )
         
         # Frame para botões
         frame_botoes = ctk.CTkFrame(frame_principal, fg_color="transparent")
@@ -701,28 +1435,30 @@ class SistemaLojaApp(MDApp):
             return
         
         pedido_id = self.lista_historico.item(selecionado[0])["values"][0]
-        
-        # Buscar dados do pedido
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT p.cliente_nome, p.data_entrega, p.status, p.total
-                FROM pedidos p
-                WHERE p.id = ?
-            ''', (pedido_id,))
-            pedido = cursor.fetchone()
-            
-            if not pedido:
-                messagebox.showerror("Erro", "Pedido não encontrado!")
-                return
-            
-            # Buscar itens do pedido
-            cursor.execute('''
-                SELECT produto, quantidade, preco_unitario, total
-                FROM itens_pedido
-                WHERE pedido_id = ?
-            ''', (pedido_id,))
-            itens = cursor.fetchall()
+        self.tarefas.submeter(
+            self._consultar_pedido, pedido_id,
+            concluido=lambda dados: self._abrir_edicao_pedido(pedido_id, *dados),
+            erro=lambda e: messagebox.showerror("Erro", f"Erro ao carregar pedido: {str(e)}"),
+            entregar=self._na_janela
+        )
+    
+    def _consultar_pedido(self, pedido_id):
+        """Roda na thread de tarefas: ``(pedido, itens, arquivado)``; pedido None se não existe"""
+        # Arquivados abrem só para consulta
+        pedido = self.pedidos.por_id(pedido_id)
+        arquivado = pedido is None
+        if arquivado:
+            pedido = self.arquivo.pedido(pedido_id)
+        if not pedido:
+            return None, [], arquivado
+        itens = self.arquivo.itens(pedido_id) if arquivado else self.pedidos.itens(pedido_id)
+        return pedido, itens, arquivado
+    
+    def _abrir_edicao_pedido(self, pedido_id, pedido, itens, arquivado):
+        """Roda na thread da interface: janela de edição do pedido"""
+        if not pedido:
+            messagebox.showerror("Erro", "Pedido não encontrado!")
+            return
         
         # Criar janela de edição
         janela_form = ctk.CTkToplevel(self.janela)
@@ -768,7 +1504,7 @@ class SistemaLojaApp(MDApp):
             state="readonly"
         )
         entry_cliente.pack(side="left")
-        entry_cliente.insert(0, pedido[0])
+        entry_cliente.insert(0, pedido.cliente_nome)
         
         # Data de entrega
         frame_data = ctk.CTkFrame(frame_superior, fg_color="transparent")
@@ -786,7 +1522,7 @@ class SistemaLojaApp(MDApp):
             height=35
         )
         entry_data.pack(side="left")
-        entry_data.insert(0, datetime.strptime(pedido[1], '%Y-%m-%d').strftime('%d/%m/%Y'))
+        entry_data.insert(0, data_br(pedido.data_entrega))
         
         # Status do pedido
         frame_status = ctk.CTkFrame(frame_principal, fg_color="transparent")
@@ -805,7 +1541,11 @@ class SistemaLojaApp(MDApp):
             height=35
         )
         combo_status.pack(side="left")
-        combo_status.set(pedido[2])
+        combo_status.set(pedido.status)
+        
+        if arquivado:
+            entry_data.configure(state="disabled")
+            combo_status.configure(state="disabled")
         
         # Lista de itens
         frame_lista = ctk.CTkFrame(frame_principal)
@@ -830,10 +1570,10 @@ class SistemaLojaApp(MDApp):
         
         for item in itens:
             lista_itens.insert("", "end", values=(
-                item[0],
-                item[1],
-                f"R$ {item[2]:.2f}",
-                f"R$ {item[3]:.2f}"
+                item.produto,
+                item.quantidade,
+                formatar(item.preco_unitario),
+                formatar(item.total)
             ))
         
         lista_itens.pack(fill="both", expand=True, padx=5, pady=5)
@@ -841,26 +1581,22 @@ class SistemaLojaApp(MDApp):
         def salvar_alteracoes():
             """Função interna para salvar alterações do pedido"""
             try:
-                nova_data = datetime.strptime(entry_data.get(), '%d/%m/%Y').strftime('%Y-%m-%d')
-                novo_status = combo_status.get()
-                
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        UPDATE pedidos 
-                        SET data_entrega = ?, status = ?
-                        WHERE id = ?
-                    ''', (nova_data, novo_status, pedido_id))
-                    conn.commit()
-                
-                messagebox.showinfo("Sucesso", "Pedido atualizado com sucesso!")
-                self.carregar_pedidos()
-                janela_form.destroy()
-                
+                nova_data = data_iso(entry_data.get())
             except ValueError:
                 messagebox.showerror("Erro", "Data inválida! Use o formato dd/mm/aaaa")
-            except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao atualizar pedido: {str(e)}")
+                return
+            novo_status = combo_status.get()
+            
+            def concluido(atualizado):
+                messagebox.showinfo("Sucesso", "Pedido atualizado com sucesso!")
+                janela_form.destroy()
+            
+            self.tarefas.submeter(
+                self.pedidos.atualizar, pedido_id, nova_data, novo_status,
+                concluido=concluido,
+                erro=lambda e: messagebox.showerror("Erro", f"Erro ao atualizar pedido: {str(e)}"),
+                entregar=self._na_janela
+            )
         
         # Frame para botões
         frame_botoes = ctk.CTkFrame(frame_principal, fg_color="transparent")
@@ -881,6 +1617,7 @@ class SistemaLojaApp(MDApp):
             frame_botoes,
             text="Salvar",
             command=salvar_alteracoes,
+            state="disabled" if arquivado else "normal",
             width=100,
             height=35,
             fg_color="#4CAF50",
@@ -888,147 +1625,136 @@ class SistemaLojaApp(MDApp):
         ).pack(side="right", padx=30)
 
     def imprimir_comanda(self, pedido_id):
-        """Gera e imprime a comanda do pedido"""
-        try:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Buscar dados do pedido
-                cursor.execute('''
-                    SELECT p.cliente_nome, p.data, p.data_entrega, p.total, p.status
-                    FROM pedidos p
-                    WHERE p.id = ?
-                ''', (pedido_id,))
-                pedido = cursor.fetchone()
-                
-                # Buscar itens do pedido
-                cursor.execute('''
-                    SELECT produto, quantidade, preco_unitario, total
-                    FROM itens_pedido
-                    WHERE pedido_id = ?
-                ''', (pedido_id,))
-                itens = cursor.fetchall()
-                
-                if not pedido:
-                    messagebox.showerror("Erro", "Pedido não encontrado!")
-                    return
-                
-                # Criar arquivo temporário
-                import tempfile
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.txt')
-                
-                with open(temp_file.name, 'w', encoding='utf-8') as f:
-                    # Cabeçalho
-                    f.write("="*40 + "\n")
-                    f.write("COMANDA DE PEDIDO".center(40) + "\n")
-                    f.write("="*40 + "\n\n")
-                    
-                    # Dados do pedido
-                    f.write(f"Pedido #: {pedido_id}\n")
-                    f.write(f"Cliente: {pedido[0]}\n")
-                    f.write(f"Data: {datetime.strptime(pedido[1], '%Y-%m-%d').strftime('%d/%m/%Y')}\n")
-                    f.write(f"Entrega: {datetime.strptime(pedido[2], '%Y-%m-%d').strftime('%d/%m/%Y')}\n")
-                    f.write(f"Status: {pedido[4]}\n")
-                    f.write("-"*40 + "\n")
-                    
-                    # Itens
-                    f.write("\nITENS DO PEDIDO:\n")
-                    f.write("-"*40 + "\n")
-                    for item in itens:
-                        f.write(f"{item[0]}\n")
-                        f.write(f"  {item[1]} x R$ {item[2]:.2f} = R$ {item[3]:.2f}\n")
-                    
-                    f.write("-"*40 + "\n")
-                    f.write(f"Total: R$ {pedido[3]:.2f}\n")
-                    f.write("="*40 + "\n")
-                
-                # Imprimir arquivo
-                if platform == "win32":
-                    os.startfile(temp_file.name, "print")
-                else:
-                    subprocess.run(['lpr', temp_file.name])
-                
-                messagebox.showinfo("Sucesso", "Comanda enviada para impressão!")
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao gerar comanda: {str(e)}")
+        """Envia a comanda do pedido para a fila de impressão"""
+        self._imprimir_comandas(
+            "Comanda enviada para impressão!",
+            "Pedido não encontrado!",
+            ids=[pedido_id]
+        )
 
-    def atualizar_combos(self):
-        """Atualiza os comboboxes de clientes e produtos"""
-        # Atualizar combo de clientes
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Buscar clientes
-            cursor.execute('SELECT nome FROM clientes ORDER BY nome')
-            clientes = ["Selecione um cliente..."] + [row[0] for row in cursor.fetchall()]
-            
-            # Buscar produtos
-            cursor.execute('SELECT nome FROM produtos ORDER BY nome')
-            produtos = ["Selecione um produto..."] + [row[0] for row in cursor.fetchall()]
-            
-            # Atualizar combos em todas as janelas abertas
-            for widget in self.janela.winfo_children():
-                if isinstance(widget, ctk.CTkToplevel):
-                    for child in widget.winfo_children():
-                        if hasattr(child, 'combo_clientes'):
-                            child.combo_clientes.configure(values=clientes)
-                        if hasattr(child, 'combo_produtos'):
-                            child.combo_produtos.configure(values=produtos)
+    def imprimir_entregas_de_hoje(self):
+        """Imprime as comandas de todas as entregas pendentes de hoje"""
+        self._imprimir_comandas(
+            "{} comanda(s) enviada(s) para impressão!",
+            "Nenhuma entrega pendente para hoje.",
+            data_entrega=datetime.now().strftime("%Y-%m-%d"),
+            status="pendente"
+        )
+
+    def _imprimir_comandas(self, mensagem, mensagem_vazia, **filtros):
+        """Consulta e renderiza em segundo plano; a fila imprime sem travar a tela"""
+        def concluido(trabalhos):
+            if trabalhos:
+                messagebox.showinfo("Sucesso", mensagem.format(len(trabalhos)))
+            else:
+                messagebox.showerror("Erro", mensagem_vazia)
+        
+        self.tarefas.submeter(
+            self.comandas.imprimir,
+            concluido=concluido,
+            erro=lambda e: messagebox.showerror("Erro", f"Erro ao gerar comanda: {str(e)}"),
+            entregar=self._na_janela,
+            **filtros
+        )
+    
+    def _ao_mudar_impressao(self, trabalho):
+        """Roda na thread da fila: avisa quando uma comanda não pôde ser impressa"""
+        if trabalho.status == FALHOU:
+            self.janela.after(0, lambda: messagebox.showerror(
+                "Erro",
+                f"Falha ao imprimir {trabalho.descricao} "
+                f"após {trabalho.tentativas} tentativa(s): {trabalho.erro}"
+            ))
 
     def filtrar_pedidos(self, event=None):
         """Filtra os pedidos conforme pesquisa e status"""
         termo = self.entry_pesquisa.get().lower()
         status_filtro = self.filtro_status.get().lower()
         
-        # Limpar lista atual
-        for item in self.lista_historico.get_children():
-            self.lista_historico.delete(item)
+        if self.busca_historico is None:
+            self.busca_historico = BuscaAssincrona(
+                self.db,
+                consultar=self._consultar_historico,
+                aplicar=self._aplicar_historico,
+                entregar=self._na_janela
+            )
+        self.busca_historico.submeter((termo, status_filtro))
+    
+    def _consultar_historico(self, filtros):
+        """Roda na thread de busca: primeira página do histórico filtrado"""
+        termo, status_filtro = filtros
+        paginador = PaginadorPedidos(self.db, com_arquivo=True)
+        paginador.reiniciar(termo, status_filtro)
+        return paginador, paginador.proxima_pagina()
+    
+    def _aplicar_historico(self, resultado):
+        """Roda na thread da interface: substitui as linhas do Treeview"""
+        paginador, linhas = resultado
+        self._trocar_paginador_historico(paginador)
+        
+        # Limpar lista atual de uma vez
+        self.lista_historico.delete(*self.lista_historico.get_children())
+        self._monitorar_rolagem_historico()
+        self._inserir_historico(linhas)
+    
+    def carregar_mais_historico(self):
+        """Pede a próxima página do histórico (uma carga por vez)"""
+        if self._carga_historico is not None and not self._carga_historico.feita():
+            return
+        paginador = self.paginador_historico
+        self._carga_historico = self.tarefas.submeter(
+            paginador.proxima_pagina,
+            concluido=lambda pedidos: self._acrescentar_historico(paginador, pedidos),
+            erro=lambda e: messagebox.showerror("Erro", f"Erro ao filtrar pedidos: {str(e)}"),
+            entregar=self._na_janela
+        )
+    
+    def _trocar_paginador_historico(self, paginador):
+        """Passa a paginar o histórico por ``paginador``; a carga do anterior é cancelada"""
+        if self._carga_historico is not None:
+            self._carga_historico.cancelar()
+            self._carga_historico = None
+        self.paginador_historico = paginador
+    
+    def _acrescentar_historico(self, paginador, pedidos):
+        """Roda na thread da interface: página nova no fim do Treeview"""
+        # Página de um paginador já trocado por outro filtro
+        if paginador is self.paginador_historico:
+            self._inserir_historico(pedidos)
+    
+    def _inserir_historico(self, pedidos):
+        """Acrescenta linhas de pedidos ao Treeview do histórico"""
+        for pedido in pedidos:
+            self.lista_historico.insert(
+                "", "end", iid=str(pedido[0]), values=self._valores_historico(pedido)
+            )
+    
+    def _valores_historico(self, pedido):
+        """Colunas formatadas de um pedido para o Treeview do histórico"""
+        return (
+            pedido[0],
+            data_br(pedido[1]),
+            pedido[2],
+            data_br(pedido[3]),
+            pedido[4].title(),
+            formatar(pedido[5])
+        )
+    
+    def _monitorar_rolagem_historico(self):
+        """Carrega a próxima página quando o Treeview é rolado até o fim"""
+        if getattr(self, "_rolagem_historico_monitorada", False):
+            return
+        self._rolagem_historico_monitorada = True
+        comando_original = str(self.lista_historico.cget("yscrollcommand") or "")
         
-        try:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Construir query base
-                query = '''
-                    SELECT id, data, cliente_nome, data_entrega, status, total
-                    FROM pedidos
-                    WHERE 1=1
-                '''
-                params = []
-                
-                # Adicionar filtro de pesquisa
-                if termo:
-                    query += ' AND (cliente_nome LIKE ? OR id LIKE ?)'
-                    params.extend([f'%{termo}%', f'%{termo}%'])
-                
-                # Adicionar filtro de status
-                if status_filtro != "todos":
-                    query += ' AND status = ?'
-                    params.append(status_filtro)
-                
-                # Ordenar por data mais recente
-                query += ' ORDER BY data DESC'
-                
-                cursor.execute(query, params)
-                pedidos = cursor.fetchall()
-                
-                for pedido in pedidos:
-                    # Formatar data
-                    data = datetime.strptime(pedido[1], '%Y-%m-%d').strftime('%d/%m/%Y')
-                    data_entrega = datetime.strptime(pedido[3], '%Y-%m-%d').strftime('%d/%m/%Y')
-                    
-                    self.lista_historico.insert("", "end", values=(
-                        pedido[0],
-                        data,
-                        pedido[2],
-                        data_entrega,
-                        pedido[4].title(),
-                        f"R$ {float(pedido[5]):.2f}"
-                    ))
+        def ao_rolar(inicio, fim):
+            # Manter a barra de rolagem original sincronizada
+            if comando_original:
+                self.lista_historico.tk.eval(f"{comando_original} {inicio} {fim}")
+            if float(fim) >= 0.95 and not self.paginador_historico.fim:
+                self.janela.after_idle(self.carregar_mais_historico)
         
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao filtrar pedidos: {str(e)}")
+        self.lista_historico.configure(yscrollcommand=ao_rolar)
 
     def deletar_todos_os_pedidos(self):
         """Remove todos os pedidos e reseta os IDs"""
@@ -1039,70 +1765,41 @@ class SistemaLojaApp(MDApp):
         ):
             return
         
-        try:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Remover todos os itens de pedidos
-                cursor.execute('DELETE FROM itens_pedido')
-                
-                # Remover todos os pedidos
-                cursor.execute('DELETE FROM pedidos')
-                
-                # Resetar sequência de IDs
-                cursor.execute('DELETE FROM sqlite_sequence WHERE name="pedidos"')
-                cursor.execute('DELETE FROM sqlite_sequence WHERE name="itens_pedido"')
-                
-                conn.commit()
-                
-                messagebox.showinfo(
-                    "Sucesso",
-                    "Todos os pedidos foram removidos e os IDs foram resetados!"
-                )
-                
-                # Atualizar interface
-                self.carregar_pedidos()
-        
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao remover pedidos: {str(e)}")
-
+        # Remove pedidos e itens e reseta os IDs; as telas são
+        # limpas pelo evento publicado pela camada de dados
+        self.tarefas.submeter(
+            self.pedidos.remover_todos,
+            concluido=lambda _: messagebox.showinfo(
+                "Sucesso",
+                "Todos os pedidos foram removidos e os IDs foram resetados!"
+            ),
+            erro=lambda e: messagebox.showerror("Erro", f"Erro ao remover pedidos: {str(e)}"),
+            entregar=self._na_janela
+        )
+    
     def criar_tooltip(self):
         """Cria o texto do tooltip para o botão de notificações"""
         try:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Buscar informações de entregas
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total,
-                        SUM(CASE WHEN date(data_entrega) < date('now') THEN 1 ELSE 0 END) as atrasados,
-                        SUM(CASE WHEN date(data_entrega) = date('now') THEN 1 ELSE 0 END) as hoje,
-                        SUM(CASE WHEN date(data_entrega) = date('now', '+1 day') THEN 1 ELSE 0 END) as amanha
-                    FROM pedidos 
-                    WHERE status = 'pendente'
-                    AND data_entrega IS NOT NULL
-                ''')
-                
-                result = cursor.fetchone()
-                total = result[0] or 0
-                atrasados = result[1] or 0
-                hoje = result[2] or 0
-                amanha = result[3] or 0
-                
-                # Construir texto do tooltip
-                texto = "Status das Entregas:\n\n"
+            # Resumo mantido em memória, sem consulta ao banco
+            contagens = self.resumo_entregas.contagens()
+            total = contagens["pendentes"]
+            atrasados = contagens["atrasados"]
+            hoje = contagens["hoje"]
+            amanha = contagens["amanha"]
+            
+            # Construir texto do tooltip
+            texto = "Status das Entregas:\n\n"
                 
-                if atrasados > 0:
-                    texto += f"⚠️ {atrasados} entrega(s) atrasada(s)\n"
-                if hoje > 0:
-                    texto += f"📅 {hoje} entrega(s) para hoje\n"
-                if amanha > 0:
-                    texto += f"⏰ {amanha} entrega(s) para amanhã\n"
-                if total == 0:
-                    texto += "✓ Sem entregas pendentes"
+            if atrasados > 0:
+                texto += f"⚠️ {atrasados} entrega(s) atrasada(s)\n"
+            if hoje > 0:
+                texto += f"📅 {hoje} entrega(s) para hoje\n"
+            if amanha > 0:
+                texto += f"⏰ {amanha} entrega(s) para amanhã\n"
+            if total == 0:
+                texto += "✓ Sem entregas pendentes"
                 
-                return texto
+            return texto
         
         except Exception as e:
             return f"Erro ao carregar informações: {str(e)}"
@@ -1119,40 +1816,26 @@ class SistemaLojaApp(MDApp):
             proximo_indice = (indice + 1) % 2
             
             # Continuar apenas se ainda houver entregas atrasadas
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT COUNT(*) 
-                    FROM pedidos 
-                    WHERE status = 'pendente'
-                    AND date(data_entrega) < date('now')
-                ''')
-                atrasados = cursor.fetchone()[0]
-                
-                if atrasados > 0:
-                    self.janela.after(500, lambda: alterar_cor(proximo_indice))
+            if self.resumo_entregas.atrasados() > 0:
+                self.janela.after(500, lambda: alterar_cor(proximo_indice))
         
         alterar_cor()
 
     def verificar_entregas_periodicamente(self):
-        """Verifica entregas periodicamente e atualiza notificações"""
-        self.verificar_entregas()
-        self.atualizar_botao_notificacoes()
+        """Verifica entregas a cada 5 minutos e atualiza notificações"""
+        if self._verificacao_entregas is not None:
+            return
         
-        # Agendar próxima verificação (a cada 5 minutos)
-        self.janela.after(300000, self.verificar_entregas_periodicamente)
-
-class DatabaseManager:
-    def __init__(self):
-        if platform == 'android':
-            from android.storage import app_storage_path
-            db_dir = app_storage_path()
-            self.db_path = os.path.join(db_dir, 'sistema_loja.db')
-        else:
-            self.db_path = 'sistema_loja.db'
-    
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        def atualizar(resumo):
+            self.verificar_entregas()
+            self.atualizar_botao_notificacoes()
+        
+        # Ressincronizar com alterações feitas por outros terminais; a
+        # consulta roda na thread de tarefas, só os botões na interface
+        self._verificacao_entregas = self.tarefas.agendar(
+            300, self.resumo_entregas.carregar,
+            prioridade=PERIODICA, concluido=atualizar, entregar=self._na_janela
+        )
 
 if __name__ == '__main__':
     if platform == 'android':
@@ -0,0 +1,149 @@
+import sqlite3
+
+import pytest
+
+from loja.database import DatabaseManager
+from loja.migracoes import fts5_disponivel
+from loja.paginacao import PaginadorPedidos
+
+com_fts5 = pytest.mark.skipif(
+    not fts5_disponivel(sqlite3.connect(':memory:')), reason='SQLite sem FTS5'
+)
+
+ORDEM_HISTORICO = ' ORDER BY p.data DESC, p.id DESC'
+
+
+def banco_com_arquivo(caminho):
+    """12 pedidos em 4 datas de 2020 e 2 de hoje; os encerrados antigos vão para o arquivo
+
+    Os pendentes antigos ficam no principal com as mesmas datas dos
+    arquivados, então as páginas cruzam a divisa com empates de data.
+    Retorna o banco e os ids esperados (ordem do histórico) de todos os
+    pedidos, dos pedidos da cliente João e dos que têm pão de queijo.
+    """
+    db = DatabaseManager(caminho)
+    db.inserir_cliente('João Silva', '', '')
+    db.inserir_cliente('Maria', '', '')
+    db.inserir_produtos([('Pão de queijo', 500), ('Bolo', 1250)])
+
+    antigos = db.criar_pedidos([
+        (
+            'João Silva' if i % 2 else 'Maria', None,
+            [('Pão de queijo', 1)] if i % 4 else [('Bolo', 1)],
+            'pendente' if i % 3 == 0 else 'entregue',
+        )
+        for i in range(12)
+    ])
+    db.criar_pedidos([('João Silva', None, [('Bolo', 2)]), ('Maria', None, [('Bolo', 1)])])
+
+    esperados = {}
+    with db.transacao() as conn:
+        conn.executemany(
+            'UPDATE pedidos SET data = ? WHERE id = ?',
+            [(f'2020-01-0{1 + i // 3}', pedido_id) for i, pedido_id in enumerate(antigos)]
+        )
+        for chave, filtro in (
+            ('todos', ''),
+            ('joao', " WHERE c.nome = 'João Silva'"),
+            ('pao', " WHERE EXISTS (SELECT 1 FROM itens_pedido i WHERE i.pedido_id = p.id AND i.produto = 'Pão de queijo')"),
+        ):
+            esperados[chave] = [linha[0] for linha in conn.execute(
+                'SELECT p.id FROM pedidos p JOIN clientes c ON c.id = p.cliente_id' + filtro + ORDEM_HISTORICO
+            )]
+
+    assert db.arquivo.arquivar() == 8
+    return db, esperados
+
+
+def historico(db, termo='', status=None, tamanho=4):
+    """Ids de todas as páginas do histórico"""
+    paginador = PaginadorPedidos(db, tamanho_pagina=tamanho, com_arquivo=True)
+    paginador.reiniciar(termo, status)
+    ids = []
+    while not paginador.fim:
+        ids.extend(pedido.id for pedido in paginador.proxima_pagina())
+    return ids
+
+
+def ids_arquivados(db):
+    with db.arquivo.conexao() as conn:
+        return {linha[0] for linha in conn.execute('SELECT id FROM arquivo.pedidos')}
+
+
+def test_paginas_intercalam_principal_e_arquivo_sem_repetir(tmp_path):
+    db, esperados = banco_com_arquivo(str(tmp_path / 'loja.db'))
+    try:
+        for tamanho in (1, 3, 4, 5, 100):
+            assert historico(db, tamanho=tamanho) == esperados['todos']
+
+        # A lista comum continua só com o principal
+        arquivados = ids_arquivados(db)
+        paginador = PaginadorPedidos(db, tamanho_pagina=100)
+        assert [pedido.id for pedido in paginador.proxima_pagina()] == [
+            pedido_id for pedido_id in esperados['todos'] if pedido_id not in arquivados
+        ]
+    finally:
+        db.fechar()
+
+
+def test_filtro_de_status_pagina_o_arquivo_pela_mesma_chave(tmp_path):
+    db, esperados = banco_com_arquivo(str(tmp_path / 'loja.db'))
+    try:
+        entregues = historico(db, status='entregue', tamanho=100)
+        assert set(entregues) == ids_arquivados(db)
+        assert historico(db, status='entregue', tamanho=3) == entregues
+        assert entregues == [pedido_id for pedido_id in esperados['todos'] if pedido_id in entregues]
+    finally:
+        db.fechar()
+
+
+@com_fts5
+def test_busca_nos_arquivados_ignora_acentos_e_casa_por_prefixo(tmp_path):
+    db, esperados = banco_com_arquivo(str(tmp_path / 'loja.db'))
+    try:
+        assert set(esperados['joao']) & ids_arquivados(db)
+        assert historico(db, 'joao', tamanho=2) == esperados['joao']
+        assert historico(db, 'JOÃO sil') == esperados['joao']
+        assert historico(db, 'oao') == []
+        assert historico(db, 'pao qu', tamanho=3) == esperados['pao']
+    finally:
+        db.fechar()
+
+
+@com_fts5
+def test_renomear_cliente_atualiza_a_busca_dos_arquivados(tmp_path):
+    db, esperados = banco_com_arquivo(str(tmp_path / 'loja.db'))
+    try:
+        db.atualizar_cliente('João Silva', 'Zé Souza', '', '')
+
+        assert historico(db, 'ze sou', tamanho=3) == esperados['joao']
+        assert historico(db, 'joao') == []
+        with db.arquivo.conexao() as conn:
+            nomes = conn.execute(
+                'SELECT DISTINCT cliente_nome FROM arquivo.pedidos WHERE id IN (%s)'
+                % ', '.join('?' * len(esperados['joao'])),
+                esperados['joao']
+            ).fetchall()
+        assert nomes == [('Zé Souza',)]
+    finally:
+        db.fechar()
+
+
+@com_fts5
+def test_arquivo_anterior_a_busca_e_indexado_ao_abrir(tmp_path):
+    caminho = str(tmp_path / 'loja.db')
+    db, esperados = banco_com_arquivo(caminho)
+    db.fechar()
+
+    # Arquivo na versão 1, sem busca_pedidos
+    conn = sqlite3.connect(db.arquivo.caminho)
+    conn.execute('DROP TABLE busca_pedidos')
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(caminho)
+    try:
+        assert historico(db, 'joao') == esperados['joao']
+    finally:
+        db.fechar()
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from loja.busca import BuscaTextual, montar_consulta_fts
+from loja.database import DatabaseManager
+from loja.migracoes import fts5_disponivel
+from loja.repositorio import PedidoRepo
+
+pytestmark = pytest.mark.skipif(
+    not fts5_disponivel(sqlite3.connect(':memory:')), reason='SQLite sem FTS5'
+)
+
+
+def test_consulta_por_prefixo_de_cada_palavra():
+    assert montar_consulta_fts('jo  sil') == '"jo"* "sil"*'
+    assert montar_consulta_fts('"pão"') == '"pão"*'
+    assert montar_consulta_fts(' -*- ') is None
+
+
+def test_renomear_cliente_reindexa_o_cliente_e_os_pedidos_dele(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        db.inserir_cliente('João Silva', '9999-0000', 'Rua das Flores')
+        db.inserir_cliente('Maria', '', '')
+        db.inserir_produtos([('Bolo de cenoura', 1250)])
+        pedido_id = db.criar_pedido('João Silva', None, [('Bolo de cenoura', 1)])
+        db.criar_pedido('Maria', None, [('Bolo de cenoura', 2)])
+        busca = BuscaTextual(db)
+
+        assert [cliente[1] for cliente in busca.clientes('joao')] == ['João Silva']
+
+        db.atualizar_cliente('João Silva', 'José Souza', '9999-0000', 'Rua das Flores')
+
+        assert busca.clientes('joao') == []
+        assert [cliente[1] for cliente in busca.clientes('jose sou')] == ['José Souza']
+        assert [cliente[1] for cliente in busca.clientes('flores')] == ['José Souza']
+        assert [pedido[0] for pedido in busca.pedidos('souza')] == [pedido_id]
+        assert busca.pedidos('silva') == []
+        # Produtos do pedido continuam no documento reindexado
+        assert [pedido[0] for pedido in busca.pedidos('jos cen')] == [pedido_id]
+        # A paginação filtra pelo mesmo índice
+        assert [pedido.id for pedido in PedidoRepo(db).pagina('souza')] == [pedido_id]
+    finally:
+        db.fechar()
+
+
+def test_renomear_para_o_mesmo_nome_nao_duplica_documentos(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        db.inserir_cliente('Ana', '', '')
+        db.inserir_produtos([('Bolo', 1250)])
+        pedido_id = db.criar_pedido('Ana', None, [('Bolo', 1)])
+
+        db.atualizar_cliente('Ana', 'Ana', '1234', '')
+
+        busca = BuscaTextual(db)
+        assert [pedido[0] for pedido in busca.pedidos('ana')] == [pedido_id]
+        assert [cliente[2] for cliente in busca.clientes('ana')] == ['1234']
+    finally:
+        db.fechar()
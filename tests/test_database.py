@@ -0,0 +1,130 @@
+import sqlite3
+
+import pytest
+
+from loja.database import DatabaseManager
+from loja.perfil import ConexaoPerfilada
+
+
+def contar_clientes(caminho):
+    """Contagem vista por uma conexão fora do pool (só enxerga o que já teve commit)"""
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM clientes').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def nomes_clientes(db):
+    with db.get_connection() as conn:
+        return [linha[0] for linha in conn.execute('SELECT nome FROM clientes ORDER BY id')]
+
+
+def test_bloco_aninhado_usa_a_conexao_externa_e_so_ela_faz_commit(tmp_path):
+    caminho = str(tmp_path / 'loja.db')
+    db = DatabaseManager(caminho)
+    avisos = []
+    try:
+        with db.transacao() as externa:
+            db.inserir_cliente('Ana', '', '')
+            with db.get_connection() as interna:
+                assert interna is externa
+                db.pool.apos_commit(lambda: avisos.append('commit'))
+            assert externa.in_transaction
+            assert contar_clientes(caminho) == 0
+            assert avisos == []
+
+        assert contar_clientes(caminho) == 1
+        assert avisos == ['commit']
+        assert db.pool.estatisticas()['em_uso'] == 0
+    finally:
+        db.fechar()
+
+
+def test_erro_no_bloco_externo_desfaz_tudo_e_descarta_os_avisos(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    avisos = []
+    db.eventos.assinar('clientes', avisos.append)
+    try:
+        with pytest.raises(RuntimeError):
+            with db.transacao():
+                db.inserir_cliente('Ana', '', '')
+                raise RuntimeError('falha')
+
+        assert nomes_clientes(db) == []
+        assert avisos == []
+
+        # A conexão voltou ao pool sem transação aberta
+        db.inserir_cliente('Bia', '', '')
+        assert nomes_clientes(db) == ['Bia']
+        assert [aviso.dados['nome'] for aviso in avisos] == ['Bia']
+    finally:
+        db.fechar()
+
+
+def test_ponto_salvamento_desfaz_so_a_operacao_que_falhou(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    avisos = []
+    db.eventos.assinar('clientes', avisos.append)
+    try:
+        with db.transacao():
+            db.inserir_cliente('Ana', '', '')
+            with pytest.raises(sqlite3.IntegrityError):
+                with db.pool.ponto_salvamento():
+                    db.inserir_cliente('Bia', '', '')
+                    db.inserir_cliente('Ana', '', '')
+            db.inserir_cliente('Caio', '', '')
+
+        assert nomes_clientes(db) == ['Ana', 'Caio']
+        assert [aviso.dados['nome'] for aviso in avisos] == ['Ana', 'Caio']
+    finally:
+        db.fechar()
+
+
+def test_conexao_reutilizada_volta_aos_pragmas_de_seguranca(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'), tamanho_pool=1)
+    try:
+        with db.get_connection() as conn:
+            conn.execute('PRAGMA foreign_keys = OFF')
+            conn.execute('PRAGMA synchronous = OFF')
+
+        with db.get_connection() as reutilizada:
+            assert reutilizada is conn
+            assert reutilizada.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+            # NORMAL
+            assert reutilizada.execute('PRAGMA synchronous').fetchone()[0] == 1
+    finally:
+        db.fechar()
+
+
+def test_ligar_o_perfil_troca_a_conexao_livre_sem_crescer_o_pool(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'), tamanho_pool=1)
+    try:
+        with db.get_connection() as comum:
+            assert not isinstance(comum, ConexaoPerfilada)
+
+        db.perfil.ativar()
+        with db.get_connection() as perfilada:
+            assert isinstance(perfilada, ConexaoPerfilada)
+            perfilada.execute('SELECT COUNT(*) FROM clientes').fetchone()
+
+        assert db.pool.estatisticas()['abertas'] == 1
+        with pytest.raises(sqlite3.ProgrammingError):
+            comum.execute('SELECT 1')
+        assert db.perfil.totais()
+    finally:
+        db.perfil.desativar()
+        db.fechar()
+
+
+def test_pool_continua_utilizavel_depois_de_fechar(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        db.inserir_cliente('Ana', '', '')
+        db.fechar()
+        assert db.pool.estatisticas()['abertas'] == 0
+
+        db.inserir_cliente('Bia', '', '')
+        assert nomes_clientes(db) == ['Ana', 'Bia']
+    finally:
+        db.fechar()
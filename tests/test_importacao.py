@@ -0,0 +1,37 @@
+from loja.database import DatabaseManager
+from loja.importacao import importar
+
+
+def pedido(cliente, *quantidades):
+    return {
+        'cliente': cliente,
+        'data': '2024-05-01',
+        'data_entrega': '2024-05-02',
+        'itens': [
+            {'produto': 'Bolo', 'quantidade': quantidade, 'preco_unitario': '12,50'}
+            for quantidade in quantidades
+        ],
+    }
+
+
+def test_pedido_com_item_invalido_no_meio_nao_fica_pela_metade(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        # Quantidade que não cabe em um INTEGER do SQLite: falha depois do cabeçalho gravado
+        relatorio = importar(db, 'pedidos', [
+            pedido('Ana', 1),
+            pedido('Bia', 2, 10 ** 20, 3),
+            pedido('Caio', 4),
+        ])
+
+        assert (relatorio.lidos, relatorio.gravados, relatorio.rejeitados) == (3, 2, 1)
+        assert relatorio.erros[0].startswith('registro 2:')
+        with db.get_connection() as conn:
+            pedidos = conn.execute(
+                'SELECT c.nome, p.total FROM pedidos p JOIN clientes c ON c.id = p.cliente_id ORDER BY p.id'
+            ).fetchall()
+            itens = conn.execute('SELECT COUNT(*) FROM itens_pedido').fetchone()[0]
+        assert [nome for nome, _ in pedidos] == ['Ana', 'Caio']
+        assert itens == 2
+    finally:
+        db.fechar()
@@ -0,0 +1,64 @@
+import sqlite3
+
+from loja import migracoes
+
+
+def banco_v0(caminho):
+    """Banco sem versão, no esquema original, com um item de pedido excluído"""
+    conn = sqlite3.connect(caminho)
+    for passo in migracoes.MIGRACOES[0][1]:
+        conn.execute(passo)
+    conn.execute("INSERT INTO clientes (nome, telefone, endereco) VALUES ('Ana', '', '')")
+    conn.execute("INSERT INTO produtos (nome, preco) VALUES ('Bolo', 12.5)")
+    conn.execute(
+        "INSERT INTO pedidos (id, cliente_nome, data, data_entrega, status, total) "
+        "VALUES (1, 'Ana', '2024-05-01', '2024-05-02', 'pendente', 25.0)"
+    )
+    conn.executemany(
+        "INSERT INTO itens_pedido (pedido_id, produto, quantidade, preco_unitario, total) "
+        "VALUES (?, 'Bolo', 2, 12.5, 25.0)",
+        [(1,), (5,)]
+    )
+    conn.commit()
+    return conn
+
+
+def test_migra_banco_v0_com_itens_orfaos(tmp_path):
+    conn = banco_v0(str(tmp_path / 'loja.db'))
+
+    assert migracoes.migrar(conn) == migracoes.versao_mais_recente()
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    assert conn.execute('SELECT pedido_id, total FROM itens_pedido').fetchall() == [(1, 2500)]
+    assert conn.execute('SELECT total FROM pedidos').fetchall() == [(2500,)]
+
+
+def test_reais_viram_centavos_sem_erro_de_arredondamento(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'loja.db'))
+    for passo in migracoes.MIGRACOES[0][1]:
+        conn.execute(passo)
+    conn.execute("INSERT INTO clientes (nome, telefone, endereco) VALUES ('Ana', '', '')")
+    conn.executemany('INSERT INTO produtos (nome, preco) VALUES (?, ?)', [('Bala', 0.1), ('Torta', 19.99)])
+    # 3 * 0.1 em ponto flutuante é 0.30000000000000004
+    conn.execute(
+        "INSERT INTO pedidos (id, cliente_nome, data, data_entrega, status, total) "
+        "VALUES (1, 'Ana', '2024-05-01', '2024-05-02', 'entregue', ?)", (3 * 0.1,)
+    )
+    conn.execute(
+        "INSERT INTO itens_pedido (pedido_id, produto, quantidade, preco_unitario, total) "
+        "VALUES (1, 'Bala', 3, 0.1, ?)", (3 * 0.1,)
+    )
+    # Pedido sem itens mantém o total gravado
+    conn.execute(
+        "INSERT INTO pedidos (id, cliente_nome, data, data_entrega, status, total) "
+        "VALUES (2, 'Ana', '2024-05-01', '2024-05-02', 'pendente', 19.99)"
+    )
+    conn.commit()
+
+    migracoes.migrar(conn)
+
+    assert conn.execute('SELECT nome, preco, typeof(preco) FROM produtos ORDER BY id').fetchall() == [
+        ('Bala', 10, 'integer'), ('Torta', 1999, 'integer')
+    ]
+    assert conn.execute('SELECT preco_unitario, total FROM itens_pedido').fetchall() == [(10, 30)]
+    assert conn.execute('SELECT id, total FROM pedidos ORDER BY id').fetchall() == [(1, 30), (2, 1999)]
+    assert conn.execute('SELECT pedidos, receita FROM estatisticas_status WHERE status = ?', ('entregue',)).fetchall() == [(1, 30)]
@@ -0,0 +1,124 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from loja.database import DatabaseManager
+from loja.servidor import ServidorLoja
+
+
+def executar_juntas(servidor, *operacoes):
+    """Enfileira as operações de uma vez (antes de a escritora acordar) e espera todas"""
+    async def rodar():
+        await servidor.iniciar()
+        try:
+            return await asyncio.gather(
+                *(servidor.executar(*operacao) for operacao in operacoes), return_exceptions=True
+            )
+        finally:
+            servidor.fechar()
+    return asyncio.run(rodar())
+
+
+def test_escritas_na_fila_saem_em_um_commit_e_o_erro_desfaz_so_a_sua(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    avisos = []
+    db.eventos.assinar('clientes', avisos.append)
+    try:
+        servidor = ServidorLoja(db, host='127.0.0.1', porta=0)
+        resultados = executar_juntas(
+            servidor,
+            ('inserir_cliente', 'Ana', '', ''),
+            ('inserir_cliente', 'Bia', '', ''),
+            ('inserir_cliente', 'Ana', '', ''),
+            ('inserir_clientes', [('Caio', '', ''), ('Bia', '', '')]),
+            ('inserir_cliente', 'Davi', '', ''),
+        )
+
+        assert resultados[:2] == [1, 2]
+        assert isinstance(resultados[2], sqlite3.IntegrityError)
+        # Lote de clientes é uma operação só: desfeito por inteiro
+        assert isinstance(resultados[3], sqlite3.IntegrityError)
+        assert isinstance(resultados[4], int)
+
+        estatisticas = servidor.estatisticas()
+        assert estatisticas['lotes'] == 1
+        assert estatisticas['maior_lote'] == 5
+        with db.get_connection() as conn:
+            nomes = [linha[0] for linha in conn.execute('SELECT nome FROM clientes ORDER BY id')]
+        assert nomes == ['Ana', 'Bia', 'Davi']
+        # Avisos só das operações gravadas, depois do commit
+        assert [aviso.dados['nome'] for aviso in avisos] == ['Ana', 'Bia', 'Davi']
+    finally:
+        db.fechar()
+
+
+def test_lote_respeita_o_limite_de_operacoes_por_commit(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        servidor = ServidorLoja(db, host='127.0.0.1', porta=0, lote_escrita=2)
+        resultados = executar_juntas(
+            servidor, *(('inserir_cliente', f'Cliente {i}', '', '') for i in range(5))
+        )
+
+        assert resultados == [1, 2, 3, 4, 5]
+        assert servidor.estatisticas()['lotes'] == 3
+        assert servidor.estatisticas()['maior_lote'] == 2
+    finally:
+        db.fechar()
+
+
+def test_exclusiva_grava_sozinha_entre_os_lotes(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        db.inserir_cliente('Ana', '', '')
+        db.inserir_produtos([('Bolo', 1250)])
+        servidor = ServidorLoja(db, host='127.0.0.1', porta=0)
+        resultados = executar_juntas(
+            servidor,
+            ('criar_pedidos', [('Ana', None, [('Bolo', 1)])]),
+            ('remover_todos_pedidos',),
+            ('criar_pedidos', [('Ana', None, [('Bolo', 2)])]),
+        )
+
+        assert not any(isinstance(resultado, Exception) for resultado in resultados)
+        # Lote antes, exclusiva e lote depois, na ordem de chegada
+        assert servidor.estatisticas()['lotes'] == 3
+        with db.get_connection() as conn:
+            assert conn.execute('SELECT total FROM pedidos').fetchall() == [(2500,)]
+    finally:
+        db.fechar()
+
+
+def test_consulta_de_terminal_so_aceita_select(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        db.inserir_cliente('Ana', '', '')
+        servidor = ServidorLoja(db, host='127.0.0.1', porta=0)
+        leitura, *recusadas = executar_juntas(
+            servidor,
+            ('consultar', 'SELECT nome FROM clientes', []),
+            ('consultar', 'DELETE FROM clientes', []),
+            ('consultar', 'PRAGMA writable_schema = ON', []),
+            ('consultar', "WITH x AS (SELECT 1) DELETE FROM clientes", []),
+            ('consultar', 'SELECT 1; DELETE FROM clientes', []),
+        )
+
+        assert leitura == [('Ana',)]
+        for recusada in recusadas:
+            assert isinstance(recusada, (ValueError, sqlite3.DatabaseError))
+        with db.get_connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM clientes').fetchone()[0] == 1
+    finally:
+        db.fechar()
+
+
+@pytest.mark.parametrize('operacao', ['apagar_tudo', 'executar_sql'])
+def test_operacao_desconhecida_e_recusada(tmp_path, operacao):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    try:
+        servidor = ServidorLoja(db, host='127.0.0.1', porta=0)
+        resultado, = executar_juntas(servidor, (operacao,))
+        assert isinstance(resultado, ValueError)
+    finally:
+        db.fechar()
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from loja.database import DatabaseManager
+from loja.tarefas import (
+    CANCELADA, CONCLUIDA, INTERATIVA, MANUTENCAO, PERIODICA, ExecutorTarefas, TarefaCancelada
+)
+
+# Conta até um bilhão: só termina se for interrompida
+CONSULTA_LONGA = '''
+    WITH RECURSIVE n(i) AS (SELECT sinal() UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000)
+    SELECT COUNT(*) FROM n
+'''
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'loja.db'))
+    yield db
+    db.fechar()
+
+
+@pytest.fixture
+def executor(db):
+    executor = ExecutorTarefas(db, trabalhadores=1)
+    yield executor
+    executor.parar(esperar=True, timeout=5)
+
+
+def test_fila_atende_interativa_antes_de_periodica_e_manutencao(executor):
+    liberar = threading.Event()
+    bloqueio = executor.submeter(liberar.wait, 5)
+    ordem = []
+    tarefas = [
+        executor.submeter(ordem.append, nome, prioridade=prioridade)
+        for nome, prioridade in (
+            ('manutencao', MANUTENCAO), ('periodica', PERIODICA), ('interativa', INTERATIVA)
+        )
+    ]
+
+    liberar.set()
+    bloqueio.resultado(timeout=5)
+    for tarefa in tarefas:
+        tarefa.resultado(timeout=5)
+
+    assert ordem == ['interativa', 'periodica', 'manutencao']
+
+
+def test_tarefa_cancelada_na_fila_nao_roda_nem_entrega(executor):
+    liberar = threading.Event()
+    bloqueio = executor.submeter(liberar.wait, 5)
+    executadas, entregues = [], []
+    tarefa = executor.submeter(executadas.append, 'x', concluido=entregues.append)
+
+    assert tarefa.cancelar()
+    liberar.set()
+    bloqueio.resultado(timeout=5)
+    # A fila andou depois da cancelada
+    assert executor.submeter(lambda: 'ok').resultado(timeout=5) == 'ok'
+
+    assert tarefa.estado == CANCELADA
+    with pytest.raises(TarefaCancelada):
+        tarefa.resultado(timeout=1)
+    assert executadas == [] and entregues == []
+
+
+def test_cancelar_interrompe_a_consulta_em_execucao(db, executor):
+    comecou = threading.Event()
+    entregues = []
+
+    def consulta_longa():
+        with db.get_connection() as conn:
+            # Sinal de dentro da consulta: o cancelamento chega com ela rodando
+            conn.create_function('sinal', 0, lambda: comecou.set() or 0)
+            return conn.execute(CONSULTA_LONGA).fetchone()
+
+    tarefa = executor.submeter(consulta_longa, concluido=entregues.append, erro=entregues.append)
+    assert comecou.wait(5)
+    assert tarefa.cancelar()
+
+    with pytest.raises(TarefaCancelada):
+        tarefa.resultado(timeout=5)
+    assert tarefa.estado == CANCELADA
+    assert entregues == []
+    assert executor.metricas()['canceladas'] == 1
+
+    # A conexão voltou ao pool e atende a próxima tarefa
+    assert db.pool.estatisticas()['em_uso'] == 0
+    proxima = executor.submeter(db.inserir_cliente, 'Ana', '', '')
+    assert proxima.resultado(timeout=5) == 1
+    assert proxima.estado == CONCLUIDA
+